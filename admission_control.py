@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Admission control for Claude CLI process spawns.
+
+Protège l'instance contre les bursts (chaque run = un process Node):
+- Cap global de runs simultanés par instance
+- Cap par tenant (hash du token)
+- Weighted fair queuing entre tenants (virtual time)
+- Overflow de la file → AdmissionRejected avec Retry-After estimé
+  depuis les temps de service observés (EWMA)
+
+Thread-safe: utilisable depuis l'API sync (threads) comme depuis l'event loop
+(les waiters async sont réveillés via loop.call_soon_threadsafe).
+"""
+
+import asyncio
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Deque, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """File d'admission pleine (ou attente trop longue): le client doit réessayer plus tard."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    Place d'un run dans le contrôleur d'admission.
+
+    Un ticket est soit en file (granted=False), soit admis (granted=True)
+    jusqu'à release(). release() est idempotent.
+    """
+
+    def __init__(self, controller: "AdmissionController", tenant: str, seq: int):
+        self.controller = controller
+        self.tenant = tenant
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self._event = threading.Event()
+        self._futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def granted(self) -> bool:
+        return self._event.is_set()
+
+    def position(self) -> int:
+        """Position estimée dans la file (1 = prochain admis, 0 = déjà admis)."""
+        return self.controller.position(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend l'admission (bloquant). Retourne True si admis."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """Attend l'admission sans bloquer l'event loop. Retourne True si admis."""
+        if self.granted:
+            return True
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.controller._lock:
+            if self.granted:
+                return True
+            self._futures.append((loop, future))
+
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.controller._lock:
+                self._futures = [(l, f) for l, f in self._futures if f is not future]
+
+        return self.granted
+
+    def release(self):
+        """Libère la place (ou retire le ticket de la file s'il n'a pas encore été admis)."""
+        self.controller.release(self)
+
+    def _grant(self):
+        """Marque le ticket admis et réveille ses waiters. Appelé sous controller._lock."""
+        self.granted_at = time.monotonic()
+        self._event.set()
+        for loop, future in self._futures:
+            loop.call_soon_threadsafe(_resolve_future, future)
+        self._futures = []
+
+
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdmissionController:
+    """
+    Contrôleur d'admission avec weighted fair queuing par tenant.
+
+    Chaque tenant a un virtual time; admettre un run du tenant l'avance de 1/weight.
+    Parmi les tenants en attente (et sous leur cap), on admet celui dont le
+    prochain run a le plus petit virtual finish time: un tenant qui envoie
+    100 requêtes ne bloque pas celui qui en envoie une.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 10,
+        max_per_tenant: int = 3,
+        max_queue: int = 100,
+        max_queue_per_tenant: int = 20,
+        max_wait: float = 120.0,
+        initial_service_time: float = 30.0,
+        ewma_alpha: float = 0.2
+    ):
+        """
+        Args:
+            max_concurrent: Runs simultanés max sur l'instance
+            max_per_tenant: Runs simultanés max par tenant
+            max_queue: Taille max de la file (tous tenants)
+            max_queue_per_tenant: Taille max de la file par tenant
+            max_wait: Attente max en file avant rejet (secondes)
+            initial_service_time: Temps de service supposé avant toute mesure (secondes)
+            ewma_alpha: Poids des nouvelles mesures dans la moyenne des temps de service
+        """
+        self.max_concurrent = max_concurrent
+        self.max_per_tenant = max_per_tenant
+        self.max_queue = max_queue
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.max_wait = max_wait
+        self.ewma_alpha = ewma_alpha
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+        # Running
+        self._active = 0
+        self._active_per_tenant: Dict[str, int] = {}
+
+        # Queues (FIFO par tenant) + weighted fair queuing
+        self._queues: Dict[str, Deque[AdmissionTicket]] = {}
+        self._queued = 0
+        self._weights: Dict[str, float] = {}
+        self._vtime: Dict[str, float] = {}
+        self._vclock = 0.0
+
+        # Stats
+        self._avg_service_time = initial_service_time
+        self._admitted_total = 0
+        self._queued_total = 0
+        self._rejected_total = 0
+
+    # ------------------------------------------------------------------ config
+
+    def set_weight(self, tenant: str, weight: float):
+        """Définit le poids WFQ d'un tenant (défaut 1.0; 2.0 = deux fois plus de débit)."""
+        if weight <= 0:
+            raise ValueError("weight must be > 0")
+        with self._lock:
+            self._weights[tenant] = weight
+
+    # ------------------------------------------------------------------ admission
+
+    def enqueue(self, tenant: str) -> AdmissionTicket:
+        """
+        Demande une place pour un run du tenant.
+
+        Le ticket retourné est admis immédiatement s'il reste de la capacité,
+        sinon il attend en file (ticket.wait / ticket.wait_async).
+
+        Raises:
+            AdmissionRejected: Si la file (globale ou du tenant) est pleine
+        """
+        with self._lock:
+            ticket = AdmissionTicket(self, tenant, next(self._seq))
+            tenant_queue = self._queues.get(tenant)
+
+            if (
+                self._queued >= self.max_queue
+                or (tenant_queue is not None and len(tenant_queue) >= self.max_queue_per_tenant)
+            ) and not self._has_capacity(tenant):
+                self._rejected_total += 1
+                retry_after = self._estimate_wait_locked(self._queued + 1)
+                logger.warning(
+                    f"🚦 Admission rejected: tenant={tenant[:8]}... queued={self._queued} retry_after={retry_after}s"
+                )
+                raise AdmissionRejected(
+                    f"Server busy: {self._active} runs active, {self._queued} queued",
+                    retry_after=retry_after
+                )
+
+            if tenant_queue is None:
+                tenant_queue = self._queues[tenant] = deque()
+                # Un tenant qui revient ne récupère pas le "crédit" de son inactivité
+                self._vtime[tenant] = max(self._vtime.get(tenant, 0.0), self._vclock)
+
+            tenant_queue.append(ticket)
+            self._queued += 1
+            self._queued_total += 1
+            self._dispatch_locked()
+
+            if not ticket.granted:
+                logger.info(
+                    f"⏳ Run queued: tenant={tenant[:8]}... position={self._position_locked(ticket)} "
+                    f"active={self._active}/{self.max_concurrent}"
+                )
+
+            return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        """Libère un ticket (admis ou en file). Idempotent."""
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+
+            if ticket.granted:
+                self._active -= 1
+                remaining = self._active_per_tenant.get(ticket.tenant, 1) - 1
+                if remaining > 0:
+                    self._active_per_tenant[ticket.tenant] = remaining
+                else:
+                    self._active_per_tenant.pop(ticket.tenant, None)
+
+                service_time = time.monotonic() - ticket.granted_at
+                self._avg_service_time += self.ewma_alpha * (service_time - self._avg_service_time)
+            else:
+                tenant_queue = self._queues.get(ticket.tenant)
+                if tenant_queue is not None and ticket in tenant_queue:
+                    tenant_queue.remove(ticket)
+                    self._queued -= 1
+                    if not tenant_queue:
+                        del self._queues[ticket.tenant]
+
+            self._dispatch_locked()
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """Position estimée d'un ticket dans l'ordre WFQ (0 si admis ou libéré)."""
+        with self._lock:
+            return self._position_locked(ticket)
+
+    def retry_after(self) -> int:
+        """Délai (secondes) conseillé à un client rejeté."""
+        with self._lock:
+            return self._estimate_wait_locked(self._queued + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques d'admission (pour /v1/pool/stats)."""
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "max_per_tenant": self.max_per_tenant,
+                "queued": self._queued,
+                "max_queue": self.max_queue,
+                "queued_tenants": len(self._queues),
+                "avg_service_time": round(self._avg_service_time, 2),
+                "estimated_wait": self._estimate_wait_locked(self._queued + 1),
+                "admitted_total": self._admitted_total,
+                "queued_total": self._queued_total,
+                "rejected_total": self._rejected_total
+            }
+
+    # ------------------------------------------------------------------ internals
+
+    def _has_capacity(self, tenant: str) -> bool:
+        return (
+            self._active < self.max_concurrent
+            and self._active_per_tenant.get(tenant, 0) < self.max_per_tenant
+        )
+
+    def _dispatch_locked(self):
+        """Admet les tickets en file tant qu'il reste de la capacité (ordre WFQ)."""
+        while self._active < self.max_concurrent and self._queues:
+            best_tenant = None
+            best_finish = math.inf
+            for tenant, tenant_queue in self._queues.items():
+                if self._active_per_tenant.get(tenant, 0) >= self.max_per_tenant:
+                    continue
+                finish = self._vtime[tenant] + 1.0 / self._weights.get(tenant, 1.0)
+                if finish < best_finish or (
+                    finish == best_finish and tenant_queue[0].seq < self._queues[best_tenant][0].seq
+                ):
+                    best_tenant, best_finish = tenant, finish
+
+            if best_tenant is None:
+                return  # Tous les tenants en attente sont à leur cap
+
+            tenant_queue = self._queues[best_tenant]
+            ticket = tenant_queue.popleft()
+            if not tenant_queue:
+                del self._queues[best_tenant]
+            self._queued -= 1
+
+            self._vclock = self._vtime[best_tenant]
+            self._vtime[best_tenant] = best_finish
+            self._active += 1
+            self._active_per_tenant[best_tenant] = self._active_per_tenant.get(best_tenant, 0) + 1
+            self._admitted_total += 1
+            ticket._grant()
+
+    def _position_locked(self, ticket: AdmissionTicket) -> int:
+        if ticket.granted or ticket.released:
+            return 0
+        tenant_queue = self._queues.get(ticket.tenant)
+        if tenant_queue is None or ticket not in tenant_queue:
+            return 0
+
+        def finish_tag(tenant: str, index: int) -> float:
+            return self._vtime[tenant] + (index + 1) / self._weights.get(tenant, 1.0)
+
+        own = (finish_tag(ticket.tenant, tenant_queue.index(ticket)), ticket.seq)
+        ahead = 0
+        for tenant, queue_ in self._queues.items():
+            for index, other in enumerate(queue_):
+                if (finish_tag(tenant, index), other.seq) < own:
+                    ahead += 1
+        return ahead + 1
+
+    def _estimate_wait_locked(self, position: int) -> int:
+        """Attente estimée pour la position donnée: chaque slot libère un run tous les avg_service_time."""
+        wait = position * self._avg_service_time / max(1, self.max_concurrent)
+        return max(1, math.ceil(wait))
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store per tenant.
+
+Les fichiers produits par Claude sont copiés (une seule fois par contenu) dans
+{workspace}/.claude/blobs/<sha[:2]>/<sha256>. Les réponses et les events
+files_batch ne transportent plus que {path, sha256, size}; le client télécharge
+via GET /v1/workspace/blobs/{sha} uniquement les blobs qu'il n'a pas déjà.
+
+- Copie + hash en une passe (par chunks, jamais le fichier entier en mémoire)
+- Fast path (dev, inode, size, mtime_ns): un fichier inchangé n'est pas relu
+- Un blob est immuable: ETag = sha256, Cache-Control immutable
+- Rétention (BlobRetention): mtime d'un blob = dernière référence (stocké à
+  nouveau ou téléchargé); un job supprime les blobs non référencés depuis
+  max_age, puis les plus anciens au-delà de max_bytes par tenant
+- Téléchargement: If-None-Match (304), Range (206/416), corps servi par
+  starlette FileResponse (qui gère aussi Range dans les versions récentes de
+  Starlette; sinon les plages passent par BlobRangeResponse, lectures os.pread)
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Any, List
+import logging
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+logger = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Starlette >= 0.39: FileResponse sert lui-même Range / If-Range (206/416)
+FILE_RESPONSE_RANGES = hasattr(FileResponse, "_handle_single_range")
+
+
+class BlobTooLarge(Exception):
+    """Fichier au-delà de max_blob_size (non stocké)."""
+
+
+class BlobStore:
+    """Blobs d'un tenant, adressés par sha256 du contenu."""
+
+    DIRNAME = "blobs"
+
+    def __init__(self, root: Path, chunk_size: int = 1024 * 1024, max_blob_size: int = 512 * 1024 * 1024):
+        """
+        Args:
+            root: Dossier des blobs ({workspace}/.claude/blobs)
+            chunk_size: Taille des lectures pendant copie + hash
+            max_blob_size: Taille max d'un blob (BlobTooLarge au-delà)
+        """
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_blob_size = max_blob_size
+        self._lock = threading.Lock()
+        self._known: Dict[Tuple[int, int, int, int], str] = {}  # signature stat → sha256
+
+    def put_file(self, path: Path) -> Tuple[str, int]:
+        """
+        Stocke le contenu de path (dédupliqué).
+
+        Returns:
+            (sha256, size)
+
+        Raises:
+            BlobTooLarge: Si le fichier dépasse max_blob_size
+            OSError: Si le fichier ne peut pas être lu
+        """
+        st = os.stat(path)
+        if st.st_size > self.max_blob_size:
+            raise BlobTooLarge(f"{path.name}: {st.st_size} bytes > {self.max_blob_size}")
+
+        signature = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            sha = self._known.get(signature)
+        if sha is not None and self._touch(self._blob_path(sha)):
+            return sha, st.st_size
+
+        self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = self.root / f".{os.getpid()}.{threading.get_ident()}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                while True:
+                    chunk = src.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+
+            sha = digest.hexdigest()
+            target = self._blob_path(sha)
+            if self._touch(target):
+                tmp.unlink()  # Contenu déjà connu: dédupliqué
+            else:
+                target.parent.mkdir(mode=0o700, exist_ok=True)
+                os.replace(tmp, target)
+                logger.debug(f"🧱 Blob stored: {sha[:12]} ({size} bytes)")
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._known[signature] = sha
+        return sha, size
+
+    def get(self, sha: str) -> Optional[Path]:
+        """Chemin du blob (None si sha invalide ou blob inconnu)."""
+        if not SHA256_RE.match(sha):
+            return None
+        path = self._blob_path(sha)
+        return path if path.is_file() and self._touch(path) else None
+
+    def prune(self, max_age: float, max_bytes: int, now: Optional[float] = None) -> Tuple[int, int, int]:
+        """
+        Supprime les blobs non référencés depuis max_age secondes, puis les plus
+        anciens tant que le total dépasse max_bytes (0 = pas de limite).
+
+        Returns:
+            (blobs supprimés, octets libérés, octets restants)
+        """
+        now = now or time.time()
+        blobs: List[Tuple[float, int, str]] = []  # (mtime, size, path)
+        try:
+            shards = [entry.path for entry in os.scandir(self.root) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return 0, 0, 0
+        for shard in shards:
+            try:
+                with os.scandir(shard) as entries:
+                    for entry in entries:
+                        if SHA256_RE.match(entry.name):
+                            st = entry.stat(follow_symlinks=False)
+                            blobs.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                continue
+
+        blobs.sort()  # Plus anciens d'abord
+        total = sum(size for _, size, _ in blobs)
+        removed = freed = 0
+        for mtime, size, path in blobs:
+            if now - mtime <= max_age and (not max_bytes or total <= max_bytes):
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+            total -= size
+        return removed, freed, total
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """Marque le blob comme référencé maintenant (rétention). False si absent."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.root / sha[:2] / sha
+
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(workspace: Path) -> BlobStore:
+    """Blob store du workspace (une instance par workspace)."""
+    key = str(workspace)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = BlobStore(workspace / ".claude" / BlobStore.DIRNAME)
+        return store
+
+
+def drop_blob_store(workspace: Path):
+    """Oublie le blob store du workspace (workspace supprimé)."""
+    with _stores_lock:
+        _stores.pop(str(workspace), None)
+
+
+class BlobRetention:
+    """Job périodique de rétention des blob stores de tous les tenants."""
+
+    def __init__(self, workspaces_root: Path, max_age: float = 7 * 24 * 3600, max_bytes: int = 1024 ** 3,
+                 interval: float = 3600.0):
+        """
+        Args:
+            workspaces_root: Racine des workspaces (un dossier par tenant)
+            max_age: Blobs non référencés depuis max_age secondes supprimés (0 = rétention désactivée)
+            max_bytes: Taille max des blobs d'un tenant, les plus anciens supprimés au-delà (0 = illimité)
+            interval: Période du job (secondes)
+        """
+        self.workspaces_root = workspaces_root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.enabled = max_age > 0
+
+        self._lock = threading.Lock()
+        self._removed = 0
+        self._freed = 0
+        self._stored = 0
+        self._last_run: Optional[float] = None
+
+    def start(self):
+        """Lance le job en arrière-plan (no-op si désactivé)."""
+        if not self.enabled:
+            return
+        threading.Thread(target=self._loop, daemon=True, name="BlobRetention").start()
+        logger.info(f"🧱 Blob retention: unreferenced > {self.max_age:.0f}s, max {self.max_bytes} bytes/tenant")
+
+    def run_once(self):
+        """Un passage sur tous les workspaces."""
+        try:
+            workspaces = [entry for entry in os.scandir(self.workspaces_root) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+
+        now = time.time()
+        stored = 0
+        for workspace in workspaces:
+            root = Path(workspace.path) / ".claude" / BlobStore.DIRNAME
+            try:
+                removed, freed, remaining = BlobStore(root).prune(self.max_age, self.max_bytes, now)
+            except Exception as e:
+                logger.error(f"❌ Blob retention failed for {workspace.name[:8]}...: {e}")
+                continue
+            stored += remaining
+            if removed:
+                logger.info(f"🧱 Pruned {removed} blob(s) for {workspace.name[:8]}... ({freed} bytes)")
+                with self._lock:
+                    self._removed += removed
+                    self._freed += freed
+        with self._lock:
+            self._stored = stored
+            self._last_run = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_age": self.max_age,
+                "max_bytes": self.max_bytes,
+                "stored_bytes": self._stored,
+                "removed": self._removed,
+                "bytes_freed": self._freed,
+                "last_run": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._last_run)) if self._last_run else None
+            }
+
+    def _loop(self):
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+class BlobRangeResponse(Response):
+    """Plage [start, end] d'un blob, par chunks os.pread (Starlette sans Range dans FileResponse)."""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: Dict[str, str]):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = "application/octet-stream"
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+        if scope.get("method") == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            offset = self.start
+            remaining = count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(os.pread, f.fileno(), min(self.chunk_size, remaining), offset)
+                if not chunk:
+                    break  # Blob tronqué (ne devrait pas arriver: blobs immuables)
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse un header Range à plage unique ("bytes=0-99", "bytes=100-", "bytes=-50").
+
+    Returns:
+        (start, end) inclusifs, None si le header est ignoré (syntaxe/multi-plages)
+
+    Raises:
+        ValueError: Si la plage n'est pas satisfiable (→ 416)
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # Suffixe: les N derniers octets
+        if end is None or end == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(0, size - end), size - 1
+
+    if start >= size or (end is not None and end < start):
+        raise ValueError("range not satisfiable")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def build_blob_response(path: Path, sha: str, request_headers: Headers) -> Response:
+    """
+    Réponse HTTP pour un blob: 304 (If-None-Match), 206/416 (Range) ou 200.
+
+    Args:
+        path: Chemin du blob
+        sha: sha256 du blob (ETag)
+        request_headers: Headers de la requête
+    """
+    etag = f'"{sha}"'
+    st = path.stat()
+    size = st.st_size
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Contenu adressé par son hash: ne change jamais
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            return Response(status_code=304, headers=headers)
+
+    if FILE_RESPONSE_RANGES:
+        # 200, ou 206/416 selon Range / If-Range (gérés par FileResponse)
+        return FileResponse(path, headers=headers, media_type="application/octet-stream", stat_result=st)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return BlobRangeResponse(path, start, end, 206, headers)
+
+    return FileResponse(path, headers=headers, media_type="application/octet-stream", stat_result=st)
@@ -46,12 +46,26 @@ import shutil
 import threading
 import queue
 import time
-from typing import Optional, List, Dict, Any, Callable, Iterator
-from dataclasses import dataclass, field
+import asyncio
+import functools
+import itertools
+import heapq
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Callable, Iterator, AsyncIterator, Tuple
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
 from enum import Enum
 import logging
 
+from admission_control import AdmissionController, AdmissionRejected, AdmissionTicket
+from pool_activity import TenantActivityLog
+from pipe_reader import PipeReader
+from event_bridge import EventChannel
+from session_index import get_session_index, is_session_live, drop_session_index
+from transcript_tiering import TranscriptTiering
+from launch_spec import LaunchSpec, LaunchSpecCache, resolve_model
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -138,14 +152,19 @@ class ProcessInfo:
     """Information about a long-running Claude CLI process in the pool."""
     process: subprocess.Popen
     workspace_path: Path
-    stdout_reader: threading.Thread
-    stderr_reader: threading.Thread
-    output_queue: queue.Queue
-    error_queue: queue.Queue
+    output_queue: EventChannel  # Events stdout (None = fin du process), alimentée par le PipeReader
     last_used: float  # Timestamp of last request
     user_id: str
     created_at: float
     session_id: Optional[str] = None
+    process_id: str = ""  # Clé dans le pool
+    fingerprint: str = ""  # Empreinte de la config de lancement (model, session, MCP, thinking)
+    model: Optional[str] = None
+    leased: bool = False  # True tant qu'une requête utilise le process (bail exclusif)
+    requests_served: int = 0
+    prespawned: bool = False  # Pré-lancé par prédiction, pas encore utilisé
+    predicted_return: float = 0.0  # Probabilité de retour estimée au pré-lancement
+    reap_token: int = 0  # Entrée valide de l'expiry heap (les autres sont obsolètes)
 
 
 class SecurityError(Exception):
@@ -170,11 +189,28 @@ class SecureMultiTenantAPI:
     - User A ne peut PAS voir processes de User B
     """
 
+    # Taille max d'une ligne stream-json lue via asyncio (tool results volumineux)
+    STREAM_LINE_LIMIT = 16 * 1024 * 1024
+
     def __init__(
         self,
         workspaces_root: str = "/workspaces",
         security_level: SecurityLevel = SecurityLevel.BALANCED,
-        claude_bin: Optional[str] = None
+        claude_bin: Optional[str] = None,
+        max_concurrent_processes: int = 10,
+        max_processes_per_tenant: int = 3,
+        max_queued_requests: int = 100,
+        pool_processes_per_tenant: int = 3,
+        max_pool_size: int = 20,
+        pool_lease_timeout: float = 120.0,
+        prespawn_budget: int = 2,
+        prespawn_threshold: float = 0.5,
+        transcript_idle_threshold: float = 24 * 3600,
+        transcript_hot_set_size: int = 20,
+        blob_max_age: float = 7 * 24 * 3600,
+        blob_max_bytes: int = 1024 ** 3,
+        workspace_verify_interval: float = 60.0,
+        mcp_gateway: bool = True
     ):
         """
         Initialise l'API multi-tenant sécurisée.
@@ -183,17 +219,75 @@ class SecureMultiTenantAPI:
             workspaces_root: Racine des workspaces utilisateurs
             security_level: Niveau de sécurité (PARANOID, BALANCED, DEVELOPER)
             claude_bin: Path vers binaire Claude (auto-détecté si None)
+            max_concurrent_processes: Runs CLI simultanés max sur l'instance
+            max_processes_per_tenant: Runs CLI simultanés max par utilisateur
+            max_queued_requests: Requêtes max en file d'attente (au-delà: AdmissionRejected / 429)
+            pool_processes_per_tenant: Process CLI max dans le pool par utilisateur
+            max_pool_size: Process CLI max dans le pool, tous utilisateurs (éviction LRU des process idle)
+            pool_lease_timeout: Attente max d'un process libre du pool (secondes)
+            prespawn_budget: Process pré-lancés (non encore utilisés) max dans le pool (0 = désactivé)
+            prespawn_threshold: Probabilité de retour minimale pour pré-lancer un process
+            transcript_idle_threshold: Inactivité (secondes) avant compression zstd d'un transcript (0 = désactivé)
+            transcript_hot_set_size: Transcripts les plus récents gardés en clair par utilisateur
+            blob_max_age: Blobs (file_refs) non référencés depuis blob_max_age secondes supprimés (0 = gardés)
+            blob_max_bytes: Taille max des blobs par utilisateur, les plus anciens supprimés au-delà (0 = illimité)
+            workspace_verify_interval: Période (secondes) de re-vérification d'un workspace déjà préparé
+            mcp_gateway: MCP distants servis par le gateway du serveur (sinon un mcp_proxy.py par process CLI)
         """
         self.workspaces_root = Path(workspaces_root)
         self.security_level = security_level
         self.claude_bin = claude_bin or self._find_claude_binary()
         self._temp_homes: List[str] = []
 
+        # Admission control (cap global + par tenant, fair queuing)
+        self.admission = AdmissionController(
+            max_concurrent=max_concurrent_processes,
+            max_per_tenant=max_processes_per_tenant,
+            max_queue=max_queued_requests
+        )
+
+        # Lecture stdout/stderr de tous les process CLI (un seul thread, epoll)
+        self.pipe_reader = PipeReader()
+
         # Process pool (for multi-request keep-alive)
-        self._process_pool: Dict[str, ProcessInfo] = {}
+        # process_id → ProcessInfo; chaque requête prend un bail exclusif sur un process
+        # dont la config de lancement (fingerprint) correspond à la sienne.
+        # Ordre LRU: le moins récemment utilisé en tête
+        self._process_pool: "OrderedDict[str, ProcessInfo]" = OrderedDict()
         self._pool_lock = threading.Lock()
+        self._pool_available = threading.Condition(self._pool_lock)
+        self._pool_spawning: Dict[str, Tuple[str, str]] = {}  # process_id → (user_id, fingerprint) en cours de spawn
+        self._pool_process_ids = itertools.count(1)
+        self._pool_processes_per_tenant = pool_processes_per_tenant
+        self._max_pool_size = max_pool_size
+        self._evictions: Dict[str, int] = {}  # reason → count
+        self._recent_evictions: deque = deque(maxlen=50)
+        self._pool_lease_timeout = pool_lease_timeout
         self._max_idle_time = 300  # 5 minutes in seconds
-        self._cleanup_interval = 60  # Check every 60 seconds
+
+        # Reaper: expiry min-heap (last_used + max_idle_time, reap_token, process_id),
+        # réveil précis à la prochaine expiration; terminaisons hors lock, en parallèle
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._reap_tokens = itertools.count(1)
+        self._reaper_wakeup = threading.Condition(self._pool_lock)
+        self._teardown_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="PoolTeardown")
+        # Attentes de bail (Condition.wait jusqu'à pool_lease_timeout) hors de l'executor
+        # par défaut de la loop: les to_thread (file chunks, stat, restore) ne sont jamais affamés.
+        # Un thread par run admis: un bail n'attend jamais dans la file de l'executor
+        self._lease_executor = ThreadPoolExecutor(
+            max_workers=max(max_pool_size, max_concurrent_processes), thread_name_prefix="PoolLease"
+        )
+
+        # Predictive pre-spawn (historique d'arrivées persisté par tenant)
+        self.activity = TenantActivityLog()
+        self._prespawn_budget = prespawn_budget
+        self._prespawn_threshold = prespawn_threshold
+        self._prespawning: Dict[str, str] = {}  # process_id → user_id (pré-lancements en cours)
+        self._prespawn_stats = {"issued": 0, "hits": 0, "wasted": 0, "failed": 0, "predicted_sum": 0.0}
+        # Tenants à pré-lancer, consommés par un seul worker (thread "PoolPrespawn")
+        self._prespawn_pending: set = set()
+        self._prespawn_lock = threading.Lock()
+        self._prespawn_wakeup = threading.Event()
 
         # Start cleanup thread
         self._cleanup_thread = threading.Thread(
@@ -206,10 +300,43 @@ class SecureMultiTenantAPI:
         # Créer workspaces root avec permissions appropriées
         self.workspaces_root.mkdir(mode=0o755, exist_ok=True)
 
+        # Launch specs compilées (argv/env/settings/MCP), par empreinte de config
+        self.launch_specs = LaunchSpecCache()
+        self._mcp_gateway_enabled = mcp_gateway
+
+        # Workspaces préparés: user_id → (fingerprint credentials, dernière vérification)
+        self._prepared_workspaces: Dict[str, Tuple[str, float]] = {}
+        self._prepared_lock = threading.Lock()
+        self._workspace_verify_interval = workspace_verify_interval
+        self._prepare_stats = {"hits": 0, "misses": 0, "credential_writes": 0}
+
+        # Cold tier des transcripts de session (restaurés à la demande avant --resume)
+        self.transcript_tiering = TranscriptTiering(
+            self.workspaces_root,
+            idle_threshold=transcript_idle_threshold,
+            hot_set_size=transcript_hot_set_size,
+            is_live=is_session_live  # Sessions d'un process pooled/streaming en cours: jamais compressées
+        )
+        self.transcript_tiering.start()
+
+        # Rétention des blobs (file_refs): âge depuis la dernière référence + taille par tenant
+        from blob_store import BlobRetention
+        self.blob_retention = BlobRetention(self.workspaces_root, max_age=blob_max_age, max_bytes=blob_max_bytes)
+        self.blob_retention.start()
+
+        # Charge l'historique d'activité, pré-lance les tenants probables, puis ceux nettoyés par le reaper
+        threading.Thread(
+            target=self._prespawn_loop,
+            daemon=True,
+            name="PoolPrespawn"
+        ).start()
+
         logger.info(f"🔒 Secure Multi-Tenant API initialized")
         logger.info(f"   Security level: {security_level}")
         logger.info(f"   Workspaces root: {workspaces_root}")
-        logger.info(f"🔄 Process pool cleanup: every {self._cleanup_interval}s, max idle: {self._max_idle_time}s")
+        logger.info(f"🔄 Process pool reaper: max idle: {self._max_idle_time}s, {pool_processes_per_tenant} process(es) per user, max {max_pool_size}")
+        logger.info(f"🔮 Predictive pre-spawn: budget {prespawn_budget}, threshold {prespawn_threshold}")
+        logger.info(f"🚦 Admission: {max_concurrent_processes} concurrent runs, {max_processes_per_tenant} per user, queue {max_queued_requests}")
 
     def _find_claude_binary(self) -> str:
         """Trouve le binaire Claude CLI"""
@@ -270,6 +397,93 @@ class SecureMultiTenantAPI:
         logger.debug(f"✅ Workspace secured: {workspace} (0o700)")
         return workspace
 
+    def _prepare_workspace(self, user_id: str, credentials: UserOAuthCredentials) -> Tuple[Path, Path, Path]:
+        """
+        Prépare le workspace d'un run CLI: workspace, .claude/, tmp/ et .credentials.json.
+
+        Write-once: tant que les credentials (fingerprint) n'ont pas changé et que la
+        dernière vérification date de moins de workspace_verify_interval secondes,
+        un seul stat (.credentials.json, workspace supprimé entre-temps). Sinon: mkdir + vérification des permissions
+        (_setup_user_workspace), credentials réécrites (atomiquement, 0o600)
+        seulement si leur contenu diffère.
+
+        Returns:
+            (user_workspace, claude_dir, tmp_dir)
+
+        Raises:
+            SecurityError: Si permissions incorrectes
+        """
+        creds_data = {
+            "claudeAiOauth": {
+                "accessToken": credentials.access_token,
+                "refreshToken": credentials.refresh_token or "",
+                "expiresAt": credentials.expires_at or 0,
+                "scopes": credentials.scopes or ["user:inference", "user:profile"],
+                "subscriptionType": credentials.subscription_type
+            }
+        }
+        payload = json.dumps(creds_data, indent=2).encode()
+        fingerprint = hashlib.sha256(payload).hexdigest()
+
+        workspace = self.workspaces_root / user_id
+        claude_dir = workspace / ".claude"
+        tmp_dir = workspace / "tmp"
+
+        creds_file = claude_dir / ".credentials.json"
+
+        now = time.monotonic()
+        with self._prepared_lock:
+            prepared = self._prepared_workspaces.get(user_id)
+            cached = prepared is not None and prepared[0] == fingerprint \
+                and now - prepared[1] < self._workspace_verify_interval
+        if cached and creds_file.exists():
+            with self._prepared_lock:
+                self._prepare_stats["hits"] += 1
+            return workspace, claude_dir, tmp_dir
+
+        # Création / re-vérification périodique (permissions, dossiers supprimés)
+        workspace = self._setup_user_workspace(user_id)
+        claude_dir.mkdir(mode=0o700, exist_ok=True)
+        tmp_dir.mkdir(mode=0o700, exist_ok=True)
+
+        # Credentials (Claude CLI needs this file for auth)
+        written = self._write_credentials(creds_file, payload)
+
+        with self._prepared_lock:
+            self._prepared_workspaces[user_id] = (fingerprint, now)
+            self._prepare_stats["misses"] += 1
+            self._prepare_stats["credential_writes"] += 1 if written else 0
+        return workspace, claude_dir, tmp_dir
+
+    @staticmethod
+    def _write_credentials(creds_file: Path, payload: bytes) -> bool:
+        """
+        Écrit creds_file (0o600) si son contenu ou ses permissions diffèrent.
+
+        Écriture atomique (fichier temporaire + rename): le CLI ne lit jamais un fichier partiel.
+
+        Returns:
+            True si le fichier a été (ré)écrit
+        """
+        try:
+            st = creds_file.stat()
+            if st.st_mode & 0o777 == 0o600 and st.st_size == len(payload) and creds_file.read_bytes() == payload:
+                return False
+        except OSError:
+            pass
+
+        tmp = creds_file.with_name(f".credentials.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, creds_file)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        logger.debug(f"✅ Credentials file written: {creds_file}")
+        return True
+
     def _create_temp_credentials(
         self,
         credentials: UserOAuthCredentials,
@@ -464,11 +678,15 @@ class SecureMultiTenantAPI:
     def _build_settings_json(
         self,
         user_workspace: Path,
-        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        artifacts: Optional[List[str]] = None
     ) -> tuple[str, Optional[str]]:
         """
         Construit le JSON pour --settings (permissions) et --mcp-config (MCP servers) séparément.
 
+        artifacts (optionnel) reçoit les fichiers créés dans le workspace (scripts
+        déployés, socket du gateway) dont dépend la config MCP.
+
         Retourne:
             tuple (settings_json, mcp_config_json)
             - settings_json: Permissions seulement
@@ -476,7 +694,8 @@ class SecureMultiTenantAPI:
 
         Supporte:
         - MCP local (subprocess): command + args + env
-        - MCP distant (SSE/StreamableHTTP): via proxy Python généré dynamiquement
+        - MCP distant (SSE/StreamableHTTP): via le gateway MCP du serveur (shim stdio),
+          ou un proxy Python par process si le gateway est désactivé
         """
         # Base: security settings (permissions only)
         settings = self._get_security_settings(user_workspace)
@@ -487,23 +706,40 @@ class SecureMultiTenantAPI:
             mcp_config = {"mcpServers": {}}
 
             for name, config in mcp_servers.items():
-                if config.url:
+                if config.url and self._mcp_gateway_enabled:
+                    # MCP distant → gateway du serveur (connexion + catalogue partagés),
+                    # le CLI lance un shim stdio ↔ socket Unix du tenant
+                    shim_path = user_workspace / "mcp_shim.py"
+                    if not self._deploy_script("mcp_shim.py", shim_path):
+                        continue
+
+                    from mcp_gateway import get_mcp_gateway
+                    socket_path, upstream_id = get_mcp_gateway().register(
+                        user_workspace,
+                        config.transport,
+                        config.url,
+                        streamable_http_path=config.streamable_http_path,
+                        auth_token=config.auth_token
+                    )
+                    mcp_config["mcpServers"][name] = {
+                        "command": "python3",
+                        "args": [str(shim_path), socket_path, upstream_id]
+                    }
+                    if artifacts is not None:
+                        artifacts.extend([str(shim_path), socket_path])
+
+                    logger.info(f"🔌 MCP distant configuré via gateway: {name} ({config.transport} → {config.url})")
+
+                elif config.url:
                     # MCP distant → utiliser le proxy Python
                     # Déployer mcp_proxy.py dans le workspace
                     proxy_path = user_workspace / "mcp_proxy.py"
 
-                    # Copier le proxy générique
-                    import shutil
-                    wrapper_dir = Path(__file__).parent
-                    proxy_template = wrapper_dir / "mcp_proxy.py"
-
-                    if proxy_template.exists():
-                        shutil.copy(proxy_template, proxy_path)
-                        proxy_path.chmod(0o700)
-                        logger.debug(f"✅ MCP proxy deployed: {proxy_path}")
-                    else:
-                        logger.error(f"❌ MCP proxy template not found: {proxy_template}")
+                    # Copier le proxy générique (seulement s'il est absent ou a changé)
+                    if not self._deploy_script("mcp_proxy.py", proxy_path):
                         continue
+                    if artifacts is not None:
+                        artifacts.append(str(proxy_path))
 
                     # Construire les arguments du proxy
                     proxy_args = [str(proxy_path)]
@@ -549,6 +785,152 @@ class SecureMultiTenantAPI:
 
         return json.dumps(settings), mcp_config_json
 
+    @staticmethod
+    def _deploy_script(script_name: str, target: Path) -> bool:
+        """
+        Copie un script MCP (mcp_proxy.py, mcp_shim.py) dans le workspace si la copie est absente ou périmée.
+
+        Returns:
+            False si le template est introuvable
+        """
+        import shutil
+        template = Path(__file__).parent / script_name
+
+        try:
+            template_stat = template.stat()
+        except OSError:
+            logger.error(f"❌ MCP script template not found: {template}")
+            return False
+
+        try:
+            deployed = target.stat()
+            if (deployed.st_size, deployed.st_mtime_ns) == (template_stat.st_size, template_stat.st_mtime_ns):
+                return True
+        except OSError:
+            pass
+
+        shutil.copy2(template, target)  # copy2: mtime conservé (comparaison ci-dessus)
+        target.chmod(0o700)
+        logger.debug(f"✅ MCP script deployed: {target}")
+        return True
+
+    def _launch_spec(
+        self,
+        user_workspace: Path,
+        tmp_dir: Path,
+        credentials: UserOAuthCredentials,
+        model: str,
+        io_mode: str,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        override_security: Optional[Dict] = None
+    ) -> LaunchSpec:
+        """
+        LaunchSpec (argv, env, settings, config MCP) de cette config, compilée une seule fois.
+
+        Args:
+            io_mode: "print", "print-stream" ou "stream-json" (voir launch_spec.IO_MODE_FLAGS)
+        """
+        config = {
+            "claude_bin": self.claude_bin,
+            "workspace": str(user_workspace),
+            "tmp_dir": str(tmp_dir),
+            "credentials": asdict(credentials),
+            "model": model,
+            "fallback_model": fallback_model,
+            "thinking": bool(thinking),
+            "override_security": override_security,
+            "io_mode": io_mode,
+            "mcp_servers": {name: asdict(config) for name, config in sorted((mcp_servers or {}).items())}
+        }
+        return self.launch_specs.get_or_compile(
+            config,
+            lambda fingerprint: self._compile_launch_spec(
+                fingerprint, user_workspace, tmp_dir, credentials, model, io_mode,
+                mcp_servers, fallback_model, thinking, override_security
+            )
+        )
+
+    def _compile_launch_spec(
+        self,
+        fingerprint: str,
+        user_workspace: Path,
+        tmp_dir: Path,
+        credentials: UserOAuthCredentials,
+        model: str,
+        io_mode: str,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        fallback_model: Optional[str],
+        thinking: Optional[bool],
+        override_security: Optional[Dict]
+    ) -> LaunchSpec:
+        """Construit la LaunchSpec (seul endroit où la commande CLI est assemblée)."""
+        from launch_spec import IO_MODE_FLAGS
+
+        argv = [self.claude_bin, "--print", "--model", resolve_model(model)]
+
+        # Fallback model (if primary overloaded)
+        if fallback_model:
+            argv.extend(["--fallback-model", resolve_model(fallback_model)])
+
+        # MCP permissions - ALWAYS skip when MCP servers present
+        if mcp_servers:
+            argv.append("--dangerously-skip-permissions")
+
+        # Build settings with credentials (snake_case format, same as working local test)
+        settings = {
+            "credentials": {
+                "access_token": credentials.access_token,
+                "refresh_token": credentials.refresh_token or "",
+                "expires_at": credentials.expires_at or 0,
+                "scopes": credentials.scopes or ["user:inference", "user:profile"],
+                "subscription_type": credentials.subscription_type
+            }
+        }
+
+        # Add permissions if override provided
+        if override_security:
+            settings["permissions"] = override_security
+
+        # Add extended thinking if provided
+        if thinking:
+            # Claude CLI uses alwaysThinkingEnabled (not thinking object)
+            settings["alwaysThinkingEnabled"] = True
+
+        settings_json = json.dumps(settings)
+        argv.extend(["--settings", settings_json])
+
+        # MCP config separately (as string JSON)
+        mcp_config_json = None
+        artifacts: List[str] = []
+        if mcp_servers:
+            _, mcp_config_json = self._build_settings_json(user_workspace, mcp_servers, artifacts)
+            if mcp_config_json:
+                logger.info(f"🔧 MCP Config: {len(mcp_servers)} server(s)")
+                argv.extend(["--mcp-config", mcp_config_json])
+
+        argv.extend(IO_MODE_FLAGS[io_mode])
+
+        # Environment avec isolation (workspace as HOME)
+        env = (
+            ("HOME", str(user_workspace)),
+            ("PWD", str(user_workspace)),
+            ("PATH", os.environ.get("PATH", "/usr/bin:/bin")),
+            ("TMPDIR", str(tmp_dir))  # Isolated temp
+        )
+
+        logger.debug(f"🧩 Launch spec compiled: {fingerprint[:12]} ({io_mode})")
+        return LaunchSpec(
+            fingerprint=fingerprint,
+            workspace=user_workspace,
+            argv=tuple(argv),
+            env=env,
+            settings_json=settings_json,
+            mcp_config_json=mcp_config_json,
+            artifacts=tuple(artifacts)
+        )
+
     def _secure_cleanup(self, temp_home: str):
         """
         Cleanup sécurisé avec overwrite des credentials.
@@ -581,8 +963,9 @@ class SecureMultiTenantAPI:
         """
         Vérifie si une session Claude CLI existe déjà.
 
-        Claude CLI stocke les sessions dans .claude/ avec des fichiers
-        qui contiennent le session_id dans leur nom ou contenu.
+        Claude CLI stocke les transcripts dans .claude/projects/<cwd-slug>/<session_id>.jsonl.
+        Lookup via l'index des sessions du workspace (O(1), aucun fichier lu).
+        Un transcript compressé (cold tier) est restauré avant --resume.
 
         Args:
             claude_dir: Path vers le répertoire .claude/ de l'utilisateur
@@ -592,37 +975,366 @@ class SecureMultiTenantAPI:
             True si la session existe, False sinon
         """
         try:
-            # Claude CLI stocke les sessions dans .claude/
-            # Chercher des fichiers qui pourraient contenir cette session
-            if not claude_dir.exists():
-                return False
+            return get_session_index(claude_dir.parent).prepare_resume(session_id)
+        except Exception as e:
+            logger.debug(f"Error checking session existence: {e}")
+            return False
 
-            # Vérifier s'il y a des fichiers de session
-            # Claude CLI utilise différents noms de fichiers pour les sessions
-            session_files = list(claude_dir.glob("*"))
+    def admit(self, oauth_token: str) -> AdmissionTicket:
+        """
+        Réserve une place d'exécution CLI pour cet utilisateur.
 
-            # Si aucun fichier, c'est forcément une nouvelle session
-            if not session_files:
-                return False
+        À appeler avant d'ouvrir une réponse streaming: un rejet peut ainsi
+        devenir un 429 HTTP au lieu d'un event d'erreur dans le stream.
+        Passer le ticket via admission_ticket=...; il est libéré par la méthode.
 
-            # Chercher le session_id dans les fichiers
-            for file_path in session_files:
-                if file_path.is_file():
-                    try:
-                        content = file_path.read_text()
-                        if session_id in content:
-                            return True
-                    except Exception:
-                        # Fichier non lisible, ignorer
-                        continue
+        Raises:
+            AdmissionRejected: Si la file d'attente est pleine
+        """
+        return self.admission.enqueue(self._get_user_id_from_token(oauth_token))
+
+    def _acquire_slot(self, user_id: str) -> AdmissionTicket:
+        """Obtient une place admise (bloquant). Raises AdmissionRejected si file pleine ou attente trop longue."""
+        ticket = self.admission.enqueue(user_id)
+        if not ticket.wait(self.admission.max_wait):
+            ticket.release()
+            raise AdmissionRejected(
+                "Timed out waiting for a free Claude CLI slot",
+                retry_after=self.admission.retry_after()
+            )
+        return ticket
 
-            return False
+    async def _aacquire_slot(self, user_id: str) -> AdmissionTicket:
+        """Variante async de _acquire_slot (n'occupe pas l'event loop pendant l'attente)."""
+        ticket = self.admission.enqueue(user_id)
+        try:
+            granted = await ticket.wait_async(self.admission.max_wait)
+        except BaseException:
+            ticket.release()
+            raise
+        if not granted:
+            ticket.release()
+            raise AdmissionRejected(
+                "Timed out waiting for a free Claude CLI slot",
+                retry_after=self.admission.retry_after()
+            )
+        return ticket
 
-        except Exception as e:
-            logger.debug(f"Error checking session existence: {e}")
-            # En cas d'erreur, considérer comme nouvelle session (safe default)
-            return False
+    def _overloaded_event(self, error: AdmissionRejected) -> Dict[str, Any]:
+        """Event SSE d'erreur pour un run refusé par l'admission control."""
+        return {
+            "type": "error",
+            "error": {
+                "message": str(error),
+                "code": "overloaded",
+                "retry_after": error.retry_after
+            }
+        }
+
+    def _queued_event(self, position: int) -> Dict[str, Any]:
+        """Event SSE 'queued' (position dans la file d'admission)."""
+        return {
+            "type": "queued",
+            "position": position,
+            "estimated_wait": self.admission.retry_after() if position else 0
+        }
+
+    def _admitted(
+        self,
+        user_id: str,
+        admission_ticket: Optional[AdmissionTicket],
+        events: Iterator[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Exécute le générateur events une fois le run admis.
+
+        Tant que le ticket attend, émet des events 'queued' avec la position.
+        Le ticket est libéré à la fin du stream (ou à sa fermeture).
+        """
+        try:
+            ticket = admission_ticket or self.admission.enqueue(user_id)
+        except AdmissionRejected as e:
+            events.close()
+            yield self._overloaded_event(e)
+            return
+
+        try:
+            deadline = time.monotonic() + self.admission.max_wait
+            last_position = None
+            while not ticket.granted:
+                position = ticket.position()
+                if position and position != last_position:
+                    last_position = position
+                    yield self._queued_event(position)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield self._overloaded_event(AdmissionRejected(
+                        "Timed out waiting for a free Claude CLI slot",
+                        retry_after=self.admission.retry_after()
+                    ))
+                    return
+                ticket.wait(timeout=min(1.0, remaining))
+
+            yield from events
+        finally:
+            events.close()
+            ticket.release()
+
+    async def _aadmitted(
+        self,
+        user_id: str,
+        admission_ticket: Optional[AdmissionTicket],
+        events: AsyncIterator[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Variante async de _admitted."""
+        try:
+            ticket = admission_ticket or self.admission.enqueue(user_id)
+        except AdmissionRejected as e:
+            await events.aclose()
+            yield self._overloaded_event(e)
+            return
+
+        try:
+            deadline = time.monotonic() + self.admission.max_wait
+            last_position = None
+            while not ticket.granted:
+                position = ticket.position()
+                if position and position != last_position:
+                    last_position = position
+                    yield self._queued_event(position)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield self._overloaded_event(AdmissionRejected(
+                        "Timed out waiting for a free Claude CLI slot",
+                        retry_after=self.admission.retry_after()
+                    ))
+                    return
+                # Réveil périodique pour rafraîchir la position
+                await ticket.wait_async(timeout=min(1.0, remaining))
+
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            ticket.release()
+
+    def _resolve_credentials(
+        self,
+        oauth_token: Optional[str],
+        oauth_credentials: Optional[UserOAuthCredentials]
+    ) -> UserOAuthCredentials:
+        """
+        Normalise oauth_token / oauth_credentials en UserOAuthCredentials.
+
+        Raises:
+            ValueError: Si aucun des deux n'est fourni
+        """
+        if oauth_credentials:
+            return oauth_credentials
+        if oauth_token:
+            return UserOAuthCredentials(access_token=oauth_token)
+        raise ValueError("Either oauth_token or oauth_credentials must be provided")
+
+    def _prepare_message_invocation(
+        self,
+        messages: List[Dict[str, str]],
+        credentials: UserOAuthCredentials,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        session_id: Optional[str],
+        persist_session: bool,
+        model: str,
+        override_security: Optional[Dict],
+        fallback_model: Optional[str],
+        thinking: Optional[bool],
+        stream: bool
+    ) -> tuple[List[str], Dict[str, str], Path, str]:
+        """
+        Prépare workspace, credentials et commande Claude CLI (mode --print).
+
+        Partagé par create_message (sync) et acreate_message (async).
+        Fait du filesystem I/O bloquant: côté async, appeler via asyncio.to_thread.
+
+        Returns:
+            tuple (cmd, env, user_workspace, user_id)
+        """
+        # Extraire user ID depuis token
+        user_id = self._get_user_id_from_token(credentials.access_token)
+        logger.info(f"🔐 Processing request for user: {user_id[:8]}...")
+
+        # Setup workspace isolé (.claude/, tmp/, .credentials.json: écrits seulement si changés)
+        user_workspace, claude_dir, tmp_dir = self._prepare_workspace(user_id, credentials)
+        logger.info(f"📁 Workspace: {user_workspace}")
+
+        # Auto-generate session ID
+        if persist_session and not session_id:
+            session_id = f"{user_id}-conv-{uuid.uuid4()}"
+
+        spec = self._launch_spec(
+            user_workspace, tmp_dir, credentials, model,
+            io_mode="print-stream" if stream else "print",
+            mcp_servers=mcp_servers,
+            fallback_model=fallback_model,
+            thinking=thinking,
+            override_security=override_security
+        )
+
+        # Session management
+        # Only use --resume if session already exists (to avoid "No conversation found" error)
+        resume = None
+        if session_id:
+            if self._session_exists(claude_dir, session_id):
+                resume = session_id
+                logger.debug(f"📂 Resuming existing session: {session_id}")
+            else:
+                logger.debug(f"🆕 Creating new session: {session_id} (will be saved for future resume)")
+                # Note: Claude CLI will automatically create and save the session
+                # Future requests with this session_id will find it and resume
+
+        # Build prompt
+        prompt_parts = []
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            if role == "user":
+                prompt_parts.append(content)
+            elif role == "assistant":
+                prompt_parts.append(f"Assistant: {content}")
+
+        prompt = "\n\n".join(prompt_parts)
+
+        cmd = spec.command(resume=resume, prompt=prompt)
+        env = spec.environ()
+
+        logger.info(f"🚀 Executing Claude CLI in workspace: {user_workspace}")
+        self._log_command(cmd)
+
+        return cmd, env, user_workspace, user_id
+
+    def _log_command(self, cmd: List[str]):
+        """Log la commande CLI (tokens masqués)."""
+        cmd_debug = cmd.copy()
+        for i, arg in enumerate(cmd_debug):
+            if 'sk-ant-' in str(arg):
+                cmd_debug[i] = '***TOKEN***'
+        logger.info(f"🔧 Command: {' '.join(cmd_debug[:10])}...")
+
+    @staticmethod
+    def _validate_files_mode(files_mode: str):
+        if files_mode not in ("changes", "snapshot"):
+            raise ValueError(f"Invalid files_mode: {files_mode} (expected 'changes' or 'snapshot')")
+
+    def _files_checkpoint(self, user_workspace: Path, include_files: bool, files_mode: str) -> Optional[Dict[str, list]]:
+        """Checkpoint du workspace avant le run (include_files en mode "changes"), sinon None."""
+        if not include_files or files_mode != "changes":
+            return None
+        from file_watcher import get_workspace_manifest
+        return get_workspace_manifest(user_workspace).checkpoint()
+
+    def _blob_store(self, user_workspace: Path, file_refs: bool):
+        """Blob store du workspace si les fichiers sont renvoyés en références, sinon None."""
+        if not file_refs:
+            return None
+        from blob_store import get_blob_store
+        return get_blob_store(user_workspace)
+
+    def _build_message_response(
+        self,
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        model: str,
+        user_id: str,
+        user_workspace: Path,
+        stream: bool,
+        include_files: bool,
+        files_checkpoint: Optional[Dict[str, list]] = None,
+        file_refs: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Convertit la sortie d'un run CLI one-shot en réponse API.
+
+        Partagé par create_message (sync) et acreate_message (async).
+
+        Args:
+            files_checkpoint: État du workspace avant le run (include_files en mode
+                "changes"); None = snapshot complet du workspace
+            file_refs: Fichiers stockés comme blobs, réponse {path, sha256, size}
+        """
+        # DEBUG: Always log stderr to see MCP initialization issues
+        if stderr:
+            logger.warning(f"⚠️ Claude CLI stderr: {stderr[:500]}")
+
+        if returncode != 0:
+            error_msg = stderr.strip() or stdout.strip() or "Unknown CLI error"
+            logger.error(f"❌ Claude CLI error (code {returncode}): {error_msg[:500]}")
+            logger.error(f"   stdout: {stdout[:200]}")
+            logger.error(f"   stderr: {stderr[:200]}")
+            return {
+                "type": "error",
+                "error": {
+                    "message": error_msg,
+                    "code": "cli_error"
+                }
+            }
+
+        # Parse response
+        if stream:
+            return {"type": "stream", "stream": stdout}
 
+        try:
+            response = json.loads(stdout)
+            get_session_index(user_workspace).observe(response)
+            logger.info(f"✅ Response received for user: {user_id[:8]}...")
+        except json.JSONDecodeError:
+            response = {
+                "type": "message",
+                "content": [{"type": "text", "text": stdout.strip()}],
+                "model": model,
+                "usage": {}
+            }
+
+        # Add files if requested
+        if include_files and files_checkpoint is not None:
+            # Mode "changes": uniquement les fichiers créés/modifiés/supprimés pendant le run
+            from file_watcher import get_workspace_manifest
+            changes = get_workspace_manifest(user_workspace).changes_since(
+                files_checkpoint, blob_store=self._blob_store(user_workspace, file_refs),
+                large_file_store=self._blob_store(user_workspace, True)  # Gros fichiers: refs blob
+            )
+            files = changes["files"]
+            response["files"] = files
+            response["deleted_files"] = changes["deleted"]
+            response["files_summary"] = {
+                "mode": "changes",
+                "format": "blob" if file_refs else "inline",
+                "total": len(files),
+                "total_size": sum(f["size"] for f in files),
+                "created": sum(1 for f in files if f["change"] == "created"),
+                "modified": sum(1 for f in files if f["change"] == "modified"),
+                "deleted": len(changes["deleted"]),
+                "blob_refs": sum(1 for f in files if "sha256" in f),
+                "skipped_too_large": changes["skipped"]
+            }
+            logger.info(f"📁 Included {len(files)} changed files in response ({len(changes['deleted'])} deleted)")
+        elif include_files:
+            from file_watcher import get_workspace_snapshot
+            skipped = []
+            files = get_workspace_snapshot(
+                user_workspace, blob_store=self._blob_store(user_workspace, file_refs), skipped=skipped,
+                large_file_store=self._blob_store(user_workspace, True)  # Gros fichiers: refs blob
+            )
+            response["files"] = files
+            response["files_summary"] = {
+                "mode": "snapshot",
+                "format": "blob" if file_refs else "inline",
+                "total": len(files),
+                "total_size": sum(f["size"] for f in files),
+                "blob_refs": sum(1 for f in files if "sha256" in f),
+                "skipped_too_large": skipped
+            }
+            logger.info(f"📁 Included {len(files)} files in response")
+
+        return response
 
     def create_message(
         self,
@@ -639,7 +1351,9 @@ class SecureMultiTenantAPI:
         override_security: Optional[Dict] = None,
         fallback_model: Optional[str] = None,
         thinking: Optional[bool] = None,
-        include_files: bool = False
+        include_files: bool = False,
+        files_mode: str = "changes",
+        file_refs: bool = False
     ) -> Dict[str, Any]:
         """
         Crée un message avec isolation workspace complète.
@@ -663,156 +1377,34 @@ class SecureMultiTenantAPI:
             timeout: Timeout en secondes
             stream: Streaming SSE
             override_security: Override security settings
+            include_files: Ajouter les fichiers du workspace à la réponse
+            files_mode: "changes" (créés/modifiés/supprimés pendant le run) ou "snapshot" (workspace complet)
+            file_refs: Fichiers en références {path, sha256, size} (blob store) au lieu du contenu inline
 
         Returns:
             Response JSON de Claude API
         """
-        # Use oauth_credentials if provided, otherwise create from oauth_token
-        if oauth_credentials:
-            credentials = oauth_credentials
-            user_token = credentials.access_token
-        elif oauth_token:
-            credentials = UserOAuthCredentials(access_token=oauth_token)
-            user_token = oauth_token
-        else:
-            raise ValueError("Either oauth_token or oauth_credentials must be provided")
-
-        # Extraire user ID depuis token
-        user_id = self._get_user_id_from_token(user_token)
-        logger.info(f"🔐 Processing request for user: {user_id[:8]}...")
-
-        # Setup workspace isolé
-        user_workspace = self._setup_user_workspace(user_id)
-        logger.info(f"📁 Workspace: {user_workspace}")
+        credentials = self._resolve_credentials(oauth_token, oauth_credentials)
+        self._validate_files_mode(files_mode)
 
+        # Admission control: attend une place libre (AdmissionRejected si file pleine)
+        ticket = self._acquire_slot(self._get_user_id_from_token(credentials.access_token))
         try:
-            # Create .claude dir in workspace for session data
-            claude_dir = user_workspace / ".claude"
-            claude_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create tmp dir in workspace
-            tmp_dir = user_workspace / "tmp"
-            tmp_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create .credentials.json file (Claude CLI needs this file for auth)
-            creds_data = {
-                "claudeAiOauth": {
-                    "accessToken": credentials.access_token,
-                    "refreshToken": credentials.refresh_token or "",
-                    "expiresAt": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscriptionType": credentials.subscription_type
-                }
-            }
-            creds_file = claude_dir / ".credentials.json"
-            creds_file.write_text(json.dumps(creds_data, indent=2))
-            creds_file.chmod(0o600)  # Owner read/write only
-            logger.debug(f"✅ Credentials file created: {creds_file}")
-
-            # Auto-generate session ID
-            if persist_session and not session_id:
-                session_id = f"{user_id}-conv-{uuid.uuid4()}"
-
-            # Build command
-            cmd = [self.claude_bin, "--print"]
-
-            # Model
-            model_map = {
-                "opus": "claude-opus-4-20250514",
-                "sonnet": "claude-sonnet-4-5-20250929",
-                "haiku": "claude-3-5-haiku-20241022"
-            }
-            cmd.extend(["--model", model_map.get(model, model)])
-
-            # Fallback model (if primary overloaded)
-            if fallback_model:
-                cmd.extend(["--fallback-model", model_map.get(fallback_model, fallback_model)])
-
-            # Session management
-            # Only use --resume if session already exists (to avoid "No conversation found" error)
-            if session_id:
-                session_exists = self._session_exists(claude_dir, session_id)
-                if session_exists:
-                    cmd.extend(["--resume", session_id])
-                    logger.debug(f"📂 Resuming existing session: {session_id}")
-                else:
-                    logger.debug(f"🆕 Creating new session: {session_id} (will be saved for future resume)")
-                    # Note: Claude CLI will automatically create and save the session
-                    # Future requests with this session_id will find it and resume
-
-            # MCP permissions - ALWAYS skip when MCP servers present
-            if mcp_servers:
-                cmd.append("--dangerously-skip-permissions")
-
-            # Build settings with credentials (snake_case format, same as working local test)
-            settings = {
-                "credentials": {
-                    "access_token": credentials.access_token,
-                    "refresh_token": credentials.refresh_token or "",
-                    "expires_at": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscription_type": credentials.subscription_type
-                }
-            }
-
-            # Add permissions if override provided
-            if override_security:
-                settings["permissions"] = override_security
-
-            # Add extended thinking if provided
-            if thinking:
-                # Claude CLI uses alwaysThinkingEnabled (not thinking object)
-                settings["alwaysThinkingEnabled"] = True
-
-            settings_json = json.dumps(settings)
-            cmd.extend(["--settings", settings_json])
-
-            # Build and add MCP config separately (as string JSON)
-            mcp_config_json = None
-            if mcp_servers:
-                _, mcp_config_json = self._build_settings_json(user_workspace, mcp_servers)
-                if mcp_config_json:
-                    logger.info(f"🔧 MCP Config: {len(mcp_servers)} server(s)")
-                    cmd.extend(["--mcp-config", mcp_config_json])
-
-            # Output format
-            if stream:
-                cmd.extend(["--output-format", "stream-json", "--include-partial-messages", "--verbose"])
-
-            # Build prompt
-            prompt_parts = []
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                if role == "user":
-                    prompt_parts.append(content)
-                elif role == "assistant":
-                    prompt_parts.append(f"Assistant: {content}")
-
-            prompt = "\n\n".join(prompt_parts)
-
-            # Add '--' separator if MCP config (to prevent prompt being interpreted as --mcp-config argument)
-            if mcp_config_json:
-                cmd.append("--")
-
-            cmd.append(prompt)
-
-            # Environment avec isolation (workspace as HOME)
-            env = {
-                "HOME": str(user_workspace),
-                "PWD": str(user_workspace),
-                "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
-                "TMPDIR": str(tmp_dir)  # Isolated temp
-            }
+            cmd, env, user_workspace, user_id = self._prepare_message_invocation(
+                messages=messages,
+                credentials=credentials,
+                mcp_servers=mcp_servers,
+                session_id=session_id,
+                persist_session=persist_session,
+                model=model,
+                override_security=override_security,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                stream=stream
+            )
+            files_checkpoint = self._files_checkpoint(user_workspace, include_files, files_mode)
 
             # Execute avec CWD = workspace isolé
-            logger.info(f"🚀 Executing Claude CLI in workspace: {user_workspace}")
-            # DEBUG: Log command (mask tokens)
-            cmd_debug = cmd.copy()
-            for i, arg in enumerate(cmd_debug):
-                if 'sk-ant-' in str(arg):
-                    cmd_debug[i] = '***TOKEN***'
-            logger.info(f"🔧 Command: {' '.join(cmd_debug[:10])}...")
             result = subprocess.run(
                 cmd,
                 capture_output=True,
@@ -821,81 +1413,409 @@ class SecureMultiTenantAPI:
                 env=env,
                 cwd=str(user_workspace)  # CRITICAL: CWD isolation
             )
-
-            # DEBUG: Always log stderr to see MCP initialization issues
-            if result.stderr:
-                logger.warning(f"⚠️ Claude CLI stderr: {result.stderr[:500]}")
-
-            if result.returncode != 0:
-                error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown CLI error"
-                logger.error(f"❌ Claude CLI error (code {result.returncode}): {error_msg[:500]}")
-                logger.error(f"   stdout: {result.stdout[:200]}")
-                logger.error(f"   stderr: {result.stderr[:200]}")
-                return {
-                    "type": "error",
-                    "error": {
-                        "message": error_msg,
-                        "code": "cli_error"
-                    }
-                }
-
-            # Parse response
-            if stream:
-                return {"type": "stream", "stream": result.stdout}
-            else:
-                try:
-                    response = json.loads(result.stdout)
-                    logger.info(f"✅ Response received for user: {user_id[:8]}...")
-
-                    # Add files if requested
-                    if include_files:
-                        from file_watcher import get_workspace_snapshot
-                        files = get_workspace_snapshot(user_workspace)
-                        response["files"] = files
-                        response["files_summary"] = {
-                            "total": len(files),
-                            "total_size": sum(f["size"] for f in files)
-                        }
-                        logger.info(f"📁 Included {len(files)} files in response")
-
-                    return response
-                except json.JSONDecodeError:
-                    response_data = {
-                        "type": "message",
-                        "content": [{"type": "text", "text": result.stdout.strip()}],
-                        "model": model,
-                        "usage": {}
-                    }
-
-                    # Add files if requested
-                    if include_files:
-                        from file_watcher import get_workspace_snapshot
-                        files = get_workspace_snapshot(user_workspace)
-                        response_data["files"] = files
-                        response_data["files_summary"] = {
-                            "total": len(files),
-                            "total_size": sum(f["size"] for f in files)
-                        }
-
-                    return response_data
-
         finally:
-            # No cleanup needed - credentials passed via --settings (not in files)
-            pass
+            ticket.release()
+
+        return self._build_message_response(
+            returncode=result.returncode,
+            stdout=result.stdout,
+            stderr=result.stderr,
+            model=model,
+            user_id=user_id,
+            user_workspace=user_workspace,
+            stream=stream,
+            include_files=include_files,
+            files_checkpoint=files_checkpoint,
+            file_refs=file_refs
+        )
 
-    def create_message_streaming(
+    async def acreate_message(
         self,
         messages: List[Dict[str, str]],
-        oauth_credentials: UserOAuthCredentials,
-        model: str = "sonnet",
-        session_id: Optional[str] = None,
+        oauth_token: str = None,
+        oauth_credentials: Optional[UserOAuthCredentials] = None,
         mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
-        fallback_model: Optional[str] = None,
-        thinking: Optional[bool] = None,
-        include_files: bool = False
-    ) -> Iterator[Dict[str, Any]]:
-        """
-        Crée un message avec streaming bidirectionnel (keep-alive connection).
+        session_id: Optional[str] = None,
+        persist_session: bool = False,
+        model: str = "sonnet",
+        skip_mcp_permissions: bool = True,
+        timeout: int = 180,
+        stream: bool = False,
+        override_security: Optional[Dict] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        files_mode: str = "changes",
+        file_refs: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Variante asyncio de create_message (mêmes arguments, même réponse).
+
+        Le CLI tourne via asyncio.create_subprocess_exec avec des pipes
+        non-bloquants: l'event loop reste libre pendant toute la génération,
+        un seul worker uvicorn peut donc servir des centaines de runs en parallèle.
+        Le filesystem I/O (workspace, credentials, snapshot) passe par asyncio.to_thread.
+
+        Raises:
+            subprocess.TimeoutExpired: Si le CLI dépasse timeout (process tué)
+            AdmissionRejected: Si la file d'admission est pleine
+        """
+        credentials = self._resolve_credentials(oauth_token, oauth_credentials)
+        self._validate_files_mode(files_mode)
+
+        # Admission control: attente non-bloquante d'une place libre
+        ticket = await self._aacquire_slot(self._get_user_id_from_token(credentials.access_token))
+        try:
+            cmd, env, user_workspace, user_id = await asyncio.to_thread(
+                self._prepare_message_invocation,
+                messages=messages,
+                credentials=credentials,
+                mcp_servers=mcp_servers,
+                session_id=session_id,
+                persist_session=persist_session,
+                model=model,
+                override_security=override_security,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                stream=stream
+            )
+            files_checkpoint = await asyncio.to_thread(
+                self._files_checkpoint, user_workspace, include_files, files_mode
+            )
+
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                cwd=str(user_workspace)  # CRITICAL: CWD isolation
+            )
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._akill_process(process)
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            except asyncio.CancelledError:
+                # Client parti: ne pas laisser un CLI orphelin
+                await self._akill_process(process)
+                raise
+        finally:
+            ticket.release()
+
+        return await asyncio.to_thread(
+            self._build_message_response,
+            returncode=process.returncode,
+            stdout=stdout.decode("utf-8", errors="replace"),
+            stderr=stderr.decode("utf-8", errors="replace"),
+            model=model,
+            user_id=user_id,
+            user_workspace=user_workspace,
+            stream=stream,
+            include_files=include_files,
+            files_checkpoint=files_checkpoint,
+            file_refs=file_refs
+        )
+
+    async def acreate_message_stream(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_token: str = None,
+        oauth_credentials: Optional[UserOAuthCredentials] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        session_id: Optional[str] = None,
+        persist_session: bool = False,
+        model: str = "sonnet",
+        timeout: int = 180,
+        override_security: Optional[Dict] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        admission_ticket: Optional[AdmissionTicket] = None
+    ) -> AsyncIterator[str]:
+        """
+        Lance un run one-shot en --output-format stream-json et retourne ses lignes au fil de l'eau.
+
+        Contrairement à create_message(stream=True) qui attend la fin du CLI,
+        chaque ligne stream-json est transmise dès que le CLI l'écrit
+        (time-to-first-byte = premier token, erreurs visibles immédiatement).
+
+        Les erreurs de préparation (SecurityError, AdmissionRejected) sont levées par
+        cet appel, avant le premier octet de réponse. Si le run doit attendre une place,
+        des lignes {"type": "queued", "position": n} sont émises avant le spawn.
+        Le process vit aussi longtemps que l'itérateur: il est tué si l'itérateur
+        est fermé avant la fin (déconnexion client).
+
+        Returns:
+            AsyncIterator[str]: lignes stream-json (sans retour à la ligne); un event
+            {"type": "error"} est émis en dernier si le CLI échoue ou dépasse timeout
+        """
+        credentials = self._resolve_credentials(oauth_token, oauth_credentials)
+        ticket = admission_ticket or self.admission.enqueue(
+            self._get_user_id_from_token(credentials.access_token)
+        )
+
+        try:
+            cmd, env, user_workspace, user_id = await asyncio.to_thread(
+                self._prepare_message_invocation,
+                messages=messages,
+                credentials=credentials,
+                mcp_servers=mcp_servers,
+                session_id=session_id,
+                persist_session=persist_session,
+                model=model,
+                override_security=override_security,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                stream=True
+            )
+        except BaseException:
+            ticket.release()
+            raise
+
+        async def spawn() -> asyncio.subprocess.Process:
+            return await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                cwd=str(user_workspace),  # CRITICAL: CWD isolation
+                limit=self.STREAM_LINE_LIMIT
+            )
+
+        return self._aiter_admitted_stream(ticket, spawn, timeout, user_id)
+
+    async def _aiter_admitted_stream(
+        self,
+        ticket: AdmissionTicket,
+        spawn,
+        timeout: float,
+        user_id: str
+    ) -> AsyncIterator[str]:
+        """Attend l'admission (lignes 'queued'), spawn le CLI puis relaie ses lignes. Libère le ticket à la fin."""
+        async def admitted_lines() -> AsyncIterator[str]:
+            lines = self._aiter_stream_lines(await spawn(), timeout, user_id)
+            try:
+                async for line in lines:
+                    yield line
+            finally:
+                await lines.aclose()
+
+        try:
+            async for item in self._aadmitted(user_id, ticket, admitted_lines()):
+                yield item if isinstance(item, str) else json.dumps(item)
+        finally:
+            ticket.release()
+
+    async def _aiter_stream_lines(
+        self,
+        process: asyncio.subprocess.Process,
+        timeout: float,
+        user_id: str
+    ) -> AsyncIterator[str]:
+        """Relaie stdout d'un run stream-json ligne par ligne, dans la limite de timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        stderr_task = asyncio.create_task(process.stderr.read())
+
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    line = await asyncio.wait_for(process.stdout.readline(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    logger.error(f"❌ Claude CLI timed out after {timeout}s for user: {user_id[:8]}...")
+                    await self._akill_process(process)
+                    yield json.dumps({
+                        "type": "error",
+                        "error": {
+                            "message": f"Claude CLI timed out after {timeout}s",
+                            "code": "timeout"
+                        }
+                    })
+                    return
+
+                if not line:
+                    break  # EOF
+
+                text = line.decode("utf-8", errors="replace").rstrip("\n")
+                if text.strip():
+                    yield text
+
+            returncode = await process.wait()
+            stderr = (await stderr_task).decode("utf-8", errors="replace")
+            if stderr:
+                logger.warning(f"⚠️ Claude CLI stderr: {stderr[:500]}")
+
+            if returncode != 0:
+                error_msg = stderr.strip() or "Unknown CLI error"
+                logger.error(f"❌ Claude CLI error (code {returncode}): {error_msg[:500]}")
+                yield json.dumps({
+                    "type": "error",
+                    "error": {
+                        "message": error_msg,
+                        "code": "cli_error"
+                    }
+                })
+            else:
+                logger.info(f"✅ Stream completed for user: {user_id[:8]}...")
+
+        finally:
+            # Process lié à la réponse: client parti → CLI terminé
+            try:
+                await self._aterminate_process(process)
+            except Exception as e:
+                logger.warning(f"⚠️ Error terminating process: {e}")
+            stderr_task.cancel()
+
+    async def _akill_process(self, process: asyncio.subprocess.Process):
+        """Tue un process asyncio et attend sa terminaison (sans bloquer l'event loop)."""
+        if process.returncode is not None:
+            return
+        try:
+            process.kill()
+        except ProcessLookupError:
+            return
+        await process.wait()
+
+    async def _aterminate_process(self, process: asyncio.subprocess.Process, grace: float = 5.0):
+        """terminate() puis kill() après grace secondes (équivalent async de terminate + wait + kill)."""
+        if process.returncode is not None:
+            return
+        try:
+            logger.debug("🛑 Terminating streaming process...")
+            process.terminate()
+            await asyncio.wait_for(process.wait(), timeout=grace)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Process did not terminate, killing: pid={process.pid}")
+            await self._akill_process(process)
+
+    def _prepare_streaming_invocation(
+        self,
+        credentials: UserOAuthCredentials,
+        model: str,
+        session_id: Optional[str],
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        fallback_model: Optional[str],
+        thinking: Optional[bool]
+    ) -> tuple[List[str], Dict[str, str], Path, str]:
+        """
+        Prépare workspace, credentials et commande Claude CLI en mode stream-json bidirectionnel.
+
+        Partagé par create_message_streaming (sync) et acreate_message_streaming (async).
+        Fait du filesystem I/O bloquant: côté async, appeler via asyncio.to_thread.
+
+        Returns:
+            tuple (cmd, env, user_workspace, user_id)
+        """
+        # Extraire user ID depuis token
+        user_id = self._get_user_id_from_token(credentials.access_token)
+        logger.info(f"🔐 Processing streaming request for user: {user_id[:8]}...")
+
+        # Setup workspace isolé (.claude/, tmp/, .credentials.json: écrits seulement si changés)
+        user_workspace, claude_dir, tmp_dir = self._prepare_workspace(user_id, credentials)
+        logger.info(f"📁 Workspace: {user_workspace}")
+
+        spec = self._launch_spec(
+            user_workspace, tmp_dir, credentials, model,
+            io_mode="stream-json",
+            mcp_servers=mcp_servers,
+            fallback_model=fallback_model,
+            thinking=thinking
+        )
+
+        # Session management
+        resume = None
+        if session_id:
+            if self._session_exists(claude_dir, session_id):
+                resume = session_id
+                logger.debug(f"📂 Resuming existing session: {session_id}")
+            else:
+                logger.debug(f"🆕 Creating new session: {session_id}")
+
+        cmd = spec.command(resume=resume)
+        env = spec.environ()
+
+        logger.info(f"🚀 Starting streaming process in workspace: {user_workspace}")
+        self._log_command(cmd)
+
+        return cmd, env, user_workspace, user_id
+
+    def _encode_stream_json_messages(self, messages: List[Dict[str, str]]) -> str:
+        """Sérialise les messages au format stream-json attendu sur stdin (une ligne JSON par message)."""
+        lines = []
+        for msg in messages:
+            message_json = {
+                "type": "user",
+                "message": {
+                    "role": msg.get("role", "user"),
+                    "content": msg.get("content", "")
+                }
+            }
+            lines.append(json.dumps(message_json) + "\n")
+        return "".join(lines)
+
+    def create_message_streaming(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        admission_ticket: Optional[AdmissionTicket] = None,
+        file_refs: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Crée un message avec streaming bidirectionnel, sous admission control.
+
+        Si l'instance est saturée, des events {"type": "queued", "position": n}
+        sont émis pendant l'attente; un event d'erreur "overloaded" (avec
+        retry_after) termine le stream si la file est pleine. Le spawn n'a lieu
+        qu'une fois le run admis. Voir _run_message_streaming pour le détail.
+
+        Args:
+            admission_ticket: Ticket déjà obtenu via admit() (sinon pris ici)
+            file_refs: Events fichiers {path, sha256, size} (blobs) au lieu du contenu inline
+
+        Yields:
+            Dict[str, Any]: Events SSE (queued, content_block_delta, message_stop, etc.)
+        """
+        return self._admitted(
+            self._get_user_id_from_token(oauth_credentials.access_token),
+            admission_ticket,
+            self._run_message_streaming(
+                messages=messages,
+                oauth_credentials=oauth_credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                include_files=include_files,
+                file_refs=file_refs
+            )
+        )
+
+    def _run_message_streaming(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        file_refs: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Crée un message avec streaming bidirectionnel (keep-alive connection).
 
         Cette méthode utilise le mode stream-json de Claude CLI pour maintenir
         une connexion persistante avec stdin/stdout ouverts.
@@ -916,179 +1836,50 @@ class SecureMultiTenantAPI:
         Yields:
             Dict[str, Any]: Events SSE (content_block_delta, message_stop, etc.)
         """
-        user_token = oauth_credentials.access_token
-        credentials = oauth_credentials
-
-        # Extraire user ID depuis token
-        user_id = self._get_user_id_from_token(user_token)
-        logger.info(f"🔐 Processing streaming request for user: {user_id[:8]}...")
+        cmd, env, user_workspace, user_id = self._prepare_streaming_invocation(
+            credentials=oauth_credentials,
+            model=model,
+            session_id=session_id,
+            mcp_servers=mcp_servers,
+            fallback_model=fallback_model,
+            thinking=thinking
+        )
 
-        # Setup workspace isolé
-        user_workspace = self._setup_user_workspace(user_id)
-        logger.info(f"📁 Workspace: {user_workspace}")
+        # Execute avec Popen (keep stdin/stdout open)
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            cwd=str(user_workspace),
+            bufsize=1  # Line buffered
+        )
 
         try:
-            # Create .claude dir in workspace for session data
-            claude_dir = user_workspace / ".claude"
-            claude_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create tmp dir in workspace
-            tmp_dir = user_workspace / "tmp"
-            tmp_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create .credentials.json file
-            creds_data = {
-                "claudeAiOauth": {
-                    "accessToken": credentials.access_token,
-                    "refreshToken": credentials.refresh_token or "",
-                    "expiresAt": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscriptionType": credentials.subscription_type
-                }
-            }
-            creds_file = claude_dir / ".credentials.json"
-            creds_file.write_text(json.dumps(creds_data, indent=2))
-            creds_file.chmod(0o600)  # Owner read/write only
-            logger.debug(f"✅ Credentials file created: {creds_file}")
-
-            # Build command with streaming flags
-            cmd = [self.claude_bin, "--print"]
-
-            # Model
-            model_map = {
-                "opus": "claude-opus-4-20250514",
-                "sonnet": "claude-sonnet-4-5-20250929",
-                "haiku": "claude-3-5-haiku-20241022"
-            }
-            cmd.extend(["--model", model_map.get(model, model)])
-
-            # Fallback model (if primary overloaded)
-            if fallback_model:
-                cmd.extend(["--fallback-model", model_map.get(fallback_model, fallback_model)])
-
-            # Session management
-            if session_id:
-                session_exists = self._session_exists(claude_dir, session_id)
-                if session_exists:
-                    cmd.extend(["--resume", session_id])
-                    logger.debug(f"📂 Resuming existing session: {session_id}")
-                else:
-                    logger.debug(f"🆕 Creating new session: {session_id}")
-
-            # MCP permissions - ALWAYS skip when MCP servers present
-            if mcp_servers:
-                cmd.append("--dangerously-skip-permissions")
-
-            # Build settings with credentials
-            settings = {
-                "credentials": {
-                    "access_token": credentials.access_token,
-                    "refresh_token": credentials.refresh_token or "",
-                    "expires_at": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscription_type": credentials.subscription_type
-                }
-            }
-
-            # Add extended thinking if provided
-            if thinking:
-                # Claude CLI uses alwaysThinkingEnabled (not thinking object)
-                settings["alwaysThinkingEnabled"] = True
-
-            settings_json = json.dumps(settings)
-            cmd.extend(["--settings", settings_json])
-
-            # Build and add MCP config separately
-            mcp_config_json = None
-            if mcp_servers:
-                _, mcp_config_json = self._build_settings_json(user_workspace, mcp_servers)
-                if mcp_config_json:
-                    logger.info(f"🔧 MCP Config: {len(mcp_servers)} server(s)")
-                    cmd.extend(["--mcp-config", mcp_config_json])
-
-            # STREAMING MODE: Add stream-json flags
-            cmd.extend([
-                "--input-format", "stream-json",
-                "--output-format", "stream-json",
-                "--include-partial-messages",
-                "--verbose"  # Required with --print + stream-json
-            ])
-
-            # Environment avec isolation
-            env = {
-                "HOME": str(user_workspace),
-                "PWD": str(user_workspace),
-                "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
-                "TMPDIR": str(tmp_dir)
-            }
-
-            # Execute avec Popen (keep stdin/stdout open)
-            logger.info(f"🚀 Starting streaming process in workspace: {user_workspace}")
+            # stdout/stderr lus par le pipe reader partagé (events → output_queue, None = fin)
+            output_queue = EventChannel()
+            self._attach_process_pipes(process, output_queue, user_workspace)
 
-            # DEBUG: Log command (mask tokens)
-            cmd_debug = cmd.copy()
-            for i, arg in enumerate(cmd_debug):
-                if 'sk-ant-' in str(arg):
-                    cmd_debug[i] = '***TOKEN***'
-            logger.info(f"🔧 Command: {' '.join(cmd_debug[:10])}...")
-
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                cwd=str(user_workspace),
-                bufsize=1  # Line buffered
-            )
-
-            # Queue for thread-safe communication
-            output_queue: queue.Queue = queue.Queue()
-            error_queue: queue.Queue = queue.Queue()
-
-            # Thread to read stdout continuously
-            def read_stdout():
-                try:
-                    for line in process.stdout:
-                        if line.strip():
-                            try:
-                                event = json.loads(line)
-                                output_queue.put(event)
-                            except json.JSONDecodeError:
-                                logger.warning(f"⚠️ Failed to parse JSON: {line[:100]}")
-                except Exception as e:
-                    logger.error(f"❌ Error reading stdout: {e}")
-                    error_queue.put(str(e))
-                finally:
-                    output_queue.put(None)  # Signal end of stream
-
-            # Thread to read stderr
-            def read_stderr():
-                try:
-                    for line in process.stderr:
-                        if line.strip():
-                            logger.warning(f"⚠️ Claude CLI stderr: {line.strip()}")
-                except Exception as e:
-                    logger.error(f"❌ Error reading stderr: {e}")
-
-            # Start reader threads
-            stdout_thread = threading.Thread(target=read_stdout, daemon=True)
-            stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-            stdout_thread.start()
-            stderr_thread.start()
+            # File Watcher setup (if include_files enabled), avant l'envoi du message:
+            # les fichiers écrits dès le début du run ne sont pas manqués.
+            # Les batches fichiers arrivent dans output_queue, traités par le thread du watcher
+            file_watcher = None
+            file_watcher_handler = None
+            if include_files:
+                from file_watcher import watch_workspace_production, iter_file_chunks
 
-            # Send messages via stdin
-            for msg in messages:
-                message_json = {
-                    "type": "user",
-                    "message": {
-                        "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
-                    }
-                }
+                file_watcher = watch_workspace_production(
+                    user_workspace, output_queue, blob_store=self._blob_store(user_workspace, file_refs)
+                )
+                file_watcher_handler = file_watcher.__enter__()
+                logger.info("📁 File watcher started (real-time mode)")
 
-                message_str = json.dumps(message_json) + "\n"
+            # Generator: yield events from the queue (Claude + Files)
+            try:
+                # Send messages via stdin
+                message_str = self._encode_stream_json_messages(messages)
                 logger.debug(f"📤 Sending message: {message_str[:100]}...")
 
                 try:
@@ -1105,48 +1896,9 @@ class SecureMultiTenantAPI:
                     }
                     return
 
-            # File Watcher setup (if include_files enabled)
-            file_watcher = None
-            file_queue = None
-            if include_files:
-                from queue import Queue
-                from file_watcher import watch_workspace_production
-
-                file_queue = Queue()
-                file_watcher = watch_workspace_production(user_workspace, file_queue)
-                file_watcher_handler = file_watcher.__enter__()
-                logger.info("📁 File watcher started (real-time mode)")
-
-            # Generator: yield events from queues (Claude + Files)
-            try:
                 while True:
                     try:
-                        # Check for errors first
-                        if not error_queue.empty():
-                            error = error_queue.get_nowait()
-                            yield {
-                                "type": "error",
-                                "error": {
-                                    "message": error,
-                                    "code": "stream_error"
-                                }
-                            }
-                            break
-
-                        # Process file watcher events (if enabled)
-                        if include_files and file_watcher_handler:
-                            file_watcher_handler.process_pending()
-
-                            # Check file queue for events
-                            if file_queue and not file_queue.empty():
-                                try:
-                                    file_event = file_queue.get_nowait()
-                                    logger.info(f"📄 File event: {file_event['type']}")
-                                    yield file_event
-                                except:
-                                    pass
-
-                        # Get next event from Claude output queue (with timeout)
+                        # Get next event from output queue (with timeout)
                         event = output_queue.get(timeout=0.1)
 
                         if event is None:
@@ -1154,34 +1906,24 @@ class SecureMultiTenantAPI:
                             logger.info(f"✅ Stream completed for user: {user_id[:8]}...")
 
                             # Send final file batch if any pending
-                            if include_files and file_watcher_handler:
-                                file_watcher_handler.process_pending()
-                                while not file_queue.empty():
-                                    try:
-                                        file_event = file_queue.get_nowait()
-                                        yield file_event
-                                    except:
-                                        break
+                            if file_watcher_handler:
+                                file_watcher_handler.finish()
+                                while not output_queue.empty():
+                                    event = output_queue.get_nowait()
+                                    yield event
+                                    if isinstance(event, dict) and event.get("type") == "files_batch":
+                                        yield from iter_file_chunks(user_workspace, event)
 
                             break
 
                         yield event
+                        if isinstance(event, dict) and event.get("type") == "files_batch":
+                            logger.info(f"📄 File event: {event['type']}")
+                            # Gros fichiers: chunks lus au rythme du consumer
+                            yield from iter_file_chunks(user_workspace, event)
 
                     except queue.Empty:
-                        # No event yet, continue waiting
-
-                        # Process file watcher even if no Claude events
-                        if include_files and file_watcher_handler:
-                            file_watcher_handler.process_pending()
-
-                            if file_queue and not file_queue.empty():
-                                try:
-                                    file_event = file_queue.get_nowait()
-                                    yield file_event
-                                except:
-                                    pass
-
-                        # Check if process died
+                        # No event yet: check if process died
                         if process.poll() is not None:
                             # Process terminated
                             logger.warning(f"⚠️ Process terminated with code {process.returncode}")
@@ -1222,6 +1964,228 @@ class SecureMultiTenantAPI:
                 except:
                     pass
 
+    def acreate_message_streaming(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        admission_ticket: Optional[AdmissionTicket] = None,
+        file_refs: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante asyncio de create_message_streaming (même admission control).
+
+        Yields:
+            Dict[str, Any]: Events SSE (queued, content_block_delta, message_stop, etc.)
+        """
+        return self._aadmitted(
+            self._get_user_id_from_token(oauth_credentials.access_token),
+            admission_ticket,
+            self._arun_message_streaming(
+                messages=messages,
+                oauth_credentials=oauth_credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                include_files=include_files,
+                file_refs=file_refs
+            )
+        )
+
+    async def _arun_message_streaming(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        file_refs: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante asyncio de create_message_streaming (mêmes arguments, mêmes events).
+
+        Le CLI est lancé via asyncio.create_subprocess_exec: stdout/stderr sont lus
+        par des tasks asyncio (pipes non-bloquants), aucun thread n'est tenu pendant
+        le stream. Le process est terminé quand le générateur est fermé
+        (fin normale, erreur ou déconnexion du client).
+
+        Yields:
+            Dict[str, Any]: Events SSE (content_block_delta, message_stop, etc.)
+        """
+        cmd, env, user_workspace, user_id = await asyncio.to_thread(
+            self._prepare_streaming_invocation,
+            credentials=oauth_credentials,
+            model=model,
+            session_id=session_id,
+            mcp_servers=mcp_servers,
+            fallback_model=fallback_model,
+            thinking=thinking
+        )
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=str(user_workspace),
+            limit=self.STREAM_LINE_LIMIT
+        )
+
+        # Events Claude (tasks de lecture) + batches fichiers (thread du watcher)
+        output_queue = EventChannel()
+        readers: List[asyncio.Task] = []
+        file_watcher = None
+
+        try:
+            # Task to read stdout continuously (sessions vivantes jusqu'à l'EOF)
+            sessions = get_session_index(user_workspace).open_stream()
+
+            async def read_stdout():
+                try:
+                    async for line in process.stdout:
+                        if line.strip():
+                            try:
+                                event = json.loads(line)
+                                sessions.observe(event)
+                                output_queue.put(event)
+                            except json.JSONDecodeError:
+                                logger.warning(f"⚠️ Failed to parse JSON: {line[:100]}")
+                except Exception as e:
+                    logger.error(f"❌ Error reading stdout: {e}")
+                    output_queue.put({
+                        "type": "error",
+                        "error": {
+                            "message": str(e),
+                            "code": "stream_error"
+                        }
+                    })
+                finally:
+                    sessions.close()
+                    output_queue.put(None)  # Signal end of stream
+
+            # Task to read stderr
+            async def read_stderr():
+                try:
+                    async for line in process.stderr:
+                        if line.strip():
+                            logger.warning(f"⚠️ Claude CLI stderr: {line.decode(errors='replace').strip()}")
+                except Exception as e:
+                    logger.error(f"❌ Error reading stderr: {e}")
+
+            readers = [
+                asyncio.create_task(read_stdout()),
+                asyncio.create_task(read_stderr())
+            ]
+
+            # File Watcher setup (if include_files enabled), avant l'envoi du message:
+            # les fichiers écrits dès le début du run ne sont pas manqués.
+            # Les batches fichiers arrivent dans output_queue, traités par le thread du watcher
+            file_watcher_handler = None
+            if include_files:
+                from file_watcher import watch_workspace_production
+
+                file_watcher = watch_workspace_production(
+                    user_workspace, output_queue, blob_store=self._blob_store(user_workspace, file_refs)
+                )
+                file_watcher_handler = await asyncio.to_thread(file_watcher.__enter__)
+                logger.info("📁 File watcher started (real-time mode)")
+
+            # Send messages via stdin
+            message_str = self._encode_stream_json_messages(messages)
+            logger.debug(f"📤 Sending message: {message_str[:100]}...")
+
+            try:
+                process.stdin.write(message_str.encode("utf-8"))
+                await process.stdin.drain()
+            except Exception as e:
+                logger.error(f"❌ Error writing to stdin: {e}")
+                yield {
+                    "type": "error",
+                    "error": {
+                        "message": f"Failed to send message: {str(e)}",
+                        "code": "stdin_error"
+                    }
+                }
+                return
+
+            while True:
+                event = await output_queue.aget()
+
+                if event is None:
+                    # End of stream
+                    returncode = await process.wait()
+                    if returncode != 0:
+                        logger.warning(f"⚠️ Process terminated with code {returncode}")
+                    else:
+                        logger.info(f"✅ Stream completed for user: {user_id[:8]}...")
+
+                    # Send final file batch if any pending
+                    if file_watcher_handler:
+                        await asyncio.to_thread(file_watcher_handler.finish)
+                        while not output_queue.empty():
+                            event = output_queue.get_nowait()
+                            yield event
+                            if isinstance(event, dict) and event.get("type") == "files_batch":
+                                async for chunk in self._aiter_file_chunks(user_workspace, event):
+                                    yield chunk
+                    break
+
+                yield event
+                if isinstance(event, dict) and event.get("type") == "files_batch":
+                    logger.info(f"📄 File event: {event['type']}")
+                    async for chunk in self._aiter_file_chunks(user_workspace, event):
+                        yield chunk
+
+                if isinstance(event, dict) and event.get("type") == "error" \
+                        and event.get("error", {}).get("code") == "stream_error":
+                    break
+
+        finally:
+            # Stop file watcher
+            if file_watcher:
+                try:
+                    await asyncio.to_thread(file_watcher.__exit__, None, None, None)
+                    logger.info("📁 File watcher stopped")
+                except Exception as e:
+                    logger.warning(f"⚠️ Error stopping file watcher: {e}")
+
+            # Cleanup: terminate process if still running
+            try:
+                await self._aterminate_process(process)
+            except Exception as e:
+                logger.warning(f"⚠️ Error terminating process: {e}")
+
+            for task in readers:
+                task.cancel()
+
+    @staticmethod
+    async def _aiter_file_chunks(user_workspace: Path, batch: Dict[str, Any]):
+        """
+        Events file_chunk d'un files_batch (gros fichiers), lus dans un thread un par un.
+
+        Le chunk suivant n'est lu qu'une fois le précédent consommé: mémoire bornée à un
+        chunk par stream, rythme imposé par le client SSE.
+        """
+        from file_watcher import iter_file_chunks
+
+        chunks = iter_file_chunks(user_workspace, batch)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
     def get_workspace_path(self, oauth_token: str) -> Path:
         """
         Retourne le workspace path pour un utilisateur.
@@ -1237,6 +2201,23 @@ class SecureMultiTenantAPI:
         user_id = self._get_user_id_from_token(oauth_token)
         return self._setup_user_workspace(user_id)
 
+    def get_blob_path(self, oauth_token: str, sha256: str) -> Optional[Path]:
+        """
+        Retourne le chemin d'un blob du workspace de l'utilisateur.
+
+        Les blobs sont isolés par tenant: un sha connu d'un autre tenant
+        n'est pas accessible.
+
+        Args:
+            oauth_token: Token OAuth user
+            sha256: Hash du contenu (64 hex)
+
+        Returns:
+            Path du blob, None si sha invalide ou blob inconnu
+        """
+        from blob_store import get_blob_store
+        return get_blob_store(self.get_workspace_path(oauth_token)).get(sha256)
+
     def cleanup_workspace(self, oauth_token: str, confirm: bool = False):
         """
         Supprime le workspace d'un utilisateur (DESTRUCTIF).
@@ -1257,286 +2238,692 @@ class SecureMultiTenantAPI:
         user_id = self._get_user_id_from_token(oauth_token)
         workspace = self.workspaces_root / user_id
 
+        # Workspace préparé en cache: recréé (dossiers + credentials) au prochain run
+        with self._prepared_lock:
+            self._prepared_workspaces.pop(user_id, None)
+        # Specs compilées: scripts MCP redéployés, gateway ré-enregistré
+        self.launch_specs.evict(workspace)
+
+        # Process du pool de l'utilisateur (libres ou en plein tour): leur workspace disparaît
+        with self._pool_available:
+            doomed = [
+                self._detach_process_locked(info.process_id, reason="workspace_deleted")
+                for info in list(self._process_pool.values()) if info.user_id == user_id
+            ]
+            self._pool_available.notify_all()
+        for info in doomed:
+            self._dispose_process(info)
+        if doomed:
+            logger.info(f"🛑 Terminating {len(doomed)} pooled process(es) of deleted workspace: user={user_id[:8]}...")
+
+        # Instances par workspace et historique d'activité (plus de pré-lancement pour ce tenant)
+        self.activity.forget(user_id)
+        drop_session_index(workspace)
+        from file_watcher import drop_workspace_manifest
+        drop_workspace_manifest(workspace)
+        from blob_store import drop_blob_store
+        drop_blob_store(workspace)
+
+        if self._mcp_gateway_enabled:
+            from mcp_gateway import get_mcp_gateway
+            get_mcp_gateway().unregister(workspace)
+
         if workspace.exists():
             shutil.rmtree(workspace)
             logger.info(f"🗑️ Workspace deleted: {workspace}")
         else:
             logger.warning(f"⚠️ Workspace not found: {workspace}")
 
-    # =============================================================================
-    # PROCESS POOL (Multi-Request Keep-Alive)
-    # =============================================================================
+    # =============================================================================
+    # PROCESS POOL (Multi-Request Keep-Alive)
+    # =============================================================================
+
+    def _cleanup_loop(self):
+        """
+        Background thread pour cleanup automatique des processes idle.
+
+        Sleeps until the earliest expiry of the heap (or until a nearer expiry is
+        scheduled), detaches the expired idle processes atomically under the lock,
+        then hands them to the teardown executor: no terminate/wait ever runs
+        while the pool lock is held. Leased processes are never cleaned up.
+        """
+        logger.info(f"🔄 Process pool cleanup thread started")
+
+        while True:
+            try:
+                with self._pool_lock:
+                    expired = self._pop_expired_locked()
+                    while not expired:
+                        timeout = self._expiry_heap[0][0] - time.time() if self._expiry_heap else None
+                        self._reaper_wakeup.wait(timeout=timeout)
+                        expired = self._pop_expired_locked()
+
+                    self._pool_available.notify_all()
+
+                for info in expired:
+                    self._dispose_process(info)
+
+                logger.info(f"✅ Cleaned up {len(expired)} idle process(es)")
+                self._schedule_prespawn({info.user_id for info in expired})
+
+            except Exception as e:
+                logger.error(f"❌ Error in cleanup loop: {e}")
+                time.sleep(1)
+
+    def _pop_expired_locked(self) -> List[ProcessInfo]:
+        """
+        Detach every idle process whose expiry has passed. Must be called with _pool_lock held.
+
+        Heap entries are invalidated lazily: an entry whose reap_token no longer
+        matches its process (re-leased, released again, or already removed) is dropped.
+        """
+        now = time.time()
+        expired = []
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, reap_token, process_id = heapq.heappop(self._expiry_heap)
+            info = self._process_pool.get(process_id)
+            if info is None or info.leased or info.reap_token != reap_token:
+                continue
+
+            logger.info(f"🧹 Cleanup idle process: user={info.user_id[:8]}... idle={now - info.last_used:.1f}s")
+            self._detach_process_locked(process_id, reason="idle_timeout")
+            expired.append(info)
+
+        return expired
+
+    def _schedule_reap_locked(self, info: ProcessInfo):
+        """
+        Schedule the expiry of an idle process (last_used + max_idle_time). Lock required.
+
+        Supersedes any earlier entry of the process; wakes the reaper if this
+        expiry is now the earliest one.
+        """
+        info.reap_token = next(self._reap_tokens)
+        entry = (info.last_used + self._max_idle_time, info.reap_token, info.process_id)
+        heapq.heappush(self._expiry_heap, entry)
+        if self._expiry_heap[0] is entry:
+            self._reaper_wakeup.notify()
+
+    def _dispose_process(self, info: ProcessInfo):
+        """Terminate a detached process in the background (never blocks the caller)."""
+        self._teardown_executor.submit(self._terminate_pooled_process, info)
+
+    def _detach_process_locked(self, process_id: str, reason: str) -> Optional[ProcessInfo]:
+        """
+        Remove a process from the pool (without terminating it).
+
+        IMPORTANT: Must be called with _pool_lock held!
+
+        Args:
+            process_id: Pool key of the process
+            reason: Eviction reason (idle_timeout, lru_capacity, config_replaced,
+                incomplete_turn, process_died, workspace_deleted), counted in get_pool_stats
+        """
+        info = self._process_pool.pop(process_id, None)
+        if info is None:
+            return None
+
+        if info.prespawned:
+            # Pre-spawned but never leased: the prediction missed
+            self._prespawn_stats["wasted"] += 1
+
+        self._evictions[reason] = self._evictions.get(reason, 0) + 1
+        self._recent_evictions.append({
+            "user_id": info.user_id[:8] + "...",
+            "pid": info.process.pid,
+            "reason": reason,
+            "idle_time": round(time.time() - info.last_used, 1),
+            "requests_served": info.requests_served,
+            "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        })
+        return info
+
+    def _lru_idle_process_locked(self) -> Optional[ProcessInfo]:
+        """Least recently used process that is not leased (None if all are leased). Lock required."""
+        for info in self._process_pool.values():
+            if not info.leased:
+                return info
+        return None
+
+    def _terminate_pooled_process(self, info: ProcessInfo):
+        """Terminate a pooled process (terminate, then kill after 5s)."""
+        try:
+            if info.process.poll() is None:
+                logger.debug(f"🛑 Terminating process for user: {info.user_id[:8]}...")
+                info.process.terminate()
+                try:
+                    info.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    logger.warning(f"⚠️ Process did not terminate, killing: {info.user_id[:8]}...")
+                    info.process.kill()
+                    info.process.wait()
+
+            # Delete workspace (optional - can keep for next request)
+            # if info.workspace_path.exists():
+            #     shutil.rmtree(info.workspace_path)
+            #     logger.debug(f"🗑️ Workspace deleted: {info.workspace_path}")
+
+        except Exception as e:
+            logger.error(f"❌ Error cleaning up process for {info.user_id[:8]}: {e}")
+
+    def _launch_config(
+        self,
+        model: str,
+        session_id: Optional[str],
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Config de lancement d'un process du pool, sérialisable JSON."""
+        return {
+            "model": model,
+            "fallback_model": fallback_model,
+            "session_id": session_id,
+            "thinking": bool(thinking),
+            "mcp_servers": {
+                name: asdict(config)
+                for name, config in sorted((mcp_servers or {}).items())
+            }
+        }
+
+    def _launch_fingerprint(self, launch_config: Dict[str, Any]) -> str:
+        """
+        Empreinte de la config de lancement d'un process du pool.
+
+        Deux requêtes ne partagent un process que si le CLI aurait été lancé
+        avec exactement les mêmes flags (model, session, MCP, thinking).
+        """
+        return hashlib.sha256(json.dumps(launch_config, sort_keys=True).encode()).hexdigest()
+
+    def _lease_process(
+        self,
+        user_id: str,
+        credentials: UserOAuthCredentials,
+        model: str,
+        session_id: Optional[str],
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        deadline: Optional[float] = None
+    ) -> ProcessInfo:
+        """
+        Take an exclusive lease on a pooled process matching the launch config.
+
+        - Free warm process with the same fingerprint → reused
+        - Same session already running in another process → wait for it
+          (one conversation = one process, turns are serialized)
+        - Otherwise, below pool_processes_per_tenant → new process spawned
+        - At the cap: an idle process of this user with another config is replaced,
+          or the request waits for a lease to be released (pool_lease_timeout)
+        - Pool full (max_pool_size): the least recently used idle process of any
+          user is evicted; leased processes are never evicted
+
+        The caller MUST call _release_process(info, ...) once the turn is over.
+
+        Args:
+            user_id: User ID (hash of token)
+            credentials: OAuth credentials
+            model: Claude model
+            session_id: Session ID for resume
+            mcp_servers: MCP servers config
+            fallback_model: Fallback model if primary overloaded
+            thinking: Enable extended thinking
+            deadline: time.monotonic() deadline of the wait (default: now + pool_lease_timeout)
+
+        Returns:
+            ProcessInfo with running process, leased to the caller
+
+        Raises:
+            TimeoutError: If no process frees up within pool_lease_timeout
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self._pool_lease_timeout
+        elif time.monotonic() >= deadline:
+            raise TimeoutError(f"Pool lease wait exceeded {self._pool_lease_timeout:.0f}s before it started")
+        launch_config = self._launch_config(model, session_id, mcp_servers, fallback_model, thinking)
+        fingerprint = self._launch_fingerprint(launch_config)
+
+        # Historique d'arrivées (prédiction des retours pour le pré-lancement)
+        self.activity.record(user_id, self.workspaces_root / user_id, fingerprint, launch_config)
+        replaced: Optional[ProcessInfo] = None
+
+        with self._pool_available:
+            while True:
+                tenant_processes = [
+                    info for info in self._process_pool.values() if info.user_id == user_id
+                ]
+
+                # Drop dead processes
+                for info in tenant_processes:
+                    if not info.leased and info.process.poll() is not None:
+                        logger.warning(f"⚠️ Process died for user {user_id[:8]}, removing from pool...")
+                        self._detach_process_locked(info.process_id, reason="process_died")
+                        self._dispose_process(info)  # Reap the zombie in the background
+                tenant_processes = [info for info in tenant_processes if info.process_id in self._process_pool]
+
+                # Warm process with the same launch config
+                free = [
+                    info for info in tenant_processes
+                    if info.fingerprint == fingerprint and not info.leased
+                ]
+                if free:
+                    info = max(free, key=lambda candidate: candidate.last_used)
+                    idle_time = time.time() - info.last_used
+                    logger.info(f"♻️ Reusing existing process: user={user_id[:8]}... idle={idle_time:.1f}s pid={info.process.pid}")
+                    info.leased = True
+                    info.last_used = time.time()
+                    self._process_pool.move_to_end(info.process_id)
+                    if info.prespawned:
+                        info.prespawned = False
+                        self._prespawn_stats["hits"] += 1
+                        logger.info(f"🔮 Pre-spawned process hit: user={user_id[:8]}...")
+                    return info
+
+                spawning = [
+                    spawn_fingerprint for spawn_user, spawn_fingerprint in self._pool_spawning.values()
+                    if spawn_user == user_id
+                ]
+                session_busy = session_id is not None and (
+                    fingerprint in spawning
+                    or any(info.fingerprint == fingerprint for info in tenant_processes)
+                )
+
+                if not session_busy:
+                    if len(tenant_processes) + len(spawning) < self._pool_processes_per_tenant:
+                        # Room for a new process (tenant cap), if the pool has room too
+                        if len(self._process_pool) + len(self._pool_spawning) < self._max_pool_size:
+                            break
+
+                        victim = self._lru_idle_process_locked()
+                        if victim is not None:
+                            replaced = self._detach_process_locked(victim.process_id, reason="lru_capacity")
+                            logger.info(f"🧹 Pool full ({self._max_pool_size}), evicting LRU idle process: user={victim.user_id[:8]}... pid={victim.process.pid}")
+                            break
+                    else:
+                        # At the tenant cap: replace the least recently used idle process with another config
+                        idle_other = [info for info in tenant_processes if not info.leased]
+                        if idle_other:
+                            victim = min(idle_other, key=lambda candidate: candidate.last_used)
+                            replaced = self._detach_process_locked(victim.process_id, reason="config_replaced")
+                            logger.info(f"🔁 Replacing idle process with another launch config: user={user_id[:8]}... pid={victim.process.pid}")
+                            break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No free pooled process (max {self._pool_processes_per_tenant} per user, "
+                        f"{self._max_pool_size} in pool, all busy)"
+                    )
+                logger.info(f"⏳ Waiting for a free pooled process: user={user_id[:8]}...")
+                self._pool_available.wait(timeout=remaining)
+
+            # Reserve the slot while spawning outside the lock
+            process_id = f"{user_id[:16]}-{next(self._pool_process_ids)}"
+            self._pool_spawning[process_id] = (user_id, fingerprint)
+
+        if replaced is not None:
+            self._dispose_process(replaced)
+
+        info = None
+        try:
+            info = self._spawn_pooled_process(
+                user_id=user_id,
+                process_id=process_id,
+                fingerprint=fingerprint,
+                credentials=credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking
+            )
+        finally:
+            with self._pool_available:
+                del self._pool_spawning[process_id]
+                if info is not None:
+                    self._process_pool[process_id] = info
+                self._pool_available.notify_all()
+
+        logger.info(f"✅ Process created and added to pool: user={user_id[:8]}... pid={info.process.pid}")
+        return info
+
+    async def _alease_process(self, **kwargs) -> ProcessInfo:
+        """
+        Variante async de _lease_process (attente dans l'executor dédié aux baux).
+
+        L'échéance pool_lease_timeout part de la soumission: le temps passé dans la
+        file de l'executor est décompté de l'attente. Si la requête est annulée
+        pendant l'attente, le bail obtenu ensuite est rendu au pool au lieu d'être perdu.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self._pool_lease_timeout
+        lease = loop.run_in_executor(
+            self._lease_executor, functools.partial(self._lease_process, deadline=deadline, **kwargs)
+        )
+        try:
+            return await asyncio.shield(lease)
+        except asyncio.CancelledError:
+            def release_orphan(future: asyncio.Future):
+                if not future.cancelled() and future.exception() is None:
+                    self._release_process(future.result(), completed=True)
+            lease.add_done_callback(release_orphan)
+            raise
+
+    def _release_process(self, info: ProcessInfo, completed: bool):
+        """
+        End the lease on a pooled process.
+
+        Args:
+            info: Leased process
+            completed: True if the turn ran up to its "result" event. Otherwise the
+                process still has output in flight and is terminated instead of reused.
+        """
+        with self._pool_available:
+            info.leased = False
+            info.last_used = time.time()
+            info.requests_served += 1
+
+            died = info.process.poll() is not None
+            discard = not completed or died
+            if discard:
+                self._detach_process_locked(
+                    info.process_id,
+                    reason="process_died" if died else "incomplete_turn"
+                )
+            elif info.process_id in self._process_pool:
+                self._process_pool.move_to_end(info.process_id)
+                self._schedule_reap_locked(info)
+
+            self._pool_available.notify_all()
+
+        if discard:
+            if died:
+                logger.warning(f"⚠️ Pooled process exited during its turn: user={info.user_id[:8]}... pid={info.process.pid} code={info.process.returncode}")
+            else:
+                logger.info(f"🗑️ Discarding pooled process after incomplete turn: user={info.user_id[:8]}... pid={info.process.pid}")
+            self._dispose_process(info)
 
-    def _cleanup_loop(self):
+    # -------------------------------------------------------------------------
+    # Predictive pre-spawn
+    # -------------------------------------------------------------------------
+
+    def _prespawn_loop(self):
         """
-        Background thread pour cleanup automatique des processes idle.
+        Worker unique du pré-lancement.
 
-        Runs every self._cleanup_interval seconds and terminates processes
-        that have been idle for more than self._max_idle_time seconds.
+        Au démarrage: charge l'historique d'activité et pré-lance les tenants probables.
+        Ensuite: traite les tenants signalés par _schedule_prespawn (regroupés si
+        plusieurs cycles du reaper arrivent pendant un pré-lancement).
         """
-        logger.info(f"🔄 Process pool cleanup thread started")
+        try:
+            self.activity.load(self.workspaces_root)
+            self._prespawn_tenants()
+        except Exception as e:
+            logger.error(f"❌ Error in startup pre-spawn: {e}")
 
         while True:
+            self._prespawn_wakeup.wait()
+            with self._prespawn_lock:
+                user_ids, self._prespawn_pending = self._prespawn_pending, set()
+                self._prespawn_wakeup.clear()
             try:
-                time.sleep(self._cleanup_interval)
+                self._prespawn_tenants(user_ids)
+            except Exception as e:
+                logger.error(f"❌ Error in pre-spawn: {e}")
 
-                now = time.time()
-                to_remove = []
+    def _schedule_prespawn(self, user_ids):
+        """Signale au worker de pré-lancement les tenants (parmi user_ids) susceptibles de revenir."""
+        if self._prespawn_budget <= 0:
+            return
+        with self._prespawn_lock:
+            self._prespawn_pending.update(user_ids)
+            self._prespawn_wakeup.set()
 
-                with self._pool_lock:
-                    for user_id, info in self._process_pool.items():
-                        idle_time = now - info.last_used
+    def _prespawn_tenants(self, user_ids=None):
+        """
+        Pré-lance un process pour chaque tenant probable, dans la limite du budget.
 
-                        if idle_time > self._max_idle_time:
-                            logger.info(f"🧹 Cleanup idle process: user={user_id[:8]}... idle={idle_time:.1f}s")
-                            to_remove.append(user_id)
+        Un tenant est probable si sa probabilité de retour dans max_idle_time
+        (au-delà, le process serait nettoyé) atteint prespawn_threshold.
 
-                    for user_id in to_remove:
-                        self._cleanup_process(user_id)
+        Args:
+            user_ids: Restreint aux tenants donnés (None = tous les tenants connus)
+        """
+        if self._prespawn_budget <= 0:
+            return
 
-                if to_remove:
-                    logger.info(f"✅ Cleaned up {len(to_remove)} idle process(es)")
+        candidates = self.activity.candidates(self._max_idle_time, self._prespawn_threshold)
+        for user_id, probability in candidates:
+            if user_ids is not None and user_id not in user_ids:
+                continue
+            with self._pool_lock:
+                if self._prespawn_in_use_locked() >= self._prespawn_budget:
+                    return
+            self._prespawn_process(user_id, probability)
 
-            except Exception as e:
-                logger.error(f"❌ Error in cleanup loop: {e}")
+    def _prespawn_in_use_locked(self) -> int:
+        """Pré-lancements comptés dans le budget (non utilisés + en cours). Lock requis."""
+        unused = sum(1 for info in self._process_pool.values() if info.prespawned)
+        return unused + len(self._prespawning)
 
-    def _cleanup_process(self, user_id: str):
+    def _prespawn_process(self, user_id: str, probability: float) -> bool:
         """
-        Terminate and remove a process from the pool.
+        Pré-lance un process avec la config usuelle du tenant.
 
-        IMPORTANT: Must be called with _pool_lock held!
+        Les credentials sont relues depuis le workspace du tenant (écrites au
+        dernier spawn); le process n'est pas lancé si elles ont expiré.
 
-        Args:
-            user_id: User ID to clean up
+        Returns:
+            True si un process a été pré-lancé
         """
-        if user_id not in self._process_pool:
-            return
+        usual = self.activity.usual_launch(user_id)
+        workspace = self.activity.workspace(user_id)
+        if usual is None or workspace is None:
+            return False
+        fingerprint, launch_config = usual
+
+        credentials = self._load_workspace_credentials(workspace)
+        if credentials is None or self._get_user_id_from_token(credentials.access_token) != user_id:
+            return False
 
-        info = self._process_pool[user_id]
+        with self._pool_available:
+            if self._prespawn_in_use_locked() >= self._prespawn_budget:
+                return False
 
-        try:
-            # Terminate process
-            if info.process.poll() is None:
-                logger.debug(f"🛑 Terminating process for user: {user_id[:8]}...")
-                info.process.terminate()
-                try:
-                    info.process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    logger.warning(f"⚠️ Process did not terminate, killing: {user_id[:8]}...")
-                    info.process.kill()
-                    info.process.wait()
+            tenant_processes = [info for info in self._process_pool.values() if info.user_id == user_id]
+            spawning = [spawn_user for spawn_user, _ in self._pool_spawning.values() if spawn_user == user_id]
+            if any(info.fingerprint == fingerprint for info in tenant_processes):
+                return False  # Déjà chaud
+            if len(tenant_processes) + len(spawning) >= self._pool_processes_per_tenant:
+                return False
+            if len(self._process_pool) + len(self._pool_spawning) >= self._max_pool_size:
+                return False  # Un pré-lancement n'évince jamais un process existant
 
-            # Delete workspace (optional - can keep for next request)
-            # if info.workspace_path.exists():
-            #     shutil.rmtree(info.workspace_path)
-            #     logger.debug(f"🗑️ Workspace deleted: {info.workspace_path}")
+            process_id = f"{user_id[:16]}-{next(self._pool_process_ids)}"
+            self._pool_spawning[process_id] = (user_id, fingerprint)
+            self._prespawning[process_id] = user_id
 
-        except Exception as e:
-            logger.error(f"❌ Error cleaning up process for {user_id[:8]}: {e}")
+        logger.info(f"🔮 Pre-spawning process: user={user_id[:8]}... p(return)={probability:.2f}")
 
+        info = None
+        try:
+            info = self._spawn_pooled_process(
+                user_id=user_id,
+                process_id=process_id,
+                fingerprint=fingerprint,
+                credentials=credentials,
+                model=launch_config["model"],
+                session_id=launch_config["session_id"],
+                mcp_servers={
+                    name: MCPServerConfig(**config)
+                    for name, config in launch_config["mcp_servers"].items()
+                } or None,
+                fallback_model=launch_config["fallback_model"],
+                thinking=launch_config["thinking"]
+            )
+            info.leased = False
+            info.prespawned = True
+            info.predicted_return = probability
+        except Exception as e:
+            logger.warning(f"⚠️ Pre-spawn failed for user {user_id[:8]}: {e}")
         finally:
-            # Remove from pool
-            del self._process_pool[user_id]
-            logger.debug(f"✅ Process removed from pool: {user_id[:8]}")
+            with self._pool_available:
+                del self._pool_spawning[process_id]
+                del self._prespawning[process_id]
+                if info is not None:
+                    self._process_pool[process_id] = info
+                    self._schedule_reap_locked(info)
+                    self._prespawn_stats["issued"] += 1
+                    self._prespawn_stats["predicted_sum"] += probability
+                else:
+                    self._prespawn_stats["failed"] += 1
+                self._pool_available.notify_all()
+
+        return info is not None
+
+    def _load_workspace_credentials(self, workspace: Path) -> Optional[UserOAuthCredentials]:
+        """Relit les credentials OAuth écrites dans {workspace}/.claude/.credentials.json (None si absentes/expirées)."""
+        try:
+            oauth = json.loads((workspace / ".claude" / ".credentials.json").read_text())["claudeAiOauth"]
+        except Exception:
+            return None
+
+        expires_at = oauth.get("expiresAt") or 0
+        if expires_at and expires_at / 1000 < time.time():
+            return None
+
+        return UserOAuthCredentials(
+            access_token=oauth["accessToken"],
+            refresh_token=oauth.get("refreshToken", ""),
+            expires_at=expires_at,
+            scopes=oauth.get("scopes") or ["user:inference", "user:profile"],
+            subscription_type=oauth.get("subscriptionType", "max")
+        )
 
-    def _get_or_create_process(
+    def _spawn_pooled_process(
         self,
         user_id: str,
+        process_id: str,
+        fingerprint: str,
         credentials: UserOAuthCredentials,
         model: str,
         session_id: Optional[str],
-        mcp_servers: Optional[Dict[str, MCPServerConfig]]
+        mcp_servers: Optional[Dict[str, MCPServerConfig]],
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None
     ) -> ProcessInfo:
         """
-        Get existing process from pool or create new one.
+        Spawn a new pooled Claude CLI process (leased to the caller, not yet in the pool).
 
         Args:
             user_id: User ID (hash of token)
+            process_id: Pool key for the new process
+            fingerprint: Launch config fingerprint
             credentials: OAuth credentials
             model: Claude model
             session_id: Session ID for resume
             mcp_servers: MCP servers config
+            fallback_model: Fallback model if primary overloaded
+            thinking: Enable extended thinking
 
         Returns:
             ProcessInfo with running process
         """
-        with self._pool_lock:
-            # Check if process exists and is alive
-            if user_id in self._process_pool:
-                info = self._process_pool[user_id]
-
-                # Check if process is still alive
-                if info.process.poll() is None:
-                    # Process alive - update timestamp
-                    idle_time = time.time() - info.last_used
-                    logger.info(f"♻️ Reusing existing process: user={user_id[:8]}... idle={idle_time:.1f}s")
-                    info.last_used = time.time()
-                    return info
-                else:
-                    # Process died - remove and recreate
-                    logger.warning(f"⚠️ Process died for user {user_id[:8]}, recreating...")
-                    del self._process_pool[user_id]
-
-            # Create new process
-            logger.info(f"🆕 Creating new process: user={user_id[:8]}...")
-
-            # Setup workspace
-            user_workspace = self._setup_user_workspace(user_id)
-
-            # Create .claude dir
-            claude_dir = user_workspace / ".claude"
-            claude_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create tmp dir
-            tmp_dir = user_workspace / "tmp"
-            tmp_dir.mkdir(mode=0o700, exist_ok=True)
-
-            # Create credentials file
-            creds_data = {
-                "claudeAiOauth": {
-                    "accessToken": credentials.access_token,
-                    "refreshToken": credentials.refresh_token or "",
-                    "expiresAt": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscriptionType": credentials.subscription_type
-                }
-            }
-            creds_file = claude_dir / ".credentials.json"
-            creds_file.write_text(json.dumps(creds_data, indent=2))
-            creds_file.chmod(0o600)
-
-            # Build command
-            cmd = [self.claude_bin, "--print"]
-
-            # Model
-            model_map = {
-                "opus": "claude-opus-4-20250514",
-                "sonnet": "claude-sonnet-4-5-20250929",
-                "haiku": "claude-3-5-haiku-20241022"
-            }
-            cmd.extend(["--model", model_map.get(model, model)])
-
-            # Fallback model (if primary overloaded)
-            if fallback_model:
-                cmd.extend(["--fallback-model", model_map.get(fallback_model, fallback_model)])
-
-            # Session management
-            if session_id:
-                session_exists = self._session_exists(claude_dir, session_id)
-                if session_exists:
-                    cmd.extend(["--resume", session_id])
-
-            # MCP permissions
-            if mcp_servers:
-                cmd.append("--dangerously-skip-permissions")
-
-            # Settings with credentials
-            settings = {
-                "credentials": {
-                    "access_token": credentials.access_token,
-                    "refresh_token": credentials.refresh_token or "",
-                    "expires_at": credentials.expires_at or 0,
-                    "scopes": credentials.scopes or ["user:inference", "user:profile"],
-                    "subscription_type": credentials.subscription_type
-                }
-            }
+        logger.info(f"🆕 Creating new process: user={user_id[:8]}...")
 
-            # Add extended thinking if provided
-            if thinking:
-                # Claude CLI uses alwaysThinkingEnabled (not thinking object)
-                settings["alwaysThinkingEnabled"] = True
-
-            cmd.extend(["--settings", json.dumps(settings)])
-
-            # MCP config
-            if mcp_servers:
-                _, mcp_config_json = self._build_settings_json(user_workspace, mcp_servers)
-                if mcp_config_json:
-                    cmd.extend(["--mcp-config", mcp_config_json])
-
-            # Streaming flags
-            cmd.extend([
-                "--input-format", "stream-json",
-                "--output-format", "stream-json",
-                "--include-partial-messages",
-                "--verbose"
-            ])
-
-            # Environment
-            env = {
-                "HOME": str(user_workspace),
-                "PWD": str(user_workspace),
-                "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
-                "TMPDIR": str(tmp_dir)
-            }
+        # Setup workspace (.claude/, tmp/, credentials: écrits seulement si changés)
+        user_workspace, claude_dir, tmp_dir = self._prepare_workspace(user_id, credentials)
 
-            # Spawn process
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                cwd=str(user_workspace),
-                bufsize=1
-            )
+        spec = self._launch_spec(
+            user_workspace, tmp_dir, credentials, model,
+            io_mode="stream-json",
+            mcp_servers=mcp_servers,
+            fallback_model=fallback_model,
+            thinking=thinking
+        )
 
-            # Queues
-            output_queue: queue.Queue = queue.Queue()
-            error_queue: queue.Queue = queue.Queue()
+        # Session management
+        resume = session_id if session_id and self._session_exists(claude_dir, session_id) else None
+        cmd = spec.command(resume=resume)
+        env = spec.environ()
+
+        # Spawn process
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            cwd=str(user_workspace),
+            bufsize=1
+        )
 
-            # Reader threads
-            def read_stdout():
-                try:
-                    for line in process.stdout:
-                        if line.strip():
-                            try:
-                                event = json.loads(line)
-                                output_queue.put(event)
-                            except json.JSONDecodeError:
-                                logger.warning(f"⚠️ Failed to parse JSON: {line[:100]}")
-                except Exception as e:
-                    logger.error(f"❌ Error reading stdout: {e}")
-                    error_queue.put(str(e))
-                finally:
-                    output_queue.put(None)
+        # stdout/stderr → shared pipe reader (no per-process threads)
+        output_queue = EventChannel()
+        self._attach_process_pipes(process, output_queue, user_workspace)
+
+        # Create ProcessInfo
+        now = time.time()
+        info = ProcessInfo(
+            process=process,
+            workspace_path=user_workspace,
+            output_queue=output_queue,
+            last_used=now,
+            user_id=user_id,
+            created_at=now,
+            session_id=session_id,
+            process_id=process_id,
+            fingerprint=fingerprint,
+            model=model,
+            leased=True
+        )
 
-            def read_stderr():
-                try:
-                    for line in process.stderr:
-                        if line.strip():
-                            logger.warning(f"⚠️ Claude CLI stderr: {line.strip()}")
-                except Exception as e:
-                    logger.error(f"❌ Error reading stderr: {e}")
+        return info
 
-            stdout_thread = threading.Thread(target=read_stdout, daemon=True)
-            stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-            stdout_thread.start()
-            stderr_thread.start()
+    def create_message_pooled(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        admission_ticket: Optional[AdmissionTicket] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Create message with process pool, under admission control.
 
-            # Create ProcessInfo
-            now = time.time()
-            info = ProcessInfo(
-                process=process,
-                workspace_path=user_workspace,
-                stdout_reader=stdout_thread,
-                stderr_reader=stderr_thread,
-                output_queue=output_queue,
-                error_queue=error_queue,
-                last_used=now,
-                user_id=user_id,
-                created_at=now,
-                session_id=session_id
-            )
+        The admission ticket covers the process acquisition and the turn itself;
+        it is released once the turn's result has been streamed. While waiting,
+        {"type": "queued", "position": n} events are emitted. See
+        _run_message_pooled for the pooling details.
 
-            # Add to pool
-            self._process_pool[user_id] = info
-            logger.info(f"✅ Process created and added to pool: user={user_id[:8]}... pid={process.pid}")
+        Args:
+            admission_ticket: Ticket already obtained via admit() (taken here otherwise)
 
-            return info
+        Yields:
+            Dict[str, Any]: SSE events (queued, content_block_delta, message_stop, etc.)
+        """
+        return self._admitted(
+            self._get_user_id_from_token(oauth_credentials.access_token),
+            admission_ticket,
+            self._run_message_pooled(
+                messages=messages,
+                oauth_credentials=oauth_credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                include_files=include_files
+            )
+        )
 
-    def create_message_pooled(
+    def _run_message_pooled(
         self,
         messages: List[Dict[str, str]],
         oauth_credentials: UserOAuthCredentials,
@@ -1554,10 +2941,16 @@ class SecureMultiTenantAPI:
         from the same user, reducing latency by eliminating spawn overhead.
 
         Security:
-        - One process per user (identified by token hash)
+        - Processes belong to one user (identified by token hash)
         - Full isolation between users
         - Automatic cleanup after 5 minutes idle
 
+        Pooling:
+        - Processes are keyed by launch config (model, session, MCP servers, thinking)
+        - Each request holds an exclusive lease: concurrent requests of the same
+          user never share stdin/stdout
+        - Up to pool_processes_per_tenant processes per user
+
         Performance:
         - Request 1: 1.7s (with spawn)
         - Request 2+: 0.8s (reuse process) - 2.1× faster
@@ -1577,79 +2970,57 @@ class SecureMultiTenantAPI:
 
         logger.info(f"🔐 Processing pooled request for user: {user_id[:8]}...")
 
+        info = None
+        completed = False
+
         try:
-            # Get or create process
-            info = self._get_or_create_process(
+            # Lease a process matching the launch config (exclusive for this turn)
+            info = self._lease_process(
                 user_id=user_id,
                 credentials=oauth_credentials,
                 model=model,
                 session_id=session_id,
-                mcp_servers=mcp_servers
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking
             )
 
             # Send messages via stdin
-            for msg in messages:
-                message_json = {
-                    "type": "user",
-                    "message": {
-                        "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
-                    }
-                }
-
-                message_str = json.dumps(message_json) + "\n"
-                logger.debug(f"📤 Sending message: {message_str[:100]}...")
+            message_str = self._encode_stream_json_messages(messages)
+            logger.debug(f"📤 Sending message: {message_str[:100]}...")
 
-                try:
-                    info.process.stdin.write(message_str)
-                    info.process.stdin.flush()
-                except Exception as e:
-                    logger.error(f"❌ Error writing to stdin: {e}")
-                    yield {
-                        "type": "error",
-                        "error": {
-                            "message": f"Failed to send message: {str(e)}",
-                            "code": "stdin_error"
-                        }
+            try:
+                self._write_process_stdin(info, message_str)
+            except Exception as e:
+                logger.error(f"❌ Error writing to stdin: {e}")
+                yield {
+                    "type": "error",
+                    "error": {
+                        "message": f"Failed to send message: {str(e)}",
+                        "code": "stdin_error"
                     }
-                    return
+                }
+                return
 
             # Yield events from queue
             while True:
                 try:
-                    # Check for errors
-                    if not info.error_queue.empty():
-                        error = info.error_queue.get_nowait()
-                        yield {
-                            "type": "error",
-                            "error": {
-                                "message": error,
-                                "code": "stream_error"
-                            }
-                        }
-                        break
-
-                    # Get next event
-                    event = info.output_queue.get(timeout=0.1)
+                    # Get next event (blocks until the pipe reader delivers one; None = process exited)
+                    event = info.output_queue.get()
 
                     if event is None:
                         # End of stream
-                        logger.info(f"✅ Stream completed for user: {user_id[:8]}...")
+                        logger.warning(f"⚠️ Process terminated with code {info.process.poll()}")
                         break
 
-                    yield event
-
                     # Check if this is the final result event (end of conversation)
                     if isinstance(event, dict) and event.get("type") == "result":
+                        completed = True
+                        yield event
                         logger.info(f"✅ Conversation completed for user: {user_id[:8]}... (keeping process alive)")
                         break
 
-                except queue.Empty:
-                    # Check if process died
-                    if info.process.poll() is not None:
-                        logger.warning(f"⚠️ Process terminated with code {info.process.returncode}")
-                        break
-                    continue
+                    yield event
 
                 except Exception as e:
                     logger.error(f"❌ Error yielding event: {e}")
@@ -1662,10 +3033,188 @@ class SecureMultiTenantAPI:
                     }
                     break
 
-            # Update last_used timestamp
-            with self._pool_lock:
-                if user_id in self._process_pool:
-                    self._process_pool[user_id].last_used = time.time()
+        except TimeoutError as e:
+            logger.warning(f"⏳ No free pooled process for user {user_id[:8]}: {e}")
+            yield {
+                "type": "error",
+                "error": {
+                    "message": str(e),
+                    "code": "pool_busy"
+                }
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Error in pooled request: {e}")
+            yield {
+                "type": "error",
+                "error": {
+                    "message": str(e),
+                    "code": "pooled_request_error"
+                }
+            }
+
+        finally:
+            # End the lease (process reused only if the turn reached its result)
+            if info is not None:
+                self._release_process(info, completed=completed)
+
+    def _attach_process_pipes(self, process: subprocess.Popen, output_queue: EventChannel, user_workspace: Path):
+        """
+        Confie stdout/stderr d'un process CLI au pipe reader partagé.
+
+        stdout: une ligne stream-json = un event dans output_queue, None à la fin
+        (les events system/result mettent à jour l'index des sessions du workspace).
+        stderr: loggé en warning.
+        """
+        # Sessions du process vivantes jusqu'à l'EOF (jamais compressées par le tiering)
+        sessions = get_session_index(user_workspace).open_stream()
+
+        def on_stdout_line(line: str):
+            if line.strip():
+                try:
+                    event = json.loads(line)
+                    sessions.observe(event)
+                    output_queue.put(event)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ Failed to parse JSON: {line[:100]}")
+
+        def on_stderr_line(line: str):
+            if line.strip():
+                logger.warning(f"⚠️ Claude CLI stderr: {line.strip()}")
+
+        def on_eof():
+            sessions.close()
+            output_queue.put(None)
+
+        self.pipe_reader.register(process.stdout, on_stdout_line, on_eof=on_eof)
+        self.pipe_reader.register(process.stderr, on_stderr_line)
+
+    def _write_process_stdin(self, info: ProcessInfo, payload: str):
+        """Écrit sur stdin d'un process du pool (bloquant si le pipe est plein)."""
+        info.process.stdin.write(payload)
+        info.process.stdin.flush()
+
+    def acreate_message_pooled(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False,
+        admission_ticket: Optional[AdmissionTicket] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async variant of create_message_pooled (same admission control).
+
+        Yields:
+            Dict[str, Any]: SSE events (queued, content_block_delta, message_stop, etc.)
+        """
+        return self._aadmitted(
+            self._get_user_id_from_token(oauth_credentials.access_token),
+            admission_ticket,
+            self._arun_message_pooled(
+                messages=messages,
+                oauth_credentials=oauth_credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking,
+                include_files=include_files
+            )
+        )
+
+    async def _arun_message_pooled(
+        self,
+        messages: List[Dict[str, str]],
+        oauth_credentials: UserOAuthCredentials,
+        model: str = "sonnet",
+        session_id: Optional[str] = None,
+        mcp_servers: Optional[Dict[str, MCPServerConfig]] = None,
+        fallback_model: Optional[str] = None,
+        thinking: Optional[bool] = None,
+        include_files: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante asyncio de create_message_pooled (mêmes arguments, mêmes events).
+
+        Les process du pool sont partagés avec l'API sync et le thread de cleanup,
+        ils restent donc des subprocess.Popen lus par leurs threads. Côté event loop,
+        rien ne bloque: spawn et écriture stdin passent par asyncio.to_thread, et les
+        events arrivent par EventChannel.aget() (réveil via call_soon_threadsafe depuis
+        le pipe reader): ni polling, ni thread occupé pendant le stream.
+
+        Yields:
+            Dict[str, Any]: SSE events (content_block_delta, message_stop, etc.)
+        """
+        user_token = oauth_credentials.access_token
+        user_id = self._get_user_id_from_token(user_token)
+
+        logger.info(f"🔐 Processing pooled request for user: {user_id[:8]}...")
+
+        info = None
+        completed = False
+
+        try:
+            # Bail exclusif sur un process du pool (attente/spawn hors event loop)
+            info = await self._alease_process(
+                user_id=user_id,
+                credentials=oauth_credentials,
+                model=model,
+                session_id=session_id,
+                mcp_servers=mcp_servers,
+                fallback_model=fallback_model,
+                thinking=thinking
+            )
+
+            # Send messages via stdin
+            message_str = self._encode_stream_json_messages(messages)
+            logger.debug(f"📤 Sending message: {message_str[:100]}...")
+
+            try:
+                await asyncio.to_thread(self._write_process_stdin, info, message_str)
+            except Exception as e:
+                logger.error(f"❌ Error writing to stdin: {e}")
+                yield {
+                    "type": "error",
+                    "error": {
+                        "message": f"Failed to send message: {str(e)}",
+                        "code": "stdin_error"
+                    }
+                }
+                return
+
+            # Yield events from queue
+            while True:
+                # Réveillé par le pipe reader dès qu'un event (ou la fin du process) arrive
+                event = await info.output_queue.aget()
+
+                if event is None:
+                    # End of stream (process exited)
+                    logger.warning(f"⚠️ Process terminated with code {info.process.poll()}")
+                    break
+
+                # Check if this is the final result event (end of conversation)
+                if isinstance(event, dict) and event.get("type") == "result":
+                    completed = True
+                    yield event
+                    logger.info(f"✅ Conversation completed for user: {user_id[:8]}... (keeping process alive)")
+                    break
+
+                yield event
+
+        except TimeoutError as e:
+            logger.warning(f"⏳ No free pooled process for user {user_id[:8]}: {e}")
+            yield {
+                "type": "error",
+                "error": {
+                    "message": str(e),
+                    "code": "pool_busy"
+                }
+            }
 
         except Exception as e:
             logger.error(f"❌ Error in pooled request: {e}")
@@ -1677,23 +3226,34 @@ class SecureMultiTenantAPI:
                 }
             }
 
+        finally:
+            # Fin du bail (process réutilisé seulement si le tour est allé jusqu'au result)
+            if info is not None:
+                self._release_process(info, completed)  # Non-bloquant (teardown en arrière-plan)
+
     def get_pool_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the process pool.
 
         Returns:
-            Dict with pool size, active users, and per-user stats
+            Dict with pool size, leases, per-process stats and admission stats
         """
         with self._pool_lock:
             now = time.time()
 
             active_users = []
-            for user_id, info in self._process_pool.items():
+            for process_id, info in self._process_pool.items():
                 idle_time = now - info.last_used
                 uptime = now - info.created_at
 
                 active_users.append({
-                    "user_id": user_id[:8] + "...",  # Masked for privacy
+                    "user_id": info.user_id[:8] + "...",  # Masked for privacy
+                    "fingerprint": info.fingerprint[:12],
+                    "model": info.model,
+                    "session_id": info.session_id,
+                    "leased": info.leased,
+                    "requests_served": info.requests_served,
+                    "prespawned": info.prespawned,
                     "idle_time": round(idle_time, 1),
                     "uptime": round(uptime, 1),
                     "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(info.created_at)),
@@ -1704,11 +3264,70 @@ class SecureMultiTenantAPI:
 
             return {
                 "pool_size": len(self._process_pool),
+                "leased": sum(1 for info in self._process_pool.values() if info.leased),
+                "spawning": len(self._pool_spawning),
+                "users": len({info.user_id for info in self._process_pool.values()}),
+                "processes_per_user": self._pool_processes_per_tenant,
+                "max_pool_size": self._max_pool_size,
+                "evictions": {
+                    "total": sum(self._evictions.values()),
+                    "by_reason": dict(self._evictions),
+                    "recent": list(self._recent_evictions)[-10:]
+                },
                 "max_idle_time": self._max_idle_time,
-                "cleanup_interval": self._cleanup_interval,
-                "active_users": active_users
+                "next_reap_in": round(max(0.0, self._expiry_heap[0][0] - now), 1) if self._expiry_heap else None,
+                "reap_heap_size": len(self._expiry_heap),
+                "active_users": active_users,
+                "prespawn": self._prespawn_stats_locked(),
+                "pipe_reader": self.pipe_reader.stats(),
+                "admission": self.admission.stats(),
+                "transcripts": self.transcript_tiering.stats(),
+                "blobs": self.blob_retention.stats(),
+                "workspace_prep": self._workspace_prep_stats(),
+                "launch_specs": self.launch_specs.stats(),
+                "mcp_gateway": self._mcp_gateway_stats()
             }
 
+    def _mcp_gateway_stats(self) -> Optional[Dict[str, Any]]:
+        if not self._mcp_gateway_enabled:
+            return None
+        from mcp_gateway import get_mcp_gateway
+        return get_mcp_gateway().stats()
+
+    def _workspace_prep_stats(self) -> Dict[str, Any]:
+        with self._prepared_lock:
+            stats = dict(self._prepare_stats)
+            stats["workspaces"] = len(self._prepared_workspaces)
+        stats["verify_interval"] = self._workspace_verify_interval
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 3) if total else None
+        return stats
+
+    def _prespawn_stats_locked(self) -> Dict[str, Any]:
+        """
+        Predictive pre-spawn stats. Must be called with _pool_lock held.
+
+        expected_hit_rate is the mean predicted return probability of issued
+        pre-spawns; observed_hit_rate is hits / (hits + wasted).
+        """
+        stats = self._prespawn_stats
+        pending = [info for info in self._process_pool.values() if info.prespawned]
+        resolved = stats["hits"] + stats["wasted"]
+
+        return {
+            "budget": self._prespawn_budget,
+            "threshold": self._prespawn_threshold,
+            "tenants_tracked": self.activity.tenant_count(),
+            "issued": stats["issued"],
+            "hits": stats["hits"],
+            "wasted": stats["wasted"],
+            "failed": stats["failed"],
+            "pending": len(pending),
+            "expected_hit_rate": round(stats["predicted_sum"] / stats["issued"], 3) if stats["issued"] else None,
+            "observed_hit_rate": round(stats["hits"] / resolved, 3) if resolved else None,
+            "pending_expected_hits": round(sum(info.predicted_return for info in pending), 2)
+        }
+
     # =============================================================================
     # CLEANUP
     # =============================================================================
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Token-delta coalescing for SSE streams.
+
+Le CLI émet un event stream_event/content_block_delta par token (ou presque):
+chacun devient une frame SSE (json.dumps + write + segment TCP). Le coalescer
+fusionne les deltas consécutifs d'un même content block en une seule frame.
+
+Flush:
+- taille: le texte fusionné atteint max_chars
+- temps: window secondes après le premier delta en attente (ex: 20ms)
+- tout event qui n'est pas un delta fusionnable (ordre des events préservé)
+
+Lecture d'avance: seuls les deltas sont bufferisés. Un autre event (ex: file_chunk
+de ~1,3 Mo) est passé de la main à la main: la lecture reprend quand le
+consommateur l'a pris (un seul en mémoire, backpressure du client préservée).
+"""
+
+import asyncio
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Type de delta → champ texte concaténable
+MERGEABLE_DELTAS = {
+    "text_delta": "text",
+    "thinking_delta": "thinking",
+    "input_json_delta": "partial_json",
+}
+
+_END = object()
+
+
+class _Handoff:
+    """Event non fusionnable: la lecture reprend quand le consommateur l'a émis."""
+
+    __slots__ = ("event", "consumed")
+
+    def __init__(self, event: Any, consumed: asyncio.Future):
+        self.event = event
+        self.consumed = consumed
+
+
+class DeltaCoalescer:
+    """Fusionne les deltas consécutifs d'un stream d'events CLI (stream-json)."""
+
+    def __init__(self, window: float = 0.02, max_chars: int = 2048, max_buffered_events: int = 256):
+        """
+        Args:
+            window: Délai max (secondes) avant d'émettre un delta en attente
+            max_chars: Taille de texte fusionné déclenchant un flush immédiat
+            max_buffered_events: Deltas lus d'avance au maximum (backpressure)
+        """
+        self.window = window
+        self.max_chars = max_chars
+        self.max_buffered_events = max_buffered_events
+
+        # Stats cumulées (toutes requêtes)
+        self.events_in = 0
+        self.frames_out = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_chars": self.max_chars,
+            "events_in": self.events_in,
+            "frames_out": self.frames_out,
+            "ratio": round(self.events_in / self.frames_out, 2) if self.frames_out else None
+        }
+
+    async def coalesce(self, events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Relaie events en fusionnant les deltas consécutifs d'un même content block.
+
+        Les events sont lus par une task dédiée: un delta en attente est émis à
+        l'échéance de la fenêtre même si le CLI n'envoie plus rien.
+        """
+        buffer: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffered_events)
+        loop = asyncio.get_running_loop()
+
+        async def pump():
+            try:
+                async for event in events:
+                    if self._delta_key(event) is None:
+                        handoff = _Handoff(event, loop.create_future())
+                        await buffer.put(handoff)
+                        await handoff.consumed
+                    else:
+                        await buffer.put(event)
+                await buffer.put(_END)
+            except Exception as e:
+                await buffer.put(e)
+
+        pump_task = asyncio.create_task(pump())
+
+        pending: Optional[Dict[str, Any]] = None
+        pending_key: Optional[Tuple[Any, str]] = None
+        pending_parts = []
+        pending_chars = 0
+        deadline = 0.0
+
+        def flush() -> Dict[str, Any]:
+            nonlocal pending, pending_key, pending_parts, pending_chars
+            event = pending
+            field = MERGEABLE_DELTAS[pending_key[1]]
+            event["event"]["delta"][field] = "".join(pending_parts)
+            pending, pending_key, pending_parts, pending_chars = None, None, [], 0
+            self.frames_out += 1
+            return event
+
+        try:
+            while True:
+                if pending is None:
+                    item = await buffer.get()
+                else:
+                    try:
+                        item = await asyncio.wait_for(buffer.get(), timeout=max(0.0, deadline - loop.time()))
+                    except asyncio.TimeoutError:
+                        yield flush()
+                        continue
+
+                if item is _END:
+                    if pending is not None:
+                        yield flush()
+                    return
+
+                if isinstance(item, Exception):
+                    if pending is not None:
+                        yield flush()
+                    raise item
+
+                self.events_in += 1
+
+                if isinstance(item, _Handoff):
+                    # Non-delta: émet d'abord le delta en attente (ordre préservé)
+                    if pending is not None:
+                        yield flush()
+                    self.frames_out += 1
+                    yield item.event
+                    item.consumed.set_result(None)
+                    continue
+
+                key = self._delta_key(item)
+
+                if pending is not None and key != pending_key:
+                    yield flush()
+
+                text = item["event"]["delta"][MERGEABLE_DELTAS[key[1]]]
+                if pending is None:
+                    # Copie: l'event d'origine n'est pas modifié
+                    pending = {**item, "event": {**item["event"], "delta": dict(item["event"]["delta"])}}
+                    pending_key = key
+                    deadline = loop.time() + self.window
+
+                pending_parts.append(text)
+                pending_chars += len(text)
+
+                if pending_chars >= self.max_chars:
+                    yield flush()
+
+        finally:
+            pump_task.cancel()
+            try:
+                await pump_task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    @staticmethod
+    def _delta_key(item: Any) -> Optional[Tuple[Any, str]]:
+        """(index du content block, type de delta) si l'event est un delta fusionnable, sinon None."""
+        if not isinstance(item, dict) or item.get("type") != "stream_event":
+            return None
+        event = item.get("event")
+        if not isinstance(event, dict) or event.get("type") != "content_block_delta":
+            return None
+        delta = event.get("delta")
+        if not isinstance(delta, dict):
+            return None
+        delta_type = delta.get("type")
+        field = MERGEABLE_DELTAS.get(delta_type)
+        if field is None or not isinstance(delta.get(field), str):
+            return None
+        return (event.get("index"), delta_type)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Event bridge between producer threads (pipe reader) and consumers.
+
+EventChannel remplace queue.Queue pour les events CLI:
+- put() depuis n'importe quel thread (ex: callback du PipeReader)
+- get(timeout) bloquant pour les générateurs sync (API historique)
+- await aget() pour les générateurs async: le consumer est réveillé via
+  loop.call_soon_threadsafe, sans polling et sans occuper de thread
+"""
+
+import asyncio
+import queue
+import threading
+from collections import deque
+from typing import Any, Deque, List, Optional, Tuple
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EventChannel:
+    """File FIFO thread-safe, consommable en sync (get) comme en async (aget)."""
+
+    def __init__(self):
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def put(self, item: Any):
+        """Ajoute un item et réveille les consumers (sync et async)."""
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify()
+            waiters, self._waiters = self._waiters, []
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # Event loop fermée: plus de consumer à réveiller
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Retire le prochain item (bloquant).
+
+        Raises:
+            queue.Empty: Si aucun item n'arrive avant timeout
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def get_nowait(self) -> Any:
+        """Retire le prochain item. Raises queue.Empty si la file est vide."""
+        with self._cond:
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    async def aget(self) -> Any:
+        """Retire le prochain item sans bloquer l'event loop (réveil par put)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._items:
+                    return self._items.popleft()
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Consumer annulé: ne pas laisser un waiter mort dans la liste
+                with self._cond:
+                    self._waiters = [(l, f) for l, f in self._waiters if f is not future]
+                raise
+
+    def empty(self) -> bool:
+        with self._cond:
+            return not self._items
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
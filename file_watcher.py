@@ -10,20 +10,28 @@ Production File Watcher with all fixes:
 """
 
 import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
 import time
 import pathspec
 from pathlib import Path
 from queue import Queue, Empty
 from contextlib import contextmanager
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from workspace_observer import get_workspace_observer
 from collections import deque
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 import logging
 import base64
 
 logger = logging.getLogger(__name__)
 
+# Fichiers au-delà de max_file_size: envoyés en events file_chunk de cette taille (avant base64)
+FILE_CHUNK_SIZE = 1024 * 1024
+
 
 class TokenBucketRateLimiter:
     """Token bucket algorithm for rate limiting"""
@@ -111,6 +119,11 @@ class ProductionFileWatcher(FileSystemEventHandler):
     - Retry + stability (fix timing)
     - Ordered queue (fix order)
     - Rate limiting + batching (fix bursts)
+
+    Le traitement (stabilité, lecture, hash, batching) tourne dans un thread
+    dédié piloté par des timers: aucun sleep dans le chemin du stream SSE.
+    Les batches prêts sont déposés dans event_queue (tout objet avec put(),
+    ex: queue.Queue ou EventChannel partagé avec les events Claude).
     """
 
     IGNORE_PATTERNS = """
@@ -128,6 +141,16 @@ node_modules/
 .env.*
     """.strip().split('\n')
 
+    # Stabilité: deux stat identiques à STABILITY_INTERVAL d'écart, abandon après STABILITY_TIMEOUT
+    STABILITY_INTERVAL = 0.05
+    STABILITY_TIMEOUT = 2.0
+    MAX_READ_RETRIES = 3
+    ORDERING_DELAY = 0.5
+
+    # Change detection: une seule lecture sous SINGLE_READ_SIZE, sinon hash par chunks puis lecture si changé
+    SINGLE_READ_SIZE = 64 * 1024
+    HASH_CHUNK_SIZE = 1024 * 1024
+
     def __init__(
         self,
         workspace: Path,
@@ -135,19 +158,33 @@ node_modules/
         debounce_delay: float = 0.5,
         rate_limit: int = 10,
         batch_size: int = 5,
-        max_file_size: int = 10 * 1024 * 1024
+        max_file_size: int = 10 * 1024 * 1024,
+        blob_store=None
     ):
         self.workspace = workspace
         self.event_queue = event_queue
         self.debounce_delay = debounce_delay
         self.max_file_size = max_file_size
 
+        # Blob refs: events {path, sha256, size} au lieu du contenu inline
+        self.blob_store = blob_store
+
         # Filtering
         self.ignore_spec = pathspec.PathSpec.from_lines('gitwildmatch', self.IGNORE_PATTERNS)
 
         # Debouncing
         self.pending = {}  # {path: last_time}
         self.file_hashes = {}  # {path: hash}
+        self.file_signatures = {}  # {path: (size, mtime_ns, inode)}
+
+        # Signatures connues avant la requête (manifest du workspace): un fichier
+        # touché mais inchangé depuis n'est ni relu ni émis
+        self._baseline = get_workspace_manifest(workspace).signatures()
+
+        # Timers: heap (due, seq, path) + état des checks en cours {path: {...}}
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._checks = {}
 
         # Ordering
         self.ordered_events = []  # [(timestamp, event)]
@@ -158,6 +195,13 @@ node_modules/
         # Batching
         self.batcher = BatchProcessor(batch_size=batch_size)
 
+        # Worker
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._finishing = False
+        self._idle = True
+        self._worker = None
+
         logger.info(f"📁 File watcher initialized for {workspace}")
 
     def should_ignore(self, path: str) -> bool:
@@ -172,152 +216,325 @@ node_modules/
         if event.is_directory or self.should_ignore(event.src_path):
             return
 
-        self.pending[event.src_path] = time.time()
+        self._touch(event.src_path)
         logger.debug(f"➕ File created (pending): {event.src_path}")
 
     def on_modified(self, event):
         if event.is_directory or self.should_ignore(event.src_path):
             return
 
-        self.pending[event.src_path] = time.time()
+        self._touch(event.src_path)
         logger.debug(f"✏️  File modified (pending): {event.src_path}")
 
-    def process_pending(self):
-        """Process all pending events (debounced, hashed, ordered, rate-limited)"""
-        now = time.time()
+    # ------------------------------------------------------------------ worker
 
-        # 1. Get stable files (debounced)
-        stable_files = []
-        for path, last_time in list(self.pending.items()):
-            if now - last_time > self.debounce_delay:
-                stable_files.append(path)
-                del self.pending[path]
+    def start(self):
+        """Démarre le thread de traitement"""
+        self._worker = threading.Thread(target=self._run, daemon=True, name="FileWatcherWorker")
+        self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête le thread de traitement (les events non envoyés sont abandonnés)"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+
+    def finish(self, timeout: float = 3.0) -> bool:
+        """
+        Fin de stream: traite tout ce qui est en attente sans debounce, sans délai
+        d'ordonnancement ni rate limit, puis envoie le dernier batch.
 
-        # 2. Process each stable file
-        for path in stable_files:
-            file_path = Path(path)
+        Returns:
+            True si tout a été envoyé avant timeout
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._finishing = True
+            now = time.time()
+            for path in self.pending:
+                self._schedule_locked(path, now)
+            self._idle = False
+            self._cond.notify_all()
+
+            while not self._idle and not self._stopped:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning("⚠️ File watcher final flush timed out")
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _touch(self, path: str):
+        """Event watchdog (thread observer): (re)programme un check après le debounce"""
+        now = time.time()
+        with self._cond:
+            self.pending[path] = now
+            self._checks.pop(path, None)  # Le fichier bouge encore: reprise de zéro
+            self._schedule_locked(path, now if self._finishing else now + self.debounce_delay)
+            self._idle = False
+            self._cond.notify_all()
+
+    def _schedule_locked(self, path: str, due: float):
+        heapq.heappush(self._timers, (due, next(self._timer_seq), path))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.time()
+                    due = []
+                    while self._timers and self._timers[0][0] <= now:
+                        _, _, path = heapq.heappop(self._timers)
+                        due.append(path)
+                    if due or self._flush_due(now):
+                        break
+                    # Les timers restants sans pending sont périmés (fichier déjà traité)
+                    if not self.pending and not self.ordered_events and not self.batcher.batch:
+                        self._idle = True
+                        self._cond.notify_all()
+                    self._cond.wait(self._next_wakeup(now))
+
+            for path in due:
+                try:
+                    self._check(path)
+                except Exception as e:
+                    logger.error(f"❌ Error processing {path}: {e}")
 
-            # Check size
             try:
-                file_size = file_path.stat().st_size
-                if file_size > self.max_file_size:
-                    logger.warning(f"⚠️  File too large ({file_size} bytes): {path}")
-                    continue
+                self.flush_events()
             except Exception as e:
-                logger.debug(f"Cannot stat {path}: {e}")
-                continue
+                logger.error(f"❌ Error flushing file events: {e}")
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        """Délai jusqu'au prochain timer, flush d'ordonnancement ou timeout de batch (None = attendre un event)"""
+        candidates = []
+        if self._timers:
+            candidates.append(self._timers[0][0])
+        if self.ordered_events:
+            if self._finishing:
+                return 0
+            oldest = min(e["timestamp"] for e in self.ordered_events)
+            # Au plus tôt à la fin du délai d'ordonnancement, sinon au prochain token du rate limiter
+            candidates.append(max(oldest + self.ORDERING_DELAY, now + 1.0 / self.rate_limiter.rate))
+        if self.batcher.batch:
+            candidates.append(self.batcher.batch_start + self.batcher.batch_timeout)
+        if not candidates:
+            return None
+        return max(0.001, min(candidates) - now)
 
-            # Wait for stability
-            if not self.wait_for_stable(file_path):
-                logger.debug(f"File not stable, skipping: {path}")
-                continue
+    def _flush_due(self, now: float) -> bool:
+        if self.ordered_events and (
+            self._finishing or any(now - e["timestamp"] > self.ORDERING_DELAY for e in self.ordered_events)
+        ):
+            return True
+        return bool(self.batcher.batch) and (self._finishing or self.batcher.should_flush())
 
-            # Read with retry
-            content, encoding = self.read_file_safe(file_path)
-            if content is None:
-                logger.warning(f"Cannot read {path}")
-                continue
+    def _check(self, path: str):
+        """Un check programmé: debounce, stabilité (re-check par timer), lecture, hash"""
+        now = time.time()
+        with self._cond:
+            last_time = self.pending.get(path)
+            if last_time is None:
+                return  # Déjà traité
+            if not self._finishing and now - last_time < self.debounce_delay:
+                return  # Un event plus récent a programmé son propre check
+            state = self._checks.setdefault(path, {"first": now, "signature": None, "attempt": 0})
+
+        file_path = Path(path)
+
+        # Check size + stability (deux stat identiques consécutifs)
+        try:
+            st = file_path.stat()
+        except Exception as e:
+            logger.debug(f"Cannot stat {path}: {e}")
+            self._done(path, last_time)
+            return
+
+        signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+        if state["signature"] != signature:
+            if now - state["first"] > self.STABILITY_TIMEOUT:
+                logger.debug(f"File not stable, skipping: {path}")
+                self._done(path, last_time)
+                return
+            state["signature"] = signature
+            self._retry(path, self.STABILITY_INTERVAL)
+            return
 
-            # Hash to detect real changes
-            current_hash = hashlib.sha256(content.encode() if isinstance(content, str) else content).hexdigest()
-            if current_hash == self.file_hashes.get(path):
-                logger.debug(f"No real change (same hash): {path}")
-                continue  # No real change
+        # Fast path: (size, mtime_ns, inode) identique à la dernière version vue → aucune lecture
+        if signature == self.file_signatures.get(path, self._baseline.get(path)):
+            logger.debug(f"No change (same stat): {path}")
+            self._done(path, last_time)
+            return
 
-            self.file_hashes[path] = current_hash
+        if self.blob_store is not None:
+            relative = str(file_path.relative_to(self.workspace))
+            blob = _put_blob(self.blob_store, file_path, relative, [])
+            if blob is None:
+                self._done(path, last_time)
+                return
+            current_hash, file_size = blob
+            event = {"path": relative, "sha256": current_hash, "size": file_size}
+            ready = f"blob {current_hash[:12]}"
+        elif st.st_size > self.max_file_size:
+            # Gros fichier: pas lu ici, le stream SSE l'envoie en events file_chunk (iter_file_chunks)
+            current_hash = None
+            file_size = st.st_size
+            event = {
+                "path": str(file_path.relative_to(self.workspace)),
+                "content": None,
+                "encoding": "chunked",
+                "blake2b": None,
+                "size": file_size,
+                "chunks": -(-file_size // FILE_CHUNK_SIZE)
+            }
+            ready = "chunked"
+        else:
+            try:
+                # Petit fichier: une seule lecture (hash + contenu); sinon hash par chunks d'abord
+                data = file_path.read_bytes() if st.st_size <= self.SINGLE_READ_SIZE else None
+                current_hash = self.hash_bytes(data) if data is not None else self.hash_file(file_path)
+                if current_hash != self.file_hashes.get(path) and data is None:
+                    data = file_path.read_bytes()  # Contenu chargé seulement si émis
+            except (PermissionError, OSError) as e:
+                # Retry avec backoff exponentiel, par timer (pas de sleep)
+                state["attempt"] += 1
+                if state["attempt"] < self.MAX_READ_RETRIES:
+                    wait_time = 0.1 * (2 ** (state["attempt"] - 1))
+                    logger.debug(f"Retry {state['attempt']}/{self.MAX_READ_RETRIES} for {path} (wait {wait_time}s)")
+                    self._retry(path, wait_time)
+                else:
+                    logger.error(f"Cannot read {path} after {self.MAX_READ_RETRIES} attempts: {e}")
+                    self._done(path, last_time)
+                return
 
-            # Add to ordered queue with timestamp
-            self.ordered_events.append({
-                "timestamp": time.time(),
-                "type": "file_created",
+            file_size = st.st_size
+            content, encoding = self.encode_content(data) if data is not None else (None, None)
+            event = {
                 "path": str(file_path.relative_to(self.workspace)),
                 "content": content,
                 "encoding": encoding,
-                "hash": current_hash,
+                "blake2b": current_hash,  # Pas "hash": réservé au sha256 (réponses non-streaming)
                 "size": file_size
-            })
+            }
+            ready = encoding
+
+        self._done(path, last_time)
+        self.file_signatures[path] = signature
+
+        # Hash to detect real changes (fichiers chunked: signature stat seulement)
+        if current_hash is not None and current_hash == self.file_hashes.get(path):
+            logger.debug(f"No real change (same hash): {path}")
+            return
 
-            logger.info(f"✅ File ready: {file_path.name} ({file_size} bytes, {encoding})")
+        self.file_hashes[path] = current_hash
 
-        # 3. Process ordered events (respect rate limit)
-        self.flush_events()
+        # Add to ordered queue with timestamp
+        with self._cond:
+            self.ordered_events.append({"timestamp": time.time(), "type": "file_created", **event})
+
+        logger.info(f"✅ File ready: {file_path.name} ({file_size} bytes, {ready})")
+
+    def _retry(self, path: str, delay: float):
+        with self._cond:
+            self._schedule_locked(path, time.time() + delay)
+
+    def _done(self, path: str, last_time: float):
+        with self._cond:
+            # Un event arrivé pendant le traitement a reprogrammé un check: garder le pending
+            if self.pending.get(path) == last_time:
+                del self.pending[path]
+                self._checks.pop(path, None)
 
     def flush_events(self):
         """Flush ordered events with rate limiting and batching"""
         now = time.time()
 
-        # Get events ready to send (>0.5s old for ordering stability)
-        ready = [e for e in self.ordered_events if now - e["timestamp"] > 0.5]
+        with self._cond:
+            finishing = self._finishing
+            # Get events ready to send (>0.5s old for ordering stability)
+            if finishing:
+                ready, self.ordered_events = self.ordered_events, []
+            else:
+                ready = [e for e in self.ordered_events if now - e["timestamp"] > self.ORDERING_DELAY]
+                self.ordered_events = [e for e in self.ordered_events if now - e["timestamp"] <= self.ORDERING_DELAY]
         ready.sort(key=lambda e: e["timestamp"])
 
-        # Remove from queue
-        self.ordered_events = [e for e in self.ordered_events if now - e["timestamp"] <= 0.5]
-
         # Apply rate limiting + batching
+        requeue = []
         for event in ready:
-            if self.rate_limiter.consume():
+            if finishing or self.rate_limiter.consume():
                 # Add to batch
                 self.batcher.add_file(event)
 
                 # Flush batch if ready
                 if self.batcher.should_flush():
-                    batch = self.batcher.flush()
-                    self.event_queue.put(batch)
-                    logger.info(f"📦 Sent batch of {batch['count']} files")
+                    self._send_batch()
             else:
                 # Rate limit exceeded, re-queue
-                self.ordered_events.append(event)
+                requeue.append(event)
 
-    def wait_for_stable(self, path: Path, timeout: float = 2.0) -> bool:
-        """Wait until file size is stable"""
-        last_size = None
-        start = time.time()
+        if requeue:
+            with self._cond:
+                self.ordered_events.extend(requeue)
 
-        while time.time() - start < timeout:
-            try:
-                current_size = path.stat().st_size
-                if last_size == current_size:
-                    return True
-                last_size = current_size
-                time.sleep(0.05)
-            except:
-                return False
-        return False
+        # Flush partial batch on timeout (or at end of stream)
+        if self.batcher.batch and (finishing or self.batcher.should_flush()):
+            self._send_batch()
 
-    def read_file_safe(self, path: Path, max_retries: int = 3) -> tuple[Optional[str], str]:
-        """Read file with exponential backoff. Returns (content, encoding)"""
-        for attempt in range(max_retries):
-            try:
-                # Try reading as text
-                content = path.read_text(encoding='utf-8')
-                return (content, "text")
-            except UnicodeDecodeError:
-                # Binary file, use base64
-                try:
-                    content = base64.b64encode(path.read_bytes()).decode('utf-8')
-                    return (content, "base64")
-                except Exception as e:
-                    logger.error(f"Error reading binary {path}: {e}")
-                    return (None, "unknown")
-            except (PermissionError, OSError) as e:
-                if attempt < max_retries - 1:
-                    wait_time = 0.1 * (2 ** attempt)
-                    logger.debug(f"Retry {attempt+1}/{max_retries} for {path} (wait {wait_time}s)")
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"Cannot read {path} after {max_retries} attempts: {e}")
-                    return (None, "error")
+    def _send_batch(self):
+        batch = self.batcher.flush()
+        self.event_queue.put(batch)
+        logger.info(f"📦 Sent batch of {batch['count']} files")
+
+    def read_file(self, path: Path) -> tuple[str, str]:
+        """
+        Read file as text, or base64 for binaries. Returns (content, encoding).
 
-        return (None, "error")
+        Raises:
+            PermissionError, OSError: File not readable (yet)
+        """
+        return self.encode_content(path.read_bytes())
+
+    @staticmethod
+    def encode_content(data: bytes) -> tuple[str, str]:
+        """UTF-8 text as-is, binaries as base64. Returns (content, encoding)"""
+        try:
+            return (data.decode('utf-8'), "text")
+        except UnicodeDecodeError:
+            return (base64.b64encode(data).decode('utf-8'), "base64")
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+    def hash_file(self, path: Path) -> str:
+        """BLAKE2b du fichier, lu par chunks (mémoire constante)"""
+        digest = hashlib.blake2b(digest_size=32)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(self.HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
 
 
 @contextmanager
-def watch_workspace_production(workspace: Path, event_queue: Queue):
-    """Production context manager with guaranteed cleanup"""
-    observer = Observer()
-    handler = ProductionFileWatcher(workspace, event_queue)
-    observer.schedule(handler, str(workspace), recursive=True)
-    observer.start()
+def watch_workspace_production(workspace: Path, event_queue: Queue, blob_store=None):
+    """
+    Production context manager with guaranteed cleanup.
+
+    Le handler s'abonne à l'observer partagé du process (un seul fd inotify,
+    watches posés une fois par workspace, dossiers ignorés élagués).
+    """
+    observer = get_workspace_observer()
+    handler = ProductionFileWatcher(workspace, event_queue, blob_store=blob_store)
+    handler.start()
+    observer.register(workspace, handler, handler.ignore_spec)
 
     start_time = time.time()
     max_duration = 600  # 10 minutes max
@@ -328,19 +545,95 @@ def watch_workspace_production(workspace: Path, event_queue: Queue):
     finally:
         # Guaranteed cleanup
         logger.info("🛑 Stopping file watcher...")
-        observer.stop()
-        observer.join(timeout=5)
+        observer.unregister(workspace, handler)
+        handler.stop()
 
         # Log stats
         duration = time.time() - start_time
         logger.info(f"📊 Watcher stats: {duration:.1f}s, {len(handler.file_hashes)} files processed")
 
 
-def get_workspace_snapshot(workspace: Path, max_file_size: int = 10 * 1024 * 1024) -> List[Dict]:
+def iter_file_chunks(workspace: Path, batch: Dict, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Events file_chunk des fichiers "chunked" d'un files_batch, lus à la demande.
+
+    Un seul chunk en mémoire: le fichier suivant n'est lu que lorsque le consumer
+    (générateur SSE) demande l'event suivant → backpressure du client.
+
+    Event: {"type": "file_chunk", "path", "seq", "offset", "length", "size",
+            "encoding": "base64", "data", "final"}. Le dernier chunk d'un fichier
+    porte "final": true, "blake2b" (digest du contenu envoyé) et "complete"
+    (false si le fichier a été modifié/tronqué pendant l'envoi: le client peut
+    reprendre à partir d'offset au prochain files_batch).
+    """
+    for entry in batch.get("files", []):
+        if entry.get("encoding") != "chunked":
+            continue
+
+        relative = entry["path"]
+        try:
+            f = open(workspace / relative, "rb")
+        except OSError as e:
+            logger.warning(f"⚠️ Cannot stream {relative}: {e}")
+            yield {"type": "file_chunk", "path": relative, "seq": 0, "offset": 0, "length": 0,
+                   "size": entry["size"], "encoding": "base64", "data": "", "final": True,
+                   "blake2b": None, "complete": False}
+            continue
+
+        with f:
+            before = os.fstat(f.fileno())
+            size = before.st_size
+            digest = hashlib.blake2b(digest_size=32)
+            offset = 0
+            seq = 0
+            while True:
+                data = f.read(min(chunk_size, size - offset)) if offset < size else b""
+                digest.update(data)
+                final = not data or offset + len(data) >= size
+                event = {
+                    "type": "file_chunk",
+                    "path": relative,
+                    "seq": seq,
+                    "offset": offset,
+                    "length": len(data),
+                    "size": size,
+                    "encoding": "base64",
+                    "data": base64.b64encode(data).decode("ascii"),
+                    "final": final
+                }
+                offset += len(data)
+                seq += 1
+                if final:
+                    after = os.fstat(f.fileno())
+                    event["blake2b"] = digest.hexdigest()
+                    event["complete"] = offset == size and \
+                        (after.st_size, after.st_mtime_ns) == (before.st_size, before.st_mtime_ns)
+                    yield event
+                    break
+                yield event
+
+        logger.info(f"📤 Streamed {relative} in {seq} chunks ({offset} bytes)")
+
+
+def get_workspace_snapshot(
+    workspace: Path,
+    max_file_size: int = 10 * 1024 * 1024,
+    blob_store=None,
+    skipped: Optional[List[str]] = None,
+    large_file_store=None
+) -> List[Dict]:
     """
     Simple snapshot approach (no file watcher).
     Returns all files in workspace at current time.
+
+    With blob_store, files are stored as blobs and entries are {path, sha256, size}.
+    Files above max_file_size are not inlined: with large_file_store they are stored
+    as blobs ({path, content: None, encoding: "blob", sha256, size}, download via
+    GET /v1/workspace/blobs/{sha}); otherwise (or above the blob size limit) their
+    path is appended to skipped.
     """
+    if skipped is None:
+        skipped = []
     files = []
     ignore_patterns = ProductionFileWatcher.IGNORE_PATTERNS
     ignore_spec = pathspec.PathSpec.from_lines('gitwildmatch', ignore_patterns)
@@ -358,11 +651,19 @@ def get_workspace_snapshot(workspace: Path, max_file_size: int = 10 * 1024 * 102
         except:
             continue
 
-        # Skip large files
+        if blob_store is not None:
+            blob = _put_blob(blob_store, file_path, str(relative), skipped)
+            if blob is not None:
+                files.append({"path": str(relative), "sha256": blob[0], "size": blob[1]})
+            continue
+
+        # Large files: blob ref (or skipped)
         try:
             file_size = file_path.stat().st_size
             if file_size > max_file_size:
-                logger.warning(f"Skipping large file: {file_path.name} ({file_size} bytes)")
+                entry = _large_file_entry(large_file_store, file_path, str(relative), skipped)
+                if entry is not None:
+                    files.append(entry)
                 continue
         except:
             continue
@@ -387,3 +688,236 @@ def get_workspace_snapshot(workspace: Path, max_file_size: int = 10 * 1024 * 102
 
     logger.info(f"📸 Workspace snapshot: {len(files)} files")
     return files
+
+
+class WorkspaceManifest:
+    """
+    Index persisté des fichiers d'un workspace: {path: (size, mtime_ns, inode, hash)}.
+
+    Stocké dans {workspace}/.claude/file_manifest.json (0o600). Permet de ne
+    renvoyer que les fichiers créés/modifiés/supprimés pendant une requête au
+    lieu du workspace complet:
+
+        checkpoint = manifest.checkpoint()      # avant le run CLI (stat only)
+        changes = manifest.changes_since(checkpoint)   # après le run
+
+    Un fichier dont (size, mtime_ns, inode) n'a pas bougé n'est ni relu ni
+    re-hashé. Un fichier "touché" sans changement de contenu (même hash) n'est
+    pas signalé.
+    """
+
+    FILENAME = "file_manifest.json"
+
+    def __init__(self, workspace: Path, max_file_size: int = 10 * 1024 * 1024):
+        self.workspace = workspace
+        self.max_file_size = max_file_size
+        self.ignore_spec = pathspec.PathSpec.from_lines('gitwildmatch', ProductionFileWatcher.IGNORE_PATTERNS)
+        self._lock = threading.Lock()
+        self._index: Dict[str, list] = self._load()
+
+    def signatures(self) -> Dict[str, tuple]:
+        """{chemin absolu: (size, mtime_ns, inode)} du dernier état indexé"""
+        with self._lock:
+            index = self._index
+        return {str(self.workspace / relative): tuple(entry[:3]) for relative, entry in index.items()}
+
+    def checkpoint(self) -> Dict[str, list]:
+        """
+        État du workspace avant la requête (stat uniquement, aucun fichier lu).
+
+        Les hash sont repris de l'index persisté quand la signature stat est identique.
+        """
+        with self._lock:
+            known = self._index
+        return self._scan(known)
+
+    def changes_since(self, checkpoint: Dict[str, list], blob_store=None, large_file_store=None) -> Dict[str, List]:
+        """
+        Diff du workspace actuel avec un checkpoint.
+
+        Args:
+            checkpoint: Retour de checkpoint()
+            blob_store: Si fourni, les fichiers sont stockés comme blobs et les
+                entrées ne contiennent que {path, change, sha256, size}
+            large_file_store: Blob store des fichiers au-delà de max_file_size en mode
+                inline (entrée {path, change, content: None, encoding: "blob", sha256, size})
+
+        Returns:
+            {"files": [entrées created/modified], "deleted": [paths],
+             "skipped": [paths trop volumineux]}
+        """
+        current = self._scan(checkpoint)
+        files = []
+        skipped = []
+
+        for relative, entry in sorted(current.items()):
+            previous = checkpoint.get(relative)
+            if previous is not None and previous[:3] == entry[:3]:
+                continue  # Signature stat identique: inchangé
+
+            if blob_store is not None:
+                blob = _put_blob(blob_store, self.workspace / relative, relative, skipped)
+                if blob is None:
+                    continue
+                digest, size = blob
+                entry[3] = digest
+                if previous is not None and previous[3] == digest:
+                    continue  # Touché mais contenu identique
+                files.append({
+                    "path": relative,
+                    "change": "modified" if previous is not None else "created",
+                    "sha256": digest,
+                    "size": size
+                })
+                continue
+
+            size = entry[0]
+            if size > self.max_file_size:
+                large = _large_file_entry(large_file_store, self.workspace / relative, relative, skipped)
+                if large is None:
+                    continue
+                entry[3] = large["sha256"]
+                if previous is not None and previous[3] == large["sha256"]:
+                    continue  # Touché mais contenu identique
+                files.append({"change": "modified" if previous is not None else "created", **large})
+                continue
+
+            try:
+                data = (self.workspace / relative).read_bytes()
+            except Exception as e:
+                logger.error(f"Cannot read {relative}: {e}")
+                continue
+
+            digest = hashlib.sha256(data).hexdigest()
+            entry[3] = digest
+            if previous is not None and previous[3] == digest:
+                continue  # Touché mais contenu identique
+
+            try:
+                content = data.decode('utf-8')
+                encoding = "text"
+            except UnicodeDecodeError:
+                content = base64.b64encode(data).decode('utf-8')
+                encoding = "base64"
+
+            files.append({
+                "path": relative,
+                "change": "modified" if previous is not None else "created",
+                "content": content,
+                "encoding": encoding,
+                "size": len(data),
+                "hash": digest
+            })
+
+        deleted = sorted(set(checkpoint) - set(current))
+
+        with self._lock:
+            self._index = current
+            snapshot = json.dumps(current)
+        self._persist(snapshot)
+
+        logger.info(f"📸 Workspace changes: {len(files)} created/modified, {len(deleted)} deleted")
+        return {"files": files, "deleted": deleted, "skipped": skipped}
+
+    def _scan(self, known: Dict[str, list]) -> Dict[str, list]:
+        """Parcourt le workspace (dossiers ignorés élagués) → {path: [size, mtime_ns, inode, hash]}."""
+        entries: Dict[str, list] = {}
+        stack = [""]
+
+        while stack:
+            prefix = stack.pop()
+            try:
+                iterator = os.scandir(self.workspace / prefix if prefix else self.workspace)
+            except OSError:
+                continue
+
+            with iterator:
+                for dir_entry in iterator:
+                    relative = f"{prefix}{dir_entry.name}"
+                    try:
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            if not self.ignore_spec.match_file(f"{relative}/"):
+                                stack.append(f"{relative}/")
+                            continue
+                        if not dir_entry.is_file(follow_symlinks=False):
+                            continue
+                        if self.ignore_spec.match_file(relative):
+                            continue
+                        st = dir_entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    signature = [st.st_size, st.st_mtime_ns, st.st_ino]
+                    previous = known.get(relative)
+                    digest = previous[3] if previous is not None and previous[:3] == signature else None
+                    entries[relative] = signature + [digest]
+
+        return entries
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            return json.loads((self.workspace / ".claude" / self.FILENAME).read_text())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable file manifest in {self.workspace.name[:8]}...: {e}")
+            return {}
+
+    def _persist(self, snapshot: str):
+        """Écriture atomique 0o600 dans {workspace}/.claude/."""
+        claude_dir = self.workspace / ".claude"
+        tmp = claude_dir / f".{self.FILENAME}.{threading.get_ident()}.tmp"
+        try:
+            claude_dir.mkdir(mode=0o700, exist_ok=True)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(snapshot)
+            os.replace(tmp, claude_dir / self.FILENAME)
+        except Exception as e:
+            logger.warning(f"⚠️ Cannot persist file manifest for {self.workspace.name[:8]}...: {e}")
+
+
+def _put_blob(blob_store, file_path: Path, relative: str, skipped: List[str]) -> Optional[tuple]:
+    """Stocke file_path dans le blob store → (sha256, size), None si trop gros ou illisible."""
+    from blob_store import BlobTooLarge
+
+    try:
+        return blob_store.put_file(file_path)
+    except BlobTooLarge as e:
+        logger.warning(f"Skipping large file: {e}")
+        skipped.append(relative)
+    except Exception as e:
+        logger.error(f"Cannot store blob for {relative}: {e}")
+    return None
+
+
+def _large_file_entry(blob_store, file_path: Path, relative: str, skipped: List[str]) -> Optional[Dict]:
+    """Fichier trop gros pour être inliné → référence blob, None (ajouté à skipped) sans blob store."""
+    if blob_store is None:
+        logger.warning(f"Skipping large file: {relative}")
+        skipped.append(relative)
+        return None
+    blob = _put_blob(blob_store, file_path, relative, skipped)
+    if blob is None:
+        return None
+    return {"path": relative, "content": None, "encoding": "blob", "sha256": blob[0], "size": blob[1]}
+
+
+_manifests: Dict[str, WorkspaceManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_workspace_manifest(workspace: Path) -> WorkspaceManifest:
+    """Manifest du workspace (une instance par workspace, index chargé une seule fois)."""
+    key = str(workspace)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = _manifests[key] = WorkspaceManifest(workspace)
+        return manifest
+
+
+def drop_workspace_manifest(workspace: Path):
+    """Oublie le manifest du workspace (workspace supprimé)."""
+    with _manifests_lock:
+        _manifests.pop(str(workspace), None)
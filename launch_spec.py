@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compiled, immutable launch specs for the Claude CLI.
+
+Avant: argv, settings JSON, config MCP et env étaient reconstruits à chaque
+requête, en trois copies (one-shot, streaming, pool), et le proxy MCP était
+recopié dans le workspace à chaque fois.
+
+Maintenant: une LaunchSpec (frozen, hashable) par config de lancement
+(tenant, credentials, model, thinking, MCP, mode I/O), mémoïsée par empreinte.
+Seuls --resume et le prompt varient d'une requête à l'autre (command()).
+La compilation n'a lieu qu'au premier usage d'une config, ou quand elle change;
+un hit ne coûte qu'un stat par fichier dont la spec dépend (artifacts: scripts
+MCP déployés, socket du gateway), recompilée si l'un d'eux a disparu.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODEL_MAP = {
+    "opus": "claude-opus-4-20250514",
+    "sonnet": "claude-sonnet-4-5-20250929",
+    "haiku": "claude-3-5-haiku-20241022"
+}
+
+# Flags de sortie par mode I/O
+IO_MODE_FLAGS = {
+    # One-shot, réponse texte/JSON
+    "print": (),
+    # One-shot, sortie stream-json
+    "print-stream": ("--output-format", "stream-json", "--include-partial-messages", "--verbose"),
+    # Bidirectionnel (streaming + pool): messages stream-json sur stdin
+    "stream-json": (
+        "--input-format", "stream-json",
+        "--output-format", "stream-json",
+        "--include-partial-messages",
+        "--verbose"  # Required with --print + stream-json
+    ),
+}
+
+
+def resolve_model(model: str) -> str:
+    """Alias (opus/sonnet/haiku) → nom complet du modèle, sinon inchangé."""
+    return MODEL_MAP.get(model, model)
+
+
+@dataclass(frozen=True)
+class LaunchSpec:
+    """Lancement compilé d'un process CLI (immutable: partageable entre requêtes)."""
+
+    fingerprint: str
+    workspace: Path
+    argv: Tuple[str, ...]  # Sans --resume ni prompt
+    env: Tuple[Tuple[str, str], ...]
+    settings_json: str
+    mcp_config_json: Optional[str]
+    artifacts: Tuple[str, ...] = ()  # Fichiers créés par la compilation (workspace)
+
+    def command(self, resume: Optional[str] = None, prompt: Optional[str] = None) -> List[str]:
+        """
+        argv complet pour un run.
+
+        Args:
+            resume: Session à reprendre (--resume), None = nouvelle session
+            prompt: Prompt positionnel (mode print), précédé de '--' si une config MCP est passée
+        """
+        cmd = list(self.argv[:2])  # claude --print
+        if resume:
+            cmd.extend(["--resume", resume])
+        cmd.extend(self.argv[2:])
+        if prompt is not None:
+            if self.mcp_config_json:
+                # Sinon le prompt serait interprété comme argument de --mcp-config
+                cmd.append("--")
+            cmd.append(prompt)
+        return cmd
+
+    def environ(self) -> Dict[str, str]:
+        return dict(self.env)
+
+    def is_materialized(self) -> bool:
+        """True si tous les fichiers dont dépend la spec existent encore (workspace supprimé?)."""
+        return all(os.path.exists(path) for path in self.artifacts)
+
+
+class LaunchSpecCache:
+    """Specs compilées, par empreinte de config (LRU borné)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._specs: "OrderedDict[str, LaunchSpec]" = OrderedDict()
+        self._hits = 0
+        self._compiles = 0
+        self._stale = 0
+
+    @staticmethod
+    def fingerprint(config: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def get_or_compile(self, config: Dict[str, Any], compile: Callable[[str], LaunchSpec]) -> LaunchSpec:
+        """
+        Spec de config (JSON-sérialisable), compilée via compile(fingerprint) si absente.
+        """
+        fingerprint = self.fingerprint(config)
+        with self._lock:
+            spec = self._specs.get(fingerprint)
+        if spec is not None:
+            if spec.is_materialized():
+                with self._lock:
+                    if fingerprint in self._specs:
+                        self._specs.move_to_end(fingerprint)
+                    self._hits += 1
+                return spec
+            with self._lock:
+                self._stale += 1
+
+        # Compilation hors lock (filesystem: déploiement des scripts MCP, gateway)
+        spec = compile(fingerprint)
+        with self._lock:
+            self._specs[fingerprint] = spec
+            self._specs.move_to_end(fingerprint)
+            self._compiles += 1
+            while len(self._specs) > self.max_entries:
+                self._specs.popitem(last=False)
+        return spec
+
+    def evict(self, workspace: Path) -> int:
+        """Oublie les specs d'un workspace (supprimé). Returns: nombre de specs retirées."""
+        with self._lock:
+            stale = [fingerprint for fingerprint, spec in self._specs.items() if spec.workspace == workspace]
+            for fingerprint in stale:
+                del self._specs[fingerprint]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._compiles
+            return {
+                "specs": len(self._specs),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "compiles": self._compiles,
+                "stale": self._stale,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None
+            }
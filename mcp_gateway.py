@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+In-server MCP gateway for remote MCP servers (SSE / Streamable HTTP).
+
+Avant: chaque spawn du CLI lançait un `python3 mcp_proxy.py` par serveur MCP
+distant → interpréteur + import httpx + connexion upstream + discovery
+(tools/list) à chaque fois, des centaines de ms avant le premier tour.
+
+Maintenant:
+- Une event loop asyncio dédiée (thread "MCPGateway") dans le process serveur
+- Une connexion upstream (MCPProxyServer) et son catalogue d'outils par
+  (transport, url, path, auth), partagés par tous les process CLI
+- Un socket Unix par tenant ({workspace}/.claude/mcp-gateway.sock, 0o600):
+  le CLI lance mcp_shim.py (stdlib, quelques ms) qui relaie stdio ↔ socket
+- Un tenant n'accède qu'aux upstreams enregistrés pour son workspace
+  (handshake: upstream_id en première ligne)
+- Catalogue relu sur notifications/tools/list_changed de l'upstream ou après
+  CATALOG_TTL; s'il a changé, la notification est relayée aux shims connectés
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+import logging
+
+from mcp_proxy import MCPProxyServer, Transport
+
+logger = logging.getLogger(__name__)
+
+SOCKET_NAME = "mcp-gateway.sock"
+
+# Taille max d'une ligne JSON-RPC (arguments / résultats d'outils volumineux)
+LINE_LIMIT = 16 * 1024 * 1024
+
+# Catalogue d'outils relu après ce délai (SSE: aucune notification après la connexion)
+CATALOG_TTL = 300.0
+
+
+class _Upstream:
+    """Connexion à un serveur MCP distant, initialisée une fois, partagée entre tenants."""
+
+    def __init__(self, transport: Transport, url: str, streamable_http_path: str, auth_token: Optional[str],
+                 protocol_version: str, catalog_ttl: float = CATALOG_TTL):
+        self.transport = transport
+        self.url = url
+        self.proxy = MCPProxyServer(
+            transport=transport,
+            url=url,
+            oauth2_bearer=auth_token,
+            protocol_version=protocol_version,
+            streamable_http_path=streamable_http_path,
+            on_tools_discovered=self._on_tools_discovered
+        )
+        self.catalog_ttl = catalog_ttl
+        self.initialized_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        self.calls = 0
+        self.errors = 0
+        # Connexions des shims (writer, write_lock): destinataires de tools/list_changed
+        self.subscribers: set = set()
+        self._listed: Optional[list] = None  # Dernier catalogue servi aux shims
+        self._init_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def ensure_initialized(self):
+        async with self._init_lock:
+            if self.initialized_at is not None:
+                return
+            started = time.time()
+            await self.proxy.initialize()
+            self.initialized_at = time.time()
+            logger.info(
+                f"🔌 MCP upstream ready: {self.url} ({len(self.proxy.tools)} tools, "
+                f"{(self.initialized_at - started) * 1000:.0f}ms)"
+            )
+
+    async def list_tools(self) -> list:
+        await self.ensure_initialized()
+        self._schedule_refresh()
+        self._listed = list(self.proxy.tools.values())
+        return self._listed
+
+    async def call_tool(self, name: str, arguments: dict) -> Any:
+        await self.ensure_initialized()
+        self._schedule_refresh()
+        self.calls += 1
+        try:
+            # Streamable HTTP: appels concurrents multiplexés par id sur le stream du proxy
+            return await self.proxy.call_tool(name, arguments)
+        except Exception:
+            self.errors += 1
+            if self.transport == Transport.STREAMABLE_HTTP:
+                # Stream probablement cassé: reconnexion au prochain appel
+                await self.reset()
+            raise
+
+    def _schedule_refresh(self):
+        """Relance tools/list en arrière-plan si le catalogue a plus de catalog_ttl secondes."""
+        if self.refreshed_at is None or time.time() - self.refreshed_at < self.catalog_ttl:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def _refresh(self):
+        try:
+            await self.proxy.refresh_tools()
+        except Exception as e:
+            logger.warning(f"⚠️ MCP upstream {self.url}: catalog refresh failed: {e}")
+            self.refreshed_at = time.time()  # Catalogue actuel conservé jusqu'au prochain TTL
+
+    def _on_tools_discovered(self, tools: list):
+        """Catalogue relu (initialize, TTL ou list_changed upstream): prévient les shims s'il a changé."""
+        self.refreshed_at = time.time()
+        if self._listed is not None and tools != self._listed:
+            self._listed = tools
+            logger.info(f"🔌 MCP upstream {self.url}: tool catalog changed, notifying {len(self.subscribers)} connection(s)")
+            asyncio.ensure_future(self._notify_list_changed())
+
+    async def _notify_list_changed(self):
+        message = json.dumps({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"}).encode() + b"\n"
+        for writer, write_lock in list(self.subscribers):
+            try:
+                async with write_lock:
+                    writer.write(message)
+                    await writer.drain()
+            except (ConnectionError, RuntimeError):
+                self.subscribers.discard((writer, write_lock))
+
+    async def reset(self):
+        async with self._init_lock:
+            self.initialized_at = None
+            try:
+                await self.proxy.cleanup()
+            except Exception:
+                pass
+            self.proxy.http_stream = None
+            self.proxy.http_client = None
+
+
+class _TenantListener:
+    """Socket Unix d'un workspace et upstreams qu'il est autorisé à utiliser."""
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        self.upstream_ids: set = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.listening: Optional[concurrent.futures.Future] = None  # _listen() en cours ou terminé
+        self.connections = 0
+
+
+class MCPGateway:
+    """
+    Gateway MCP du serveur.
+
+    Usage:
+        socket_path, upstream_id = gateway.register(workspace, "sse", url, auth_token=...)
+        # config MCP du CLI: python3 mcp_shim.py <socket_path> <upstream_id>
+    """
+
+    def __init__(self, protocol_version: str = "2024-11-05"):
+        """
+        Args:
+            protocol_version: Version MCP annoncée au CLI et aux upstreams
+        """
+        self.protocol_version = protocol_version
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._upstreams: Dict[str, _Upstream] = {}
+        self._creating: Dict[str, concurrent.futures.Future] = {}  # upstream_id → _create_upstream()
+        self._tenants: Dict[str, _TenantListener] = {}
+        self._requests = 0
+
+    # ------------------------------------------------------------------ public
+
+    def register(
+        self,
+        workspace: Path,
+        transport: str,
+        url: str,
+        streamable_http_path: str = "/mcp",
+        auth_token: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Autorise un upstream pour le workspace (et ouvre son socket au premier appel).
+
+        Args:
+            workspace: Workspace du tenant
+            transport: "sse" ou "streamableHttp"
+            url: URL du serveur MCP distant
+            streamable_http_path: Chemin Streamable HTTP
+            auth_token: Bearer token upstream
+
+        Returns:
+            (socket_path, upstream_id) à passer à mcp_shim.py
+        """
+        upstream_id = hashlib.sha256(
+            json.dumps([transport, url, streamable_http_path, auth_token or ""]).encode()
+        ).hexdigest()[:24]
+
+        # Sous lock: uniquement la planification (futures partagées par les register concurrents),
+        # l'attente se fait hors lock pour ne pas bloquer les autres tenants
+        with self._lock:
+            loop = self._ensure_loop()
+            creating = self._creating.get(upstream_id)
+            if creating is None or (creating.done() and creating.exception() is not None):
+                # Créé dans la loop (asyncio.Lock)
+                creating = self._creating[upstream_id] = asyncio.run_coroutine_threadsafe(
+                    self._create_upstream(upstream_id, Transport(transport), url, streamable_http_path, auth_token),
+                    loop
+                )
+
+            key = str(workspace)
+            tenant = self._tenants.get(key)
+            if tenant is None:
+                tenant = self._tenants[key] = _TenantListener(workspace / ".claude" / SOCKET_NAME)
+            listening = tenant.listening
+            if listening is None or (listening.done() and (
+                    listening.exception() is not None or not tenant.socket_path.exists())):
+                # Premier register, échec précédent, ou socket supprimé avec le workspace: (ré)écoute
+                listening = tenant.listening = asyncio.run_coroutine_threadsafe(self._listen(tenant), loop)
+            tenant.upstream_ids.add(upstream_id)
+
+        creating.result()
+        listening.result()
+        return str(tenant.socket_path), upstream_id
+
+    def unregister(self, workspace: Path):
+        """
+        Ferme le socket du workspace et oublie ses upstreams autorisés (suppression du workspace).
+
+        Les upstreams partagés restent connectés pour les autres tenants.
+        """
+        with self._lock:
+            tenant = self._tenants.pop(str(workspace), None)
+            if tenant is None or tenant.listening is None:
+                return
+        try:
+            tenant.listening.result()
+        except Exception:
+            pass
+        asyncio.run_coroutine_threadsafe(self._close(tenant), self._loop).result()
+        logger.info(f"🔌 MCP gateway: tenant {workspace.name[:8]}... unregistered")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            upstreams = list(self._upstreams.values())
+            return {
+                "tenants": len(self._tenants),
+                "connections": sum(tenant.connections for tenant in self._tenants.values()),
+                "requests": self._requests,
+                "upstreams": [
+                    {
+                        "url": upstream.url,
+                        "transport": upstream.transport.value,
+                        "ready": upstream.initialized_at is not None,
+                        "tools": len(upstream.proxy.tools),
+                        "calls": upstream.calls,
+                        "errors": upstream.errors
+                    }
+                    for upstream in upstreams
+                ]
+            }
+
+    # ------------------------------------------------------------------ loop
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop du gateway (thread dédié, créé au premier register). Appelé sous lock."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, daemon=True, name="MCPGateway").start()
+            logger.info("🔌 MCP gateway started")
+        return self._loop
+
+    async def _create_upstream(self, upstream_id: str, transport: Transport, url: str, path: str,
+                               auth_token: Optional[str]):
+        self._upstreams[upstream_id] = _Upstream(transport, url, path, auth_token, self.protocol_version)
+
+    async def _listen(self, tenant: _TenantListener):
+        if tenant.server is not None:
+            await self._close(tenant)
+        tenant.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        try:
+            tenant.socket_path.unlink()  # Socket d'une instance précédente
+        except FileNotFoundError:
+            pass
+        tenant.server = await asyncio.start_unix_server(
+            lambda reader, writer: self._serve(tenant, reader, writer),
+            path=str(tenant.socket_path),
+            limit=LINE_LIMIT
+        )
+        os.chmod(tenant.socket_path, 0o600)
+
+    async def _close(self, tenant: _TenantListener):
+        if tenant.server is None:
+            return
+        tenant.server.close()
+        tenant.server = None
+        try:
+            tenant.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------ MCP
+
+    async def _serve(self, tenant: _TenantListener, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Une connexion = un serveur MCP vu par un process CLI (via mcp_shim)."""
+        tasks: Dict[Any, asyncio.Task] = {}  # id JSON-RPC → requête en cours
+        write_lock = asyncio.Lock()
+        upstream: Optional[_Upstream] = None
+        try:
+            upstream_id = (await reader.readline()).decode().strip()
+            upstream = self._upstreams.get(upstream_id)
+            if upstream is None or upstream_id not in tenant.upstream_ids:
+                logger.warning(f"⚠️ MCP gateway: unknown upstream {upstream_id[:12]} for {tenant.socket_path.parent.parent.name[:8]}...")
+                return
+            tenant.connections += 1
+            upstream.subscribers.add((writer, write_lock))
+
+            # Discovery en avance (déjà faite si un autre process a utilisé cet upstream)
+            asyncio.ensure_future(self._warm(upstream))
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"❌ MCP gateway: invalid JSON request: {e}")
+                    continue
+                if "id" not in request:
+                    # Notification: pas de réponse (annulation d'une requête en cours)
+                    if request.get("method") == "notifications/cancelled":
+                        task = tasks.get(request.get("params", {}).get("requestId"))
+                        if task is not None:
+                            task.cancel()
+                    continue
+                # Requêtes traitées en parallèle (réponses corrélées par id côté CLI)
+                request_id = request["id"]
+                task = asyncio.ensure_future(self._answer(upstream, request, writer, write_lock))
+                tasks[request_id] = task
+                task.add_done_callback(lambda _, request_id=request_id: tasks.pop(request_id, None))
+
+            if tasks:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"❌ MCP gateway connection error: {e}")
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            if upstream is not None:
+                upstream.subscribers.discard((writer, write_lock))
+            writer.close()
+
+    async def _warm(self, upstream: _Upstream):
+        try:
+            await upstream.ensure_initialized()
+        except Exception as e:
+            logger.warning(f"⚠️ MCP upstream {upstream.url} not ready: {e}")
+
+    async def _answer(self, upstream: _Upstream, request: Dict[str, Any], writer: asyncio.StreamWriter,
+                      write_lock: asyncio.Lock):
+        self._requests += 1
+        try:
+            response = await self._dispatch(upstream, request)
+        except asyncio.CancelledError:
+            return  # Annulée par le CLI: pas de réponse
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def _dispatch(self, upstream: _Upstream, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Même protocole que MCPProxyServer.run_stdio_server, upstream partagé."""
+        method = request.get("method", "unknown")
+        request_id = request.get("id")
+
+        try:
+            if method == "initialize":
+                result = {
+                    "protocolVersion": self.protocol_version,
+                    "capabilities": {"tools": {"listChanged": True}},
+                    "serverInfo": {"name": "mcp-proxy", "version": "1.0.0"}
+                }
+            elif method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = {"tools": await upstream.list_tools()}
+            elif method == "tools/call":
+                params = request.get("params", {})
+                result = await upstream.call_tool(params["name"], params.get("arguments", {}))
+            else:
+                logger.warning(f"⚠️ MCP gateway: unsupported method {method}")
+                return {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}
+                }
+        except Exception as e:
+            logger.error(f"❌ MCP gateway: {method} failed on {upstream.url}: {e}")
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": str(e)}}
+
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+_gateway: Optional[MCPGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_mcp_gateway() -> MCPGateway:
+    """Gateway MCP du process (créé au premier usage)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = MCPGateway()
+        return _gateway
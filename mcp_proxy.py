@@ -8,16 +8,30 @@ Supports:
 - Streamable HTTP (ndjson over persistent HTTP)
 - OAuth2 Bearer authentication
 - Custom headers
+- One pooled HTTP client per proxy (keep-alive, HTTP/2 if h2 is installed,
+  connection + concurrency limits, timeouts per operation type)
+- On-disk tools/list catalog cache (per url + auth hash, TTL): served at startup
+  while the remote server is revalidated in the background
 """
+import os
 import sys
 import json
+import time
 import asyncio
+import hashlib
 import logging
 import argparse
-from typing import Dict, Any, Optional, AsyncIterator
+from pathlib import Path
+from typing import Dict, Any, Optional, AsyncIterator, List, Callable
 from enum import Enum
 import httpx
 
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class Transport(Enum):
     """Supported MCP transport protocols."""
@@ -25,6 +39,87 @@ class Transport(Enum):
     STREAMABLE_HTTP = "streamableHttp"
 
 
+class ToolCatalogCache:
+    """
+    Catalogues tools/list sur disque, un fichier par (transport, url, hash des headers d'auth).
+
+    Fraîcheur = mtime du fichier (TTL); une revalidation sans changement ne fait qu'un utime.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 3600.0):
+        """
+        Args:
+            cache_dir: Dossier des catalogues (HOME du CLI = workspace du tenant)
+            ttl: Durée de validité d'un catalogue (secondes, 0 = cache désactivé)
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    @staticmethod
+    def key(transport: "Transport", url: str, streamable_http_path: str, headers: Dict[str, str]) -> str:
+        # Les headers (Authorization...) ne sont jamais écrits: seulement leur hash
+        auth_hash = hashlib.sha256(json.dumps(headers, sort_keys=True).encode()).hexdigest()
+        return hashlib.sha256(
+            json.dumps([transport.value, url, streamable_http_path, auth_hash]).encode()
+        ).hexdigest()[:32]
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def load(self, key: str) -> Optional[tuple]:
+        """
+        Returns:
+            (tools, age en secondes) si un catalogue frais existe, sinon None
+        """
+        if self.ttl <= 0:
+            return None
+        path = self._path(key)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+            if age > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("key") != key or not isinstance(data.get("tools"), list):
+            return None
+        return data["tools"], age
+
+    def store(self, key: str, url: str, tools: List[Dict[str, Any]]) -> bool:
+        """
+        Enregistre le catalogue (écriture atomique), ou prolonge sa fraîcheur s'il est inchangé.
+
+        Returns:
+            True si le catalogue sur disque a changé
+        """
+        if self.ttl <= 0:
+            return False
+        path = self._path(key)
+        content = json.dumps({"key": key, "url": url, "tools": tools}, sort_keys=True)
+        try:
+            if path.read_text(encoding="utf-8") == content:
+                os.utime(path)
+                return False
+        except OSError:
+            pass
+
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+        return True
+
+    def invalidate(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+
 class MCPProxyServer:
     """
     Proxy server that bridges remote MCP servers to local stdio.
@@ -41,8 +136,25 @@ class MCPProxyServer:
         oauth2_bearer: Optional[str] = None,
         protocol_version: str = "2024-11-05",
         log_level: str = "info",
-        streamable_http_path: str = "/mcp"
+        streamable_http_path: str = "/mcp",
+        max_connections: int = 10,
+        max_concurrent_calls: int = 8,
+        connect_timeout: float = 10.0,
+        discovery_timeout: float = 30.0,
+        call_timeout: float = 60.0,
+        catalog_cache: Optional[ToolCatalogCache] = None,
+        on_tools_discovered: Optional[Callable[[List[Dict[str, Any]]], None]] = None
     ):
+        """
+        Args:
+            max_connections: Connexions HTTP max vers le serveur MCP (pool du client)
+            max_concurrent_calls: Appels d'outils simultanés max (au-delà: attente)
+            connect_timeout: Timeout d'établissement de connexion (secondes)
+            discovery_timeout: Timeout des requêtes de connexion/discovery (SSE, tools/list)
+            call_timeout: Timeout d'un appel d'outil
+            catalog_cache: Cache disque du catalogue d'outils (None = discovery à chaque démarrage)
+            on_tools_discovered: Appelé avec le catalogue après chaque tools/list réussi (gateway)
+        """
         self.transport = transport
         self.url = url
         self.streamable_http_path = streamable_http_path
@@ -73,9 +185,65 @@ class MCPProxyServer:
         self.prompts: Dict[str, Any] = {}
         self.next_id = 1
 
-        # HTTP client for persistent connections
+        # HTTP client for persistent connections (créé au premier usage, partagé par tous les appels)
         self.http_client: Optional[httpx.AsyncClient] = None
         self.http_stream: Optional[httpx.Response] = None
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.discovery_timeout = discovery_timeout
+        self.call_timeout = call_timeout
+        self._call_slots = asyncio.Semaphore(max_concurrent_calls)
+        # Streamable HTTP: écritures sérialisées, un lecteur unique route les réponses par id
+        self._write_lock = asyncio.Lock()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+
+        # Catalogue d'outils: servi depuis le disque pendant la revalidation (_ready)
+        self.catalog_cache = catalog_cache
+        self.on_tools_discovered = on_tools_discovered
+        self.catalog_key = ToolCatalogCache.key(transport, url, streamable_http_path, self.headers)
+        self._served_catalog: Optional[List[Dict[str, Any]]] = None
+        self._ready: Optional[asyncio.Task] = None
+        self._retry_at = 0.0
+        self._retry_backoff = 1.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # stdio: requêtes en cours (id JSON-RPC → task) et file d'écriture stdout
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        self._outbox: Optional[asyncio.Queue] = None
+
+        # Réutilisation des connexions (loggé au cleanup)
+        self._http_requests = 0
+        self._http_connections: set = set()
+        self._http2_requests = 0
+
+    # ==================== HTTP client ====================
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Client HTTP du proxy: keep-alive, HTTP/2 si disponible, pool borné."""
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                ),
+                timeout=httpx.Timeout(self.call_timeout, connect=self.connect_timeout),
+                event_hooks={"response": [self._on_response]}
+            )
+        return self.http_client
+
+    def _timeout(self, seconds: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=self.connect_timeout)
+
+    async def _on_response(self, response: httpx.Response):
+        self._http_requests += 1
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            self._http_connections.add(id(stream))
+        if response.http_version == "HTTP/2":
+            self._http2_requests += 1
 
     # ==================== SSE Transport ====================
 
@@ -83,30 +251,35 @@ class MCPProxyServer:
         """Initialize connection using SSE transport."""
         self.logger.info(f"Connecting via SSE: {self.url}")
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                async with client.stream("GET", self.url, headers=self.headers) as response:
-                    response.raise_for_status()
-                    self.logger.info(f"SSE connected (status {response.status_code})")
+        client = self._get_http_client()
+        try:
+            async with client.stream(
+                "GET", self.url, headers=self.headers, timeout=self._timeout(self.discovery_timeout)
+            ) as response:
+                response.raise_for_status()
+                self.logger.info(f"SSE connected (status {response.status_code})")
 
-                    # Parse SSE events to get connection status
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                data = json.loads(line[6:])  # Remove "data: " prefix
+                # Parse SSE events to get connection status
+                async for line in response.aiter_lines():
+                    if line.startswith("data: "):
+                        try:
+                            data = json.loads(line[6:])  # Remove "data: " prefix
 
-                                if data.get("type") == "connection":
-                                    status = data.get("status", "unknown")
-                                    tools_count = data.get("tools", 0)
-                                    self.logger.info(f"Server status: {status}, tools: {tools_count}")
-                                    break  # Connection established
+                            if data.get("type") == "connection":
+                                status = data.get("status", "unknown")
+                                tools_count = data.get("tools", 0)
+                                self.logger.info(f"Server status: {status}, tools: {tools_count}")
+                                break  # Connection established
 
-                            except json.JSONDecodeError as e:
-                                self.logger.warning(f"Invalid JSON in SSE event: {e}")
+                            if "method" in data and "id" not in data:
+                                self._handle_server_notification(data)
 
-            except httpx.HTTPError as e:
-                self.logger.error(f"SSE connection failed: {e}")
-                raise
+                        except json.JSONDecodeError as e:
+                            self.logger.warning(f"Invalid JSON in SSE event: {e}")
+
+        except httpx.HTTPError as e:
+            self.logger.error(f"SSE connection failed: {e}")
+            raise
 
         # Request capabilities (tools, resources, prompts)
         await self.request_capabilities_sse()
@@ -123,18 +296,18 @@ class MCPProxyServer:
 
         message_url = self.url.replace("/sse", "/message")
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                message_url,
-                json=tools_request,
-                headers=self.headers
-            )
+        client = self._get_http_client()
+        response = await client.post(
+            message_url,
+            json=tools_request,
+            headers=self.headers,
+            timeout=self._timeout(self.discovery_timeout)
+        )
 
-            if response.status_code == 200:
-                result = response.json()
-                if "result" in result and "tools" in result["result"]:
-                    self.tools = {tool["name"]: tool for tool in result["result"]["tools"]}
-                    self.logger.info(f"Discovered {len(self.tools)} tools: {list(self.tools.keys())}")
+        if response.status_code == 200:
+            result = response.json()
+            if "result" in result and "tools" in result["result"]:
+                self._set_tools(result["result"]["tools"])
 
     async def call_tool_sse(self, tool_name: str, arguments: dict) -> Any:
         """Call a tool using SSE/POST transport."""
@@ -152,12 +325,13 @@ class MCPProxyServer:
 
         message_url = self.url.replace("/sse", "/message")
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with self._call_slots:
             try:
-                response = await client.post(
+                response = await self._get_http_client().post(
                     message_url,
                     json=request,
-                    headers=self.headers
+                    headers=self.headers,
+                    timeout=self._timeout(self.call_timeout)
                 )
                 response.raise_for_status()
 
@@ -176,15 +350,13 @@ class MCPProxyServer:
         full_url = f"{self.url}{self.streamable_http_path}"
         self.logger.info(f"Connecting via Streamable HTTP: {full_url}")
 
-        # Create persistent HTTP client
-        self.http_client = httpx.AsyncClient(timeout=None)  # No timeout for streams
-
-        # Open bidirectional stream
-        self.http_stream = await self.http_client.stream(
+        # Open bidirectional stream (client partagé, pas de timeout sur le stream)
+        self.http_stream = await self._get_http_client().stream(
             "POST",
             full_url,
             headers={**self.headers, "Content-Type": "application/json"},
-            content=self._streamable_http_request_generator()
+            content=self._streamable_http_request_generator(),
+            timeout=self._timeout(None)
         ).__aenter__()
 
         self.logger.info("Streamable HTTP stream opened")
@@ -204,13 +376,16 @@ class MCPProxyServer:
             }
         }
 
-        await self._send_streamable_request(init_request)
-        init_response = await self._read_streamable_response()
+        self._reader_task = asyncio.create_task(self._streamable_reader(self.http_stream))
+        init_response = await self._streamable_request(init_request, self.discovery_timeout)
 
         server_info = init_response.get("result", {}).get("serverInfo", {})
         self.logger.info(f"Server initialized: {server_info.get('name', 'unknown')}")
 
-        # Request tools list
+        await self.request_capabilities_streamable_http()
+
+    async def request_capabilities_streamable_http(self):
+        """Request tools list over the Streamable HTTP stream."""
         tools_request = {
             "jsonrpc": "2.0",
             "id": self._get_next_id(),
@@ -218,12 +393,10 @@ class MCPProxyServer:
             "params": {}
         }
 
-        await self._send_streamable_request(tools_request)
-        tools_response = await self._read_streamable_response()
+        tools_response = await self._streamable_request(tools_request, self.discovery_timeout)
 
         if "result" in tools_response and "tools" in tools_response["result"]:
-            self.tools = {tool["name"]: tool for tool in tools_response["result"]["tools"]}
-            self.logger.info(f"Discovered {len(self.tools)} tools: {list(self.tools.keys())}")
+            self._set_tools(tools_response["result"]["tools"])
 
     async def _streamable_http_request_generator(self) -> AsyncIterator[bytes]:
         """Generator that yields ndjson requests for Streamable HTTP."""
@@ -234,14 +407,57 @@ class MCPProxyServer:
     async def _send_streamable_request(self, request: dict):
         """Send a request over Streamable HTTP stream."""
         line = json.dumps(request) + "\n"
-        await self.http_stream.awrite(line.encode('utf-8'))
+        async with self._write_lock:
+            await self.http_stream.awrite(line.encode('utf-8'))
 
-    async def _read_streamable_response(self) -> dict:
-        """Read one response from Streamable HTTP stream."""
-        async for line in self.http_stream.aiter_lines():
-            if line.strip():
-                return json.loads(line)
-        raise ConnectionError("Stream closed unexpectedly")
+    async def _streamable_request(self, request: dict, timeout: Optional[float]) -> dict:
+        """
+        Envoie une requête sur le stream et attend sa réponse (routée par id par le lecteur).
+
+        Seule l'écriture est sérialisée: plusieurs requêtes peuvent être en vol sur le
+        même stream. En cas d'annulation ou de timeout, la réponse tardive est ignorée.
+
+        Raises:
+            ConnectionError: Si le stream est fermé avant la réponse
+            asyncio.TimeoutError: Si la réponse n'arrive pas dans le délai
+        """
+        if self._reader_task is None or self._reader_task.done():
+            raise ConnectionError("Streamable HTTP stream is not open")
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request["id"]] = future
+        try:
+            await self._send_streamable_request(request)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request["id"], None)
+
+    async def _streamable_reader(self, stream: httpx.Response):
+        """Lecteur unique du stream: notifications traitées, réponses remises à leur requête."""
+        error: Exception = ConnectionError("Stream closed unexpectedly")
+        try:
+            async for line in stream.aiter_lines():
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if "method" in message and "id" not in message:
+                    self._handle_server_notification(message)
+                    continue
+                future = self._pending.get(message.get("id"))
+                if future is None:
+                    # Réponse d'une requête annulée ou expirée
+                    self.logger.debug(f"Dropping response for unknown request id {message.get('id')}")
+                elif not future.done():
+                    future.set_result(message)
+        except asyncio.CancelledError:
+            error = ConnectionError("Stream closed")
+            raise
+        except Exception as e:
+            self.logger.error(f"Streamable HTTP stream failed: {e}")
+            error = ConnectionError(f"Stream failed: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
 
     async def call_tool_streamable_http(self, tool_name: str, arguments: dict) -> Any:
         """Call a tool using Streamable HTTP transport."""
@@ -257,8 +473,9 @@ class MCPProxyServer:
             }
         }
 
-        await self._send_streamable_request(request)
-        response = await self._read_streamable_response()
+        # Appels concurrents sur le même stream ndjson (réponses routées par id)
+        async with self._call_slots:
+            response = await self._streamable_request(request, self.call_timeout)
 
         self.logger.debug(f"Tool result: {response}")
         return response.get("result", {})
@@ -278,19 +495,136 @@ class MCPProxyServer:
         else:
             await self.initialize_streamable_http()
 
+    async def refresh_tools(self):
+        """Re-run tools/list on the live connection (after notifications/tools/list_changed)."""
+        if self.transport == Transport.SSE:
+            await self.request_capabilities_sse()
+        else:
+            await self.request_capabilities_streamable_http()
+
+    # ==================== Tool catalog cache ====================
+
+    def load_cached_catalog(self) -> bool:
+        """Charge le catalogue depuis le cache disque s'il est frais (True si servi depuis le cache)."""
+        if self.catalog_cache is None:
+            return False
+        cached = self.catalog_cache.load(self.catalog_key)
+        if cached is None:
+            return False
+        tools, age = cached
+        self.tools = {tool["name"]: tool for tool in tools}
+        self._served_catalog = tools
+        self.logger.info(f"Serving {len(tools)} tools from catalog cache (age {age:.0f}s), revalidating in background")
+        return True
+
+    def _set_tools(self, tools: List[Dict[str, Any]]):
+        """Catalogue découvert sur le serveur distant: mémoire, cache disque, notification du CLI."""
+        self.tools = {tool["name"]: tool for tool in tools}
+        self.logger.info(f"Discovered {len(self.tools)} tools: {list(self.tools.keys())}")
+
+        if self.catalog_cache is not None:
+            try:
+                self.catalog_cache.store(self.catalog_key, self.url, tools)
+            except OSError as e:
+                self.logger.warning(f"Cannot write tool catalog cache: {e}")
+
+        if self._served_catalog is not None and tools != self._served_catalog:
+            # Le CLI a déjà reçu l'ancien catalogue: il doit refaire tools/list
+            self.logger.info("Tool catalog changed since it was served, notifying Claude CLI")
+            self._notify_client("notifications/tools/list_changed")
+        self._served_catalog = tools if self._outbox is not None else None
+        if self.on_tools_discovered is not None:
+            self.on_tools_discovered(tools)
+
+    def _handle_server_notification(self, message: dict):
+        """Notification du serveur distant (tools/list_changed: cache invalidé, catalogue relu)."""
+        method = message.get("method")
+        if method != "notifications/tools/list_changed":
+            self.logger.debug(f"Ignoring server notification: {method}")
+            return
+
+        self.logger.info("Remote tool catalog changed, invalidating cache")
+        if self.catalog_cache is not None:
+            self.catalog_cache.invalidate(self.catalog_key)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_catalog())
+
+    async def _refresh_catalog(self):
+        try:
+            await self.refresh_tools()
+        except Exception as e:
+            self.logger.error(f"Tool catalog refresh failed: {e}")
+
+    async def _ensure_ready(self):
+        """
+        Attend la revalidation en arrière-plan (connexion distante requise pour tools/call).
+
+        Si elle a échoué, un nouvel initialize() est lancé par le prochain appel, après
+        un backoff exponentiel (1s → 60s); avant l'échéance, l'appel échoue immédiatement.
+        """
+        if self._ready is None:
+            return
+        if self._ready.done() and (self._ready.cancelled() or self._ready.exception() is not None):
+            loop = asyncio.get_running_loop()
+            if loop.time() < self._retry_at:
+                raise ConnectionError(
+                    f"Remote MCP server unavailable (retry in {self._retry_at - loop.time():.0f}s)"
+                )
+            self.logger.info("Retrying remote MCP server initialization")
+            await self._reset_connection()
+            self._ready = asyncio.create_task(self.initialize())
+            self._ready.add_done_callback(self._on_revalidated)
+        await asyncio.shield(self._ready)
+
+    async def _reset_connection(self):
+        """Ferme le stream Streamable HTTP d'une initialisation échouée (le client HTTP est conservé)."""
+        await self._stop_reader()
+        if self.http_stream is not None:
+            try:
+                await self.http_stream.aclose()
+            except Exception:
+                pass
+            self.http_stream = None
+
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
         """Call a tool based on transport type."""
+        await self._ensure_ready()
         if self.transport == Transport.SSE:
             return await self.call_tool_sse(tool_name, arguments)
         else:
             return await self.call_tool_streamable_http(tool_name, arguments)
 
+    async def _stop_reader(self):
+        """Arrête le lecteur du stream (les requêtes en attente échouent avec ConnectionError)."""
+        task, self._reader_task = self._reader_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
     async def cleanup(self):
         """Cleanup resources."""
+        for task in (self._ready, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+        await self._stop_reader()
         if self.http_stream:
             await self.http_stream.aclose()
         if self.http_client:
             await self.http_client.aclose()
+            self.logger.info(self.connection_stats())
+
+    def connection_stats(self) -> str:
+        """Requêtes HTTP vs connexions ouvertes (réutilisation keep-alive / HTTP/2)."""
+        connections = len(self._http_connections)
+        reused = max(0, self._http_requests - connections)
+        ratio = f"{reused / self._http_requests:.0%}" if self._http_requests else "n/a"
+        return (
+            f"HTTP client: {self._http_requests} requests over {connections} connection(s), "
+            f"{reused} reused ({ratio}), {self._http2_requests} over HTTP/2"
+        )
 
     # ==================== stdio MCP Server ====================
 
@@ -300,100 +634,205 @@ class MCPProxyServer:
 
         This method implements the MCP protocol over stdin/stdout,
         forwarding requests to the remote MCP server.
+
+        Requests are dispatched concurrently (one task per JSON-RPC id), so parallel
+        tool calls take as long as the slowest one; responses are written as they
+        complete (out of order) and can be cancelled via notifications/cancelled.
         """
         self.logger.info("Starting stdio MCP server...")
 
+        writer_task = None
         try:
-            # Initialize remote connection
-            await self.initialize()
-            self.logger.info("Remote MCP server initialized, waiting for Claude CLI requests...")
+            self._outbox = asyncio.Queue()
+            writer_task = asyncio.create_task(self._stdout_writer())
+
+            if self.load_cached_catalog():
+                # Catalogue frais sur disque: réponse immédiate, revalidation en arrière-plan
+                self._ready = asyncio.create_task(self.initialize())
+                self._ready.add_done_callback(self._on_revalidated)
+            else:
+                # Initialize remote connection
+                await self.initialize()
+                self.logger.info("Remote MCP server initialized, waiting for Claude CLI requests...")
+
+            reader = await self._open_stdin()
 
             # Main request loop
             while True:
-                # Read request from stdin
-                line = await asyncio.get_event_loop().run_in_executor(
-                    None, sys.stdin.readline
-                )
+                line = await reader.readline()
 
                 if not line:
                     self.logger.info("EOF received, shutting down")
                     break
 
-                try:
-                    request = json.loads(line.strip())
-                    method = request.get("method", "unknown")
-                    request_id = request.get("id")
-                    self.logger.debug(f"Received request: {method} (id={request_id})")
-
-                    # Handle different MCP methods
-                    if method == "initialize":
-                        response = {
-                            "jsonrpc": "2.0",
-                            "id": request_id,
-                            "result": {
-                                "protocolVersion": self.protocol_version,
-                                "capabilities": {
-                                    "tools": {
-                                        "listChanged": False
-                                    }
-                                },
-                                "serverInfo": {
-                                    "name": "mcp-proxy",
-                                    "version": "1.0.0"
-                                }
-                            }
-                        }
-                        self.logger.info(f"Sent initialize response to Claude CLI")
-
-                    elif method == "tools/list":
-                        response = {
-                            "jsonrpc": "2.0",
-                            "id": request["id"],
-                            "result": {
-                                "tools": list(self.tools.values())
-                            }
-                        }
-
-                    elif method == "tools/call":
-                        tool_name = request["params"]["name"]
-                        arguments = request["params"].get("arguments", {})
-
-                        result = await self.call_tool(tool_name, arguments)
-
-                        response = {
-                            "jsonrpc": "2.0",
-                            "id": request["id"],
-                            "result": result
-                        }
-
-                    else:
-                        self.logger.warning(f"Unsupported method: {method}")
-                        response = {
-                            "jsonrpc": "2.0",
-                            "id": request.get("id"),
-                            "error": {
-                                "code": -32601,
-                                "message": f"Method not found: {method}"
-                            }
-                        }
-
-                    self._write_response(response)
+                if not line.strip():
+                    continue
 
+                try:
+                    request = json.loads(line)
                 except json.JSONDecodeError as e:
                     self.logger.error(f"Invalid JSON request: {e}")
-                except Exception as e:
-                    self.logger.error(f"Error processing request: {e}", exc_info=True)
+                    continue
+
+                self._dispatch(request)
+
+            # Laisser finir les requêtes en cours avant de fermer stdout
+            if self._inflight:
+                await asyncio.gather(*self._inflight.values(), return_exceptions=True)
 
         except Exception as e:
             self.logger.error(f"Fatal error: {e}", exc_info=True)
             sys.exit(1)
         finally:
+            if writer_task is not None:
+                await self._outbox.put(None)
+                await writer_task
             await self.cleanup()
 
+    def _on_revalidated(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self._retry_at = asyncio.get_running_loop().time() + self._retry_backoff
+            self.logger.error(
+                f"Remote MCP server initialization failed: {task.exception()} "
+                f"(retry in {self._retry_backoff:.0f}s)"
+            )
+            self._retry_backoff = min(self._retry_backoff * 2, 60.0)
+        else:
+            self._retry_backoff = 1.0
+            self.logger.info("Remote MCP server initialized, tool catalog revalidated")
+
+    async def _open_stdin(self) -> asyncio.StreamReader:
+        """stdin en StreamReader asyncio (pas de thread executor par ligne)."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=16 * 1024 * 1024)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        return reader
+
+    def _dispatch(self, request: dict):
+        """Une task par requête (corrélée par id); les notifications sont traitées sur place."""
+        method = request.get("method", "unknown")
+        request_id = request.get("id")
+        self.logger.debug(f"Received request: {method} (id={request_id})")
+
+        if "id" not in request:
+            if method == "notifications/cancelled":
+                cancelled_id = request.get("params", {}).get("requestId")
+                task = self._inflight.get(cancelled_id)
+                if task is not None:
+                    task.cancel()
+                    self.logger.info(f"Request cancelled by client (id={cancelled_id})")
+            return  # Notification: pas de réponse
+
+        task = asyncio.create_task(self._answer(request))
+        self._inflight[request_id] = task
+        task.add_done_callback(lambda _: self._inflight.pop(request_id, None))
+
+    async def _answer(self, request: dict):
+        try:
+            response = await self.handle_request(request)
+        except asyncio.CancelledError:
+            return  # Annulée: le client n'attend plus de réponse
+        except Exception as e:
+            self.logger.error(f"Error processing request: {e}", exc_info=True)
+            response = {
+                "jsonrpc": "2.0",
+                "id": request.get("id"),
+                "error": {
+                    "code": -32603,
+                    "message": str(e)
+                }
+            }
+        self._write_response(response)
+
+    async def handle_request(self, request: dict) -> dict:
+        """Réponse JSON-RPC à une requête du CLI (initialize, tools/list, tools/call)."""
+        method = request.get("method", "unknown")
+        request_id = request.get("id")
+
+        # Handle different MCP methods
+        if method == "initialize":
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "protocolVersion": self.protocol_version,
+                    "capabilities": {
+                        "tools": {
+                            # Catalogue servi depuis le cache: peut changer après revalidation
+                            "listChanged": self.catalog_cache is not None
+                        }
+                    },
+                    "serverInfo": {
+                        "name": "mcp-proxy",
+                        "version": "1.0.0"
+                    }
+                }
+            }
+            self.logger.info(f"Sent initialize response to Claude CLI")
+
+        elif method == "tools/list":
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "tools": list(self.tools.values())
+                }
+            }
+
+        elif method == "tools/call":
+            tool_name = request["params"]["name"]
+            arguments = request["params"].get("arguments", {})
+
+            result = await self.call_tool(tool_name, arguments)
+
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": result
+            }
+
+        else:
+            self.logger.warning(f"Unsupported method: {method}")
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {
+                    "code": -32601,
+                    "message": f"Method not found: {method}"
+                }
+            }
+
+        return response
+
+    def _notify_client(self, method: str):
+        """Notification JSON-RPC vers le CLI (no-op hors mode stdio)."""
+        if self._outbox is not None:
+            self._write_response({"jsonrpc": "2.0", "method": method})
+
     def _write_response(self, response: dict):
-        """Write a response to stdout."""
-        print(json.dumps(response), flush=True)
+        """Queue a response for stdout (written by _stdout_writer, one message per line)."""
+        self._outbox.put_nowait(json.dumps(response).encode("utf-8") + b"\n")
 
+    async def _stdout_writer(self):
+        """Seul écrivain de stdout: regroupe les réponses prêtes en une écriture + flush."""
+        out = sys.stdout.buffer
+        while True:
+            item = await self._outbox.get()
+            done = item is None
+            chunks = [] if done else [item]
+            while not self._outbox.empty():
+                item = self._outbox.get_nowait()
+                if item is None:
+                    done = True
+                else:
+                    chunks.append(item)
+            if chunks:
+                out.write(b"".join(chunks))
+                out.flush()
+            if done:
+                return
 
 def main():
     """Main entry point."""
@@ -438,6 +877,51 @@ def main():
         help="MCP protocol version (default: 2024-11-05)"
     )
 
+    # HTTP client
+    parser.add_argument(
+        "--maxConnections",
+        type=int,
+        default=10,
+        help="Max HTTP connections to the MCP server (default: 10)"
+    )
+    parser.add_argument(
+        "--maxConcurrentCalls",
+        type=int,
+        default=8,
+        help="Max concurrent tool calls (default: 8)"
+    )
+    parser.add_argument(
+        "--connectTimeout",
+        type=float,
+        default=10.0,
+        help="Connection timeout in seconds (default: 10)"
+    )
+    parser.add_argument(
+        "--discoveryTimeout",
+        type=float,
+        default=30.0,
+        help="Timeout for connection/discovery requests in seconds (default: 30)"
+    )
+    parser.add_argument(
+        "--callTimeout",
+        type=float,
+        default=60.0,
+        help="Timeout for a tool call in seconds (default: 60)"
+    )
+
+    # Tool catalog cache
+    parser.add_argument(
+        "--catalogTtl",
+        type=float,
+        default=3600.0,
+        help="Tool catalog cache TTL in seconds, 0 to disable (default: 3600)"
+    )
+    parser.add_argument(
+        "--catalogCacheDir",
+        default=os.path.join(os.path.expanduser("~"), ".cache", "mcp-proxy"),
+        help="Tool catalog cache directory (default: ~/.cache/mcp-proxy)"
+    )
+
     # Logging
     parser.add_argument(
         "--logLevel",
@@ -471,7 +955,13 @@ def main():
         oauth2_bearer=args.oauth2Bearer,
         protocol_version=args.protocolVersion,
         log_level=args.logLevel,
-        streamable_http_path=args.streamableHttpPath
+        streamable_http_path=args.streamableHttpPath,
+        max_connections=args.maxConnections,
+        max_concurrent_calls=args.maxConcurrentCalls,
+        connect_timeout=args.connectTimeout,
+        discovery_timeout=args.discoveryTimeout,
+        call_timeout=args.callTimeout,
+        catalog_cache=ToolCatalogCache(Path(args.catalogCacheDir), args.catalogTtl) if args.catalogTtl > 0 else None
     )
 
     try:
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+MCP stdio shim: Claude CLI (stdio) ↔ in-server MCP gateway (Unix socket).
+
+Lancé par le CLI à la place de mcp_proxy.py pour les serveurs MCP distants.
+Stdlib uniquement (pas d'httpx, pas de discovery): démarre en quelques ms, la
+connexion upstream et le catalogue d'outils vivent dans le gateway du serveur.
+
+Usage: python3 mcp_shim.py <socket_path> <upstream_id>
+"""
+import os
+import socket
+import sys
+import threading
+
+
+def _pump_stdin(sock: socket.socket):
+    """stdin (requêtes JSON-RPC du CLI) → socket."""
+    try:
+        while True:
+            data = os.read(0, 65536)
+            if not data:
+                break
+            sock.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("usage: mcp_shim.py <socket_path> <upstream_id>", file=sys.stderr)
+        sys.exit(2)
+    socket_path, upstream_id = sys.argv[1], sys.argv[2]
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        print(f"[MCP-Shim] Cannot connect to MCP gateway ({socket_path}): {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Handshake: upstream demandé (autorisé pour ce tenant par le gateway)
+    sock.sendall(upstream_id.encode() + b"\n")
+    threading.Thread(target=_pump_stdin, args=(sock,), daemon=True).start()
+
+    # socket (réponses JSON-RPC) → stdout
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            written = os.write(1, view)
+            view = view[written:]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Single-thread pipe reader for Claude CLI processes.
+
+Un seul thread (selectors → epoll sur Linux) lit stdout/stderr de tous les
+process CLI (pool + streaming), découpe les lignes et les transmet aux
+callbacks de leur propriétaire. Le nombre de threads reste constant quelle
+que soit la taille du pool (avant: 2 threads de lecture par process).
+
+Les callbacks sont appelés dans le thread du reader: ils doivent être
+rapides et non-bloquants (ex: queue.put, loop.call_soon_threadsafe).
+"""
+
+import os
+import selectors
+import threading
+from typing import Optional, Callable, Dict, Any, List, IO
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _PipeStream:
+    """État de lecture d'un pipe enregistré (buffer de ligne partielle)."""
+
+    __slots__ = ("pipe", "on_line", "on_eof", "buffer", "scanned")
+
+    def __init__(self, pipe: IO, on_line: Callable[[str], None], on_eof: Optional[Callable[[], None]]):
+        self.pipe = pipe
+        self.on_line = on_line
+        self.on_eof = on_eof
+        self.buffer = bytearray()
+        self.scanned = 0  # Octets du buffer déjà parcourus sans trouver de '\n'
+
+
+class PipeReader:
+    """
+    Multiplexeur de pipes: un thread, un selector, N process.
+
+    Usage:
+        reader = PipeReader()
+        reader.register(process.stdout, on_line=handle_line, on_eof=handle_eof)
+    """
+
+    def __init__(self, read_size: int = 64 * 1024, max_line_size: int = 16 * 1024 * 1024):
+        """
+        Args:
+            read_size: Taille de lecture par os.read
+            max_line_size: Ligne partielle max en buffer (au-delà, émise telle quelle)
+        """
+        self.read_size = read_size
+        self.max_line_size = max_line_size
+
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending: List[_PipeStream] = []
+        self._registered = 0
+        self._lines = 0
+        self._bytes = 0
+
+        # Self-pipe: réveille select() quand un pipe est enregistré
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name="PipeReader")
+        self._thread.start()
+
+        logger.info(f"📡 Pipe reader started ({type(self._selector).__name__})")
+
+    def register(
+        self,
+        pipe: IO,
+        on_line: Callable[[str], None],
+        on_eof: Optional[Callable[[], None]] = None
+    ):
+        """
+        Confie un pipe au reader.
+
+        Le reader devient propriétaire du pipe: il le ferme après EOF. Le pipe ne
+        doit plus être lu ailleurs (lecture directe sur le fd, pas de buffer Python).
+
+        Args:
+            pipe: stdout/stderr d'un subprocess.Popen
+            on_line: Appelé pour chaque ligne complète (décodée UTF-8, sans '\\n')
+            on_eof: Appelé une fois le pipe fermé (fin du process)
+        """
+        os.set_blocking(pipe.fileno(), False)
+        with self._lock:
+            self._pending.append(_PipeStream(pipe, on_line, on_eof))
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "registered_pipes": self._registered,
+                "lines": self._lines,
+                "bytes": self._bytes
+            }
+
+    # ------------------------------------------------------------------ internals
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # Déjà réveillé
+
+    def _run(self):
+        while True:
+            try:
+                for key, _ in self._selector.select():
+                    if key.data is None:
+                        self._drain_wakeups()
+                    else:
+                        self._read(key.fd, key.data)
+            except Exception as e:
+                logger.error(f"❌ Error in pipe reader loop: {e}")
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        for stream in pending:
+            self._selector.register(stream.pipe.fileno(), selectors.EVENT_READ, stream)
+            with self._lock:
+                self._registered += 1
+
+    def _read(self, fd: int, stream: _PipeStream):
+        try:
+            chunk = os.read(fd, self.read_size)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.error(f"❌ Error reading pipe fd={fd}: {e}")
+            chunk = b""
+
+        if not chunk:
+            self._close(fd, stream)
+            return
+
+        with self._lock:
+            self._bytes += len(chunk)
+
+        buffer = stream.buffer
+        buffer.extend(chunk)
+
+        # Émet toutes les lignes complètes, puis compacte le buffer une seule fois
+        start = 0
+        newline = buffer.find(b"\n", stream.scanned)
+        while newline >= 0:
+            self._emit(stream, buffer[start:newline])
+            start = newline + 1
+            newline = buffer.find(b"\n", start)
+
+        if start:
+            del buffer[:start]
+        stream.scanned = len(buffer)
+
+        if len(buffer) > self.max_line_size:
+            logger.warning(f"⚠️ Line exceeds {self.max_line_size} bytes on fd={fd}, emitting as-is")
+            self._emit(stream, buffer)
+            buffer.clear()
+            stream.scanned = 0
+
+    def _emit(self, stream: _PipeStream, raw: bytearray):
+        with self._lock:
+            self._lines += 1
+        try:
+            stream.on_line(raw.decode("utf-8", errors="replace"))
+        except Exception as e:
+            logger.error(f"❌ Error in pipe line callback: {e}")
+
+    def _close(self, fd: int, stream: _PipeStream):
+        if stream.buffer:
+            self._emit(stream, stream.buffer)
+            stream.buffer.clear()
+
+        self._selector.unregister(fd)
+        with self._lock:
+            self._registered -= 1
+
+        try:
+            stream.pipe.close()
+        except Exception:
+            pass
+
+        if stream.on_eof is not None:
+            try:
+                stream.on_eof()
+            except Exception as e:
+                logger.error(f"❌ Error in pipe EOF callback: {e}")
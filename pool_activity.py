@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Per-tenant activity log for predictive pre-spawn of pooled CLI processes.
+
+Chaque requête pooled est enregistrée (timestamp + config de lancement) en
+mémoire; les tenants modifiés sont écrits par lot toutes les flush_interval
+secondes (et à la sortie du process) dans {workspace}/.claude/pool_activity.json
+(permissions 0o600, dans le workspace du tenant: les configs MCP peuvent
+contenir des tokens). Aucune écriture disque sur le chemin d'une requête.
+
+Prédiction:
+- Probabilité de retour dans un horizon H, sachant que le tenant est absent
+  depuis t: P(gap <= t + H | gap > t), estimée sur l'historique des
+  intervalles entre requêtes (distribution empirique)
+- Config usuelle: la config de lancement la plus fréquente
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TenantActivityLog:
+    """
+    Historique d'arrivées par tenant, persisté dans le workspace de chaque tenant.
+
+    Thread-safe. Les écritures disque sont différées (thread "ActivityFlush")
+    et atomiques (fichier temporaire + rename).
+    """
+
+    FILENAME = "pool_activity.json"
+
+    def __init__(self, max_arrivals: int = 200, max_launches: int = 5, min_samples: int = 3,
+                 flush_interval: float = 30.0):
+        """
+        Args:
+            max_arrivals: Nombre de timestamps d'arrivée conservés par tenant
+            max_launches: Nombre de configs de lancement distinctes conservées par tenant
+            min_samples: Intervalles minimum (au-delà de l'absence actuelle) pour prédire un retour
+            flush_interval: Délai max (secondes) avant l'écriture disque d'un tenant modifié
+        """
+        self.max_arrivals = max_arrivals
+        self.max_launches = max_launches
+        self.min_samples = min_samples
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, Dict[str, Any]] = {}
+        self._workspaces: Dict[str, Path] = {}
+        self._dirty: set = set()
+        self._flusher: Optional[threading.Thread] = None
+
+    def load(self, workspaces_root: Path) -> int:
+        """
+        Charge l'historique persisté de tous les workspaces.
+
+        Returns:
+            Nombre de tenants chargés
+        """
+        loaded = 0
+        for activity_file in Path(workspaces_root).glob(f"*/.claude/{self.FILENAME}"):
+            try:
+                data = json.loads(activity_file.read_text())
+                user_id = data["user_id"]
+            except Exception as e:
+                logger.warning(f"⚠️ Ignoring unreadable activity log {activity_file}: {e}")
+                continue
+
+            with self._lock:
+                self._tenants[user_id] = data
+                self._workspaces[user_id] = activity_file.parent.parent
+            loaded += 1
+
+        logger.info(f"📈 Activity log loaded: {loaded} tenant(s)")
+        return loaded
+
+    def record(self, user_id: str, workspace: Path, fingerprint: str, launch: Dict[str, Any]):
+        """
+        Enregistre une arrivée et la config de lancement utilisée.
+
+        Args:
+            user_id: ID utilisateur (hash du token)
+            workspace: Workspace du tenant (lieu de persistance)
+            fingerprint: Empreinte de la config de lancement
+            launch: Config de lancement (model, fallback_model, session_id, thinking, mcp_servers)
+        """
+        now = time.time()
+
+        with self._lock:
+            data = self._tenants.setdefault(user_id, {"user_id": user_id, "arrivals": [], "launches": {}})
+            self._workspaces[user_id] = workspace
+
+            data["arrivals"].append(now)
+            del data["arrivals"][:-self.max_arrivals]
+
+            entry = data["launches"].setdefault(fingerprint, {"count": 0, "config": launch})
+            entry["count"] += 1
+            entry["last_used"] = now
+
+            if len(data["launches"]) > self.max_launches:
+                # Oublie la config la moins utilisée (puis la plus ancienne)
+                stalest = min(
+                    data["launches"],
+                    key=lambda fp: (data["launches"][fp]["count"], data["launches"][fp]["last_used"])
+                )
+                del data["launches"][stalest]
+
+            self._dirty.add(user_id)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="ActivityFlush")
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def flush(self) -> int:
+        """
+        Écrit les tenants modifiés depuis le dernier flush.
+
+        Returns:
+            Nombre de tenants écrits
+        """
+        with self._lock:
+            pending = [
+                (self._workspaces[user_id], json.dumps(self._tenants[user_id]))
+                for user_id in self._dirty
+            ]
+            self._dirty.clear()
+
+        for workspace, snapshot in pending:
+            self._persist(workspace, snapshot)
+        return len(pending)
+
+    def forget(self, user_id: str):
+        """Oublie l'historique du tenant, sans l'écrire (workspace supprimé)."""
+        with self._lock:
+            self._tenants.pop(user_id, None)
+            self._workspaces.pop(user_id, None)
+            self._dirty.discard(user_id)
+
+    def last_seen(self, user_id: str) -> Optional[float]:
+        """Timestamp de la dernière arrivée du tenant (None si inconnu)."""
+        with self._lock:
+            data = self._tenants.get(user_id)
+            return data["arrivals"][-1] if data and data["arrivals"] else None
+
+    def return_probability(self, user_id: str, horizon: float, now: Optional[float] = None) -> float:
+        """
+        Probabilité que le tenant revienne dans les horizon secondes.
+
+        Estimée sur les intervalles passés plus longs que l'absence actuelle:
+        parmi eux, la part qui s'est terminée dans l'horizon. 0.0 si
+        l'historique est trop court pour conclure.
+        """
+        now = now or time.time()
+
+        with self._lock:
+            data = self._tenants.get(user_id)
+            if not data or len(data["arrivals"]) < 2:
+                return 0.0
+            arrivals = list(data["arrivals"])
+
+        absent_for = now - arrivals[-1]
+        gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+        survivors = [gap for gap in gaps if gap > absent_for]
+        if len(survivors) < self.min_samples:
+            return 0.0
+
+        returned = sum(1 for gap in survivors if gap <= absent_for + horizon)
+        return returned / len(survivors)
+
+    def usual_launch(self, user_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Config de lancement la plus fréquente du tenant: (fingerprint, config)."""
+        with self._lock:
+            data = self._tenants.get(user_id)
+            if not data or not data["launches"]:
+                return None
+            fingerprint, entry = max(
+                data["launches"].items(),
+                key=lambda item: (item[1]["count"], item[1]["last_used"])
+            )
+            return fingerprint, entry["config"]
+
+    def workspace(self, user_id: str) -> Optional[Path]:
+        with self._lock:
+            return self._workspaces.get(user_id)
+
+    def candidates(self, horizon: float, threshold: float) -> List[Tuple[str, float]]:
+        """
+        Tenants dont la probabilité de retour dans l'horizon atteint threshold.
+
+        Returns:
+            Liste (user_id, probabilité), plus probable en premier
+        """
+        with self._lock:
+            user_ids = list(self._tenants)
+
+        now = time.time()
+        scored = [(user_id, self.return_probability(user_id, horizon, now)) for user_id in user_ids]
+        likely = [(user_id, probability) for user_id, probability in scored if probability >= threshold]
+        likely.sort(key=lambda item: item[1], reverse=True)
+        return likely
+
+    def tenant_count(self) -> int:
+        with self._lock:
+            return len(self._tenants)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Activity log flush failed: {e}")
+
+    def _persist(self, workspace: Path, snapshot: str):
+        """Écriture atomique 0o600 dans {workspace}/.claude/."""
+        claude_dir = workspace / ".claude"
+        target = claude_dir / self.FILENAME
+        tmp = claude_dir / f".{self.FILENAME}.{threading.get_ident()}.tmp"
+        try:
+            claude_dir.mkdir(mode=0o700, exist_ok=True)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(snapshot)
+            os.replace(tmp, target)
+        except Exception as e:
+            logger.warning(f"⚠️ Cannot persist activity log for {workspace.name[:8]}...: {e}")
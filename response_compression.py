@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Negotiated response compression (gzip, zstd si disponible).
+
+Middleware ASGI (pas BaseHTTPMiddleware: le streaming SSE ne doit pas être bufferisé):
+- JSON (ex: /v1/messages avec include_files): compressé en un bloc si le body
+  dépasse minimum_size, sinon envoyé tel quel
+- SSE (text/event-stream): compression en flux, flush après chaque event
+  (Z_SYNC_FLUSH / zstd FLUSH_BLOCK) → le client décode chaque event dès réception
+- Encodage choisi via Accept-Encoding (q-values respectées), préférence zstd > gzip
+- Métriques par encodage: octets avant/après, ratio, temps CPU de compression
+"""
+
+import asyncio
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Types compressibles (les fichiers binaires / Range ne passent pas par ici)
+COMPRESSIBLE_TYPES = ("application/json", "text/event-stream", "text/plain", "text/html")
+
+# Au-delà, la compression one-shot part dans un thread (ne bloque pas l'event loop)
+OFFLOAD_THRESHOLD = 1024 * 1024
+
+
+class CompressionMetrics:
+    """Compteurs de compression par encodage (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_encoding: Dict[str, Dict[str, float]] = {}
+        self._skipped_small = 0
+        self._skipped_unsupported = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, response: bool = False):
+        with self._lock:
+            entry = self._by_encoding.setdefault(
+                encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            )
+            entry["responses"] += 1 if response else 0
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += cpu_seconds
+
+    def skip(self, small: bool):
+        with self._lock:
+            if small:
+                self._skipped_small += 1
+            else:
+                self._skipped_unsupported += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_encoding = {}
+            for encoding, entry in self._by_encoding.items():
+                by_encoding[encoding] = {
+                    "responses": entry["responses"],
+                    "bytes_in": entry["bytes_in"],
+                    "bytes_out": entry["bytes_out"],
+                    "ratio": round(entry["bytes_in"] / entry["bytes_out"], 2) if entry["bytes_out"] else None,
+                    "cpu_seconds": round(entry["cpu_seconds"], 4)
+                }
+            return {
+                "encodings": by_encoding,
+                "skipped_below_threshold": self._skipped_small,
+                "skipped_not_negotiated": self._skipped_unsupported
+            }
+
+
+class _StreamEncoder:
+    """Compresseur incrémental: un flush par chunk (event SSE), finish() en fin de stream."""
+
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 = conteneur gzip
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+
+    def encode(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_mode)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Choisit l'encodage à partir du header Accept-Encoding.
+
+    Returns:
+        "zstd", "gzip" ou None (réponse non compressée)
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("zstd", "gzip"):
+        if encoding == "zstd" and zstandard is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compression négociée des réponses JSON et des streams SSE.
+
+    Usage:
+        app.add_middleware(CompressionMiddleware, metrics=metrics, minimum_size=1024)
+    """
+
+    def __init__(
+        self,
+        app,
+        metrics: Optional[CompressionMetrics] = None,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+        compress_sse: bool = True
+    ):
+        """
+        Args:
+            app: Application ASGI
+            metrics: Compteurs partagés (exposés par /v1/pool/stats)
+            minimum_size: Taille de body sous laquelle la réponse n'est pas compressée
+            gzip_level: Niveau zlib (1-9)
+            zstd_level: Niveau zstd
+            compress_sse: Compresser aussi les streams text/event-stream
+        """
+        self.app = app
+        self.metrics = metrics or CompressionMetrics()
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.compress_sse = compress_sse
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            self.metrics.skip(small=False)
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress_body(self, encoding: str, body: bytes) -> Tuple[bytes, float]:
+        """Compression one-shot. Returns (body compressé, temps CPU)."""
+        started = time.thread_time()
+        if encoding == "zstd":
+            compressed = zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compressed = compressor.compress(body) + compressor.flush()
+        return compressed, time.thread_time() - started
+
+
+class _CompressionResponder:
+    """Intercepte les messages ASGI d'une réponse et compresse le body si pertinent."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start: Optional[Dict[str, Any]] = None
+        self._mode: Optional[str] = None  # "passthrough", "buffer", "stream"
+        self._buffered: List[bytes] = []
+        self._buffered_size = 0
+        self._encoder: Optional[_StreamEncoder] = None
+
+    async def send(self, message: Dict[str, Any]):
+        if message["type"] == "http.response.start":
+            self._start = message
+            self._mode = self._initial_mode(message)
+            if self._mode == "passthrough":
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self._mode == "passthrough":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._mode == "stream":
+            await self._send_stream(body, more_body)
+            return
+
+        # Mode buffer: on accumule jusqu'à connaître la taille (ou dépasser le seuil)
+        self._buffered.append(body)
+        self._buffered_size += len(body)
+
+        if not more_body:
+            await self._send_buffered()
+        elif self._buffered_size >= self.middleware.minimum_size:
+            # Réponse streamée volumineuse: bascule en compression incrémentale
+            self._mode = "stream"
+            pending, self._buffered = b"".join(self._buffered), []
+            await self._send_stream(pending, True)
+
+    def _initial_mode(self, message: Dict[str, Any]) -> str:
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+
+        if (
+            message.get("status", 200) in (204, 304)
+            or "content-encoding" in headers
+            or "content-range" in headers
+            or content_type not in COMPRESSIBLE_TYPES
+        ):
+            return "passthrough"
+
+        if content_type == "text/event-stream":
+            return "stream" if self.middleware.compress_sse else "passthrough"
+        return "buffer"
+
+    async def _send_start(self, content_length: Optional[int]):
+        headers = MutableHeaders(raw=self._start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            if "content-length" in headers:
+                del headers["content-length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        await self._send(self._start)
+
+    async def _send_buffered(self):
+        body = b"".join(self._buffered)
+        self._buffered = []
+
+        if len(body) < self.middleware.minimum_size:
+            self.middleware.metrics.skip(small=True)
+            await self._send(self._start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        if len(body) >= OFFLOAD_THRESHOLD:
+            loop = asyncio.get_running_loop()
+            compressed, cpu = await loop.run_in_executor(None, self.middleware.compress_body, self.encoding, body)
+        else:
+            compressed, cpu = self.middleware.compress_body(self.encoding, body)
+
+        self.middleware.metrics.record(self.encoding, len(body), len(compressed), cpu, response=True)
+        await self._send_start(len(compressed))
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_stream(self, body: bytes, more_body: bool):
+        first = self._encoder is None
+        if first:
+            self._encoder = _StreamEncoder(self.encoding, self.middleware.gzip_level, self.middleware.zstd_level)
+            await self._send_start(None)
+
+        started = time.thread_time()
+        chunk = self._encoder.encode(body) if more_body else self._encoder.finish(body)
+        # Compté à chaque chunk: un stream interrompu (client parti) reste mesuré
+        self.middleware.metrics.record(
+            self.encoding, len(body), len(chunk), time.thread_time() - started, response=first
+        )
+
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -7,6 +7,7 @@ Domaine: wrapper.claude.serenity-system.fr
 
 from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field, model_validator
 from typing import List, Dict, Optional, Any
 import logging
@@ -18,6 +19,10 @@ from claude_oauth_api_secure_multitenant import (
     SecurityError,
     MCPServerConfig
 )
+from admission_control import AdmissionRejected
+from delta_coalescer import DeltaCoalescer
+from response_compression import CompressionMiddleware, CompressionMetrics
+from blob_store import build_blob_response
 import json
 import asyncio
 
@@ -42,9 +47,36 @@ app = FastAPI(
 WORKSPACES_ROOT = os.getenv("WORKSPACES_ROOT", os.path.expanduser("~/.claude-workspaces"))
 api = SecureMultiTenantAPI(
     workspaces_root=WORKSPACES_ROOT,
-    security_level=SecurityLevel.BALANCED
+    security_level=SecurityLevel.BALANCED,
+    max_concurrent_processes=int(os.getenv("MAX_CONCURRENT_PROCESSES", "10")),
+    max_processes_per_tenant=int(os.getenv("MAX_PROCESSES_PER_TENANT", "3")),
+    max_queued_requests=int(os.getenv("MAX_QUEUED_REQUESTS", "100")),
+    pool_processes_per_tenant=int(os.getenv("POOL_PROCESSES_PER_TENANT", "3")),
+    max_pool_size=int(os.getenv("MAX_POOL_SIZE", "20")),
+    prespawn_budget=int(os.getenv("PRESPAWN_BUDGET", "2")),
+    prespawn_threshold=float(os.getenv("PRESPAWN_THRESHOLD", "0.5")),
+    transcript_idle_threshold=float(os.getenv("TRANSCRIPT_IDLE_THRESHOLD", str(24 * 3600))),
+    transcript_hot_set_size=int(os.getenv("TRANSCRIPT_HOT_SET_SIZE", "20")),
+    blob_max_age=float(os.getenv("BLOB_MAX_AGE", str(7 * 24 * 3600))),
+    blob_max_bytes=int(os.getenv("BLOB_MAX_BYTES", str(1024 ** 3))),
+    workspace_verify_interval=float(os.getenv("WORKSPACE_VERIFY_INTERVAL", "60")),
+    mcp_gateway=os.getenv("MCP_GATEWAY", "true").lower() == "true"
 )
 
+# Token-delta coalescing (SSE keepalive/pooled): défaut serveur, surchargeable par requête
+SSE_COALESCE_DEFAULT = os.getenv("SSE_COALESCE_DEFAULT", "false").lower() == "true"
+delta_coalescer = DeltaCoalescer(
+    window=float(os.getenv("SSE_COALESCE_WINDOW_MS", "20")) / 1000,
+    max_chars=int(os.getenv("SSE_COALESCE_MAX_CHARS", "2048"))
+)
+
+
+def should_coalesce(request) -> bool:
+    """Coalescing activé pour cette requête (opt-in/opt-out client, sinon défaut serveur)."""
+    if request.coalesce_deltas is None:
+        return SSE_COALESCE_DEFAULT
+    return request.coalesce_deltas
+
 logger.info("🔒 Secure Multi-Tenant API initialized")
 logger.info(f"   Security level: BALANCED")
 logger.info(f"   Workspaces root: {WORKSPACES_ROOT}")
@@ -239,6 +271,9 @@ class MessageRequest(BaseModel):
     fallback_model: Optional[str] = Field(None, description="Fallback model if primary overloaded (opus, sonnet, haiku)")
     thinking: Optional[bool] = Field(None, description="Enable extended thinking mode (default: False)")
     include_files: bool = Field(False, description="Auto-include created/modified files in response")
+    file_refs: bool = Field(False, description="include_files: return {path, sha256, size} references (download via GET /v1/workspace/blobs/{sha}) instead of inline content")
+    files_mode: str = Field("changes", pattern="^(changes|snapshot)$", description="include_files (non-streaming): 'changes' = files created/modified/deleted during the request, 'snapshot' = whole workspace")
+    coalesce_deltas: Optional[bool] = Field(None, description="Merge consecutive token deltas into fewer SSE frames (keepalive/pooled; default: server setting)")
 
     class Config:
         json_schema_extra = {
@@ -263,6 +298,17 @@ class MessageRequest(BaseModel):
 # Middleware
 # =============================================================================
 
+# Compression négociée (Accept-Encoding: zstd si installé, sinon gzip) des réponses JSON et SSE
+compression_metrics = CompressionMetrics()
+app.add_middleware(
+    CompressionMiddleware,
+    metrics=compression_metrics,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    zstd_level=int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3")),
+    compress_sse=os.getenv("COMPRESSION_SSE", "true").lower() == "true"
+)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all requests"""
@@ -352,22 +398,31 @@ async def root():
                 ],
                 "modes": {
                     "non_streaming": {
-                        "description": "Snapshot mode - returns all files at completion",
-                        "overhead": "~50-200ms (depends on file count)",
+                        "description": "Changes mode (default) - returns only files created/modified/deleted during the request. Set files_mode=snapshot for all files at completion",
+                        "overhead": "stat-only checkpoint before the run; only changed files are read and hashed",
+                        "large_files": "Files above 10MB are returned as blob refs (content null, encoding 'blob', sha256; download via GET /v1/workspace/blobs/{sha})",
                         "usage": 'curl -X POST /v1/messages -d \'{"include_files": true, "stream": false, ...}\'',
                         "response_format": {
                             "content": [...],
                             "files": [
                                 {
                                     "path": "hello.txt",
+                                    "change": "created",
                                     "content": "Hello World",
                                     "encoding": "text",
-                                    "size": 11
+                                    "size": 11,
+                                    "hash": "a591a6d4..."
                                 }
                             ],
+                            "deleted_files": ["old.txt"],
                             "files_summary": {
+                                "mode": "changes",
                                 "total": 1,
-                                "total_size": 11
+                                "total_size": 11,
+                                "created": 1,
+                                "modified": 0,
+                                "deleted": 1,
+                                "skipped_too_large": []
                             }
                         }
                     },
@@ -377,12 +432,15 @@ async def root():
                         "usage": 'curl -N -X POST /v1/messages -d \'{"include_files": true, "stream": true, ...}\'',
                         "sse_events": [
                             {"type": "file_created", "path": "main.py", "content": "...", "encoding": "text", "size": 1234},
-                            {"type": "files_batch", "files": [...], "count": 3}
-                        ]
-                    }
+                            {"type": "files_batch", "files": [...], "count": 3},
+                            {"type": "file_chunk", "path": "data.parquet", "seq": 0, "offset": 0, "length": 1048576, "size": 52428800, "encoding": "base64", "data": "...", "final": False}
+                        ],
+                        "large_files": "Files above 10MB appear in files_batch with encoding 'chunked' and are followed by file_chunk events (1MB each, in offset order); the last one has final=true, blake2b and complete"
+                    },
+                    "digests": "Each digest field is named after its algorithm: 'hash' is SHA-256 (non-streaming inline files), 'sha256' is the blob id (file_refs), 'blake2b' is BLAKE2b-256 (streaming file events and file_chunk finals)"
                 },
                 "file_watcher_features": [
-                    "Debouncing + SHA256 hashing (eliminate duplicate events)",
+                    "Debouncing + stat fast path + BLAKE2b hashing (eliminate duplicate events)",
                     "Smart filtering (auto-ignores .git, node_modules, .env, __pycache__)",
                     "Retry with exponential backoff (reliable file reads)",
                     "Ordered queue (guaranteed event order with timestamps)",
@@ -549,7 +607,14 @@ async def root():
                         "type": "boolean",
                         "required": False,
                         "default": False,
-                        "description": "Auto-include created/modified files in response (v36+). Non-streaming: snapshot at end. Streaming: real-time SSE file events."
+                        "description": "Auto-include created/modified files in response (v36+). Non-streaming: files changed during the request (see files_mode). Streaming: real-time SSE file events."
+                    },
+                    "files_mode": {
+                        "type": "string",
+                        "required": False,
+                        "default": "changes",
+                        "options": ["changes", "snapshot"],
+                        "description": "Non-streaming include_files: 'changes' returns created/modified/deleted files only, 'snapshot' returns the whole workspace"
                     }
                 },
                 "response_formats": {
@@ -584,6 +649,15 @@ async def root():
                 "authentication": "Bearer token in Authorization header",
                 "response": {"workspace": "/workspaces/...", "exists": True}
             },
+            "GET /v1/workspace/blobs/{sha}": {
+                "description": "Download a file returned by include_files with file_refs=true (content-addressed, deduplicated per tenant)",
+                "authentication": "Bearer token in Authorization header",
+                "headers": {
+                    "If-None-Match": "\"<sha256>\" → 304 Not Modified",
+                    "Range": "bytes=start-end → 206 Partial Content"
+                },
+                "response": "Raw bytes (application/octet-stream), ETag = sha256, Cache-Control immutable"
+            },
             "DELETE /v1/workspace": {
                 "description": "Delete workspace (DESTRUCTIVE)",
                 "authentication": "Bearer token in Authorization header",
@@ -768,7 +842,7 @@ async def root():
                 "response_example": {
                     "pool_size": 1,
                     "max_idle_time": 300,
-                    "cleanup_interval": 60,
+                    "next_reap_in": 254.8,
                     "active_users": [
                         {
                             "user_id": "5e9f9387...",
@@ -784,7 +858,7 @@ async def root():
                 "fields": {
                     "pool_size": "Number of active processes in pool",
                     "max_idle_time": "Max idle time before cleanup (seconds)",
-                    "cleanup_interval": "Cleanup check interval (seconds)",
+                    "next_reap_in": "Seconds until the next idle process expires (null if none)",
                     "active_users": "List of users with active processes",
                     "user_id": "Masked user ID (first 8 chars + ...)",
                     "pid": "Process ID",
@@ -1125,7 +1199,8 @@ async def root():
                 "Streamable HTTP is recommended over SSE (single persistent connection)",
                 "Each user's MCP configuration is isolated in their workspace",
                 "MCP servers can be mixed (local + remote in same request)",
-                "Default streamable_http_path is '/mcp' if not specified"
+                "Default streamable_http_path is '/mcp' if not specified",
+                "mcp_proxy.py caches each remote tools/list catalog in the workspace (~/.cache/mcp-proxy, TTL 1h) and revalidates it in the background; notifications/tools/list_changed invalidates it"
             ]
         },
         "rate_limits": {
@@ -1228,36 +1303,63 @@ async def create_message(request: MessageRequest):
             subscription_type=request.oauth_credentials.subscription_type
         )
 
+        # Handle streaming response: forward each stream-json line as the CLI emits it
+        if request.stream:
+            # Admission first: a full queue becomes a 429 before any byte is sent
+            ticket = api.admit(credentials.access_token)
+            line_stream = await api.acreate_message_stream(
+                oauth_credentials=credentials,
+                messages=messages,
+                session_id=request.session_id,
+                model=request.model,
+                mcp_servers=mcp_servers_config,
+                fallback_model=request.fallback_model,
+                thinking=request.thinking,
+                admission_ticket=ticket
+            )
+
+            duration = time.time() - start_time
+            logger.info(f"✅ Stream started for user {user_id_short} in {duration:.2f}s")
+
+            async def stream_generator():
+                async for line in line_stream:
+                    yield f"{line}\n"
+
+            # Slot released even if the client disconnects before the stream starts
+            return StreamingResponse(
+                stream_generator(),
+                media_type="text/event-stream",
+                background=BackgroundTask(ticket.release)
+            )
+
         # Create message with full credentials (no need to setup workspace manually)
-        response = api.create_message(
+        # Async path: the CLI runs without blocking the event loop
+        response = await api.acreate_message(
             oauth_credentials=credentials,
             messages=messages,
             session_id=request.session_id,
             model=request.model,
             mcp_servers=mcp_servers_config,
-            stream=request.stream,
             fallback_model=request.fallback_model,
             thinking=request.thinking,
-            include_files=request.include_files
+            include_files=request.include_files,
+            files_mode=request.files_mode,
+            file_refs=request.file_refs
         )
 
         duration = time.time() - start_time
         logger.info(f"✅ Request completed for user {user_id_short} in {duration:.2f}s")
 
-        # Handle streaming response
-        if request.stream and response.get("type") == "stream":
-            def stream_generator():
-                for line in response["stream"].split("\n"):
-                    if line.strip():
-                        yield f"{line}\n"
-
-            return StreamingResponse(
-                stream_generator(),
-                media_type="text/event-stream"
-            )
-
         return response
 
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 Admission rejected for user {user_id_short}: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
     except SecurityError as e:
         logger.error(f"❌ Security error for user {user_id_short}: {str(e)}")
         raise HTTPException(
@@ -1340,8 +1442,9 @@ async def create_message_keepalive(request: MessageRequest):
             for msg in request.messages
         ]
 
-        # Call create_message_streaming (keep-alive method)
-        event_generator = api.create_message_streaming(
+        # Call acreate_message_streaming (keep-alive method, asyncio subprocess)
+        ticket = api.admit(credentials.access_token)
+        event_generator = api.acreate_message_streaming(
             oauth_credentials=credentials,
             messages=messages,
             session_id=request.session_id,
@@ -1349,15 +1452,20 @@ async def create_message_keepalive(request: MessageRequest):
             mcp_servers=mcp_servers_config,
             fallback_model=request.fallback_model,
             thinking=request.thinking,
-            include_files=request.include_files
+            include_files=request.include_files,
+            admission_ticket=ticket,
+            file_refs=request.file_refs
         )
 
         duration = time.time() - start_time
         logger.info(f"✅ KEEPALIVE request started for user {user_id_short} in {duration:.2f}s")
 
+        if should_coalesce(request):
+            event_generator = delta_coalescer.coalesce(event_generator)
+
         # Stream the response as SSE
-        def stream_generator():
-            for event in event_generator:
+        async def stream_generator():
+            async for event in event_generator:
                 # Format as Server-Sent Events
                 yield f"data: {json.dumps(event)}\n\n"
             # Send [DONE] marker
@@ -1365,7 +1473,16 @@ async def create_message_keepalive(request: MessageRequest):
 
         return StreamingResponse(
             stream_generator(),
-            media_type="text/event-stream"
+            media_type="text/event-stream",
+            background=BackgroundTask(ticket.release)
+        )
+
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 Admission rejected for user {user_id_short}: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
         )
 
     except SecurityError as e:
@@ -1393,7 +1510,9 @@ async def create_message_pooled(request: MessageRequest):
 
     Architecture:
     - Multi-request keep-alive (process reused across requests)
-    - One process per user (identified by token hash)
+    - Processes keyed by user + launch config (model, session_id, MCP servers, thinking)
+    - Exclusive lease per request: up to POOL_PROCESSES_PER_TENANT parallel
+      conversations per user, same-session requests are serialized
     - Automatic cleanup after 5 minutes idle
     - Process stays alive in pool after response
 
@@ -1404,7 +1523,7 @@ async def create_message_pooled(request: MessageRequest):
     - Server-Sent Events (SSE) streaming
     - MCP servers fully supported
 
-    Security: Same 100% isolation as /v1/messages (one process per user)
+    Security: Same 100% isolation as /v1/messages (processes never shared between users)
 
     Body: Same parameters as /v1/messages
 
@@ -1455,8 +1574,9 @@ async def create_message_pooled(request: MessageRequest):
         # Inject proactive system prompt (for all requests)
         messages = inject_proactive_prompt(messages)
 
-        # Call create_message_pooled (process pool method)
-        event_generator = api.create_message_pooled(
+        # Call acreate_message_pooled (process pool method, non-blocking)
+        ticket = api.admit(credentials.access_token)
+        event_generator = api.acreate_message_pooled(
             oauth_credentials=credentials,
             messages=messages,
             session_id=request.session_id,
@@ -1464,21 +1584,34 @@ async def create_message_pooled(request: MessageRequest):
             mcp_servers=mcp_servers_config,
             fallback_model=request.fallback_model,
             thinking=request.thinking,
-            include_files=request.include_files
+            include_files=request.include_files,
+            admission_ticket=ticket
         )
 
         duration = time.time() - start_time
         logger.info(f"✅ POOLED request started for user {user_id_short} in {duration:.2f}s")
 
+        if should_coalesce(request):
+            event_generator = delta_coalescer.coalesce(event_generator)
+
         # Stream the response as SSE
-        def stream_generator():
-            for event in event_generator:
+        async def stream_generator():
+            async for event in event_generator:
                 yield f"data: {json.dumps(event)}\n\n"
             yield "data: [DONE]\n\n"
 
         return StreamingResponse(
             stream_generator(),
-            media_type="text/event-stream"
+            media_type="text/event-stream",
+            background=BackgroundTask(ticket.release)
+        )
+
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 Admission rejected for user {user_id_short}: {str(e)}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
         )
 
     except SecurityError as e:
@@ -1504,17 +1637,40 @@ async def get_pool_stats():
     Returns:
         - pool_size: Number of active processes
         - max_idle_time: Max idle time before cleanup (seconds)
-        - cleanup_interval: Cleanup check interval (seconds)
-        - active_users: List of users with active processes
+        - next_reap_in: Seconds until the next idle process expires (null if none)
+        - leased: Processes currently serving a request
+        - max_pool_size: Pool capacity (LRU idle process evicted when a spawn needs room)
+        - evictions: Eviction counters by reason and the most recent evictions
+        - active_users: List of pooled processes (user, launch config, lease state)
+        - prespawn: Predictive pre-spawn (budget, issued/hits/wasted, expected and observed hit rate)
+        - admission: Admission control (active/queued runs, estimated wait, rejections)
+        - sse_coalescing: Token-delta coalescing (window, events in / SSE frames out)
+        - compression: Response compression per encoding (bytes in/out, ratio, CPU seconds)
 
     Example response:
     {
         "pool_size": 2,
+        "leased": 1,
+        "max_pool_size": 20,
+        "evictions": {
+            "total": 3,
+            "by_reason": {"idle_timeout": 2, "lru_capacity": 1},
+            "recent": [
+                {"user_id": "def67890...", "pid": 12001, "reason": "lru_capacity",
+                 "idle_time": 84.3, "requests_served": 2, "at": "2025-11-07T10:29:12Z"}
+            ]
+        },
         "max_idle_time": 300,
-        "cleanup_interval": 60,
+        "next_reap_in": 254.8,
+        "reap_heap_size": 2,
         "active_users": [
             {
                 "user_id": "abc12345...",
+                "fingerprint": "3f9a1c0d2b7e",
+                "model": "sonnet",
+                "session_id": null,
+                "leased": false,
+                "requests_served": 4,
                 "idle_time": 45.2,
                 "uptime": 120.5,
                 "created_at": "2025-11-07T10:30:00Z",
@@ -1522,11 +1678,45 @@ async def get_pool_stats():
                 "pid": 12345,
                 "alive": true
             }
-        ]
+        ],
+        "prespawn": {
+            "budget": 2,
+            "issued": 12,
+            "hits": 9,
+            "wasted": 2,
+            "pending": 1,
+            "expected_hit_rate": 0.74,
+            "observed_hit_rate": 0.818
+        },
+        "admission": {
+            "active": 3,
+            "max_concurrent": 10,
+            "queued": 0,
+            "estimated_wait": 3,
+            "rejected_total": 0
+        },
+        "sse_coalescing": {
+            "default": false,
+            "window_ms": 20.0,
+            "max_chars": 2048,
+            "events_in": 1840,
+            "frames_out": 212,
+            "ratio": 8.68
+        },
+        "compression": {
+            "encodings": {
+                "gzip": {"responses": 41, "bytes_in": 18230411, "bytes_out": 2104877,
+                         "ratio": 8.66, "cpu_seconds": 0.8123}
+            },
+            "skipped_below_threshold": 12,
+            "skipped_not_negotiated": 3
+        }
     }
     """
     try:
         stats = api.get_pool_stats()
+        stats["sse_coalescing"] = {"default": SSE_COALESCE_DEFAULT, **delta_coalescer.stats()}
+        stats["compression"] = compression_metrics.stats()
         return stats
 
     except Exception as e:
@@ -1566,6 +1756,38 @@ async def get_workspace(
         raise HTTPException(500, f"Error: {str(e)}")
 
 
+@app.get("/v1/workspace/blobs/{sha}")
+async def get_workspace_blob(
+    sha: str,
+    request: Request,
+    authorization: str = Header(..., description="Bearer sk-ant-oat01-xxx")
+):
+    """
+    Download a blob (file content referenced by sha256) from the user's workspace.
+
+    Blobs are immutable: the ETag is the sha256, If-None-Match returns 304,
+    Range requests return 206 (or 416 if not satisfiable).
+
+    Returns:
+        Raw bytes (application/octet-stream)
+    """
+    # Validate token
+    if not authorization.startswith("Bearer sk-ant-oat01-"):
+        raise HTTPException(401, "Invalid OAuth token format")
+
+    oauth_token = authorization.replace("Bearer ", "")
+
+    try:
+        blob_path = await asyncio.to_thread(api.get_blob_path, oauth_token, sha.lower())
+    except Exception as e:
+        raise HTTPException(500, f"Error: {str(e)}")
+
+    if blob_path is None:
+        raise HTTPException(404, "Blob not found")
+
+    return build_blob_response(blob_path, sha.lower(), request.headers)
+
+
 @app.delete("/v1/workspace")
 async def delete_workspace(
     authorization: str = Header(..., description="Bearer sk-ant-oat01-xxx"),
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Per-workspace index of Claude CLI sessions (session_id → transcript).
+
+Avant: _session_exists lisait (read_text) chaque fichier à la racine de
+.claude/ pour y chercher le session_id → coût proportionnel au volume total
+des sessions, à chaque requête. Et le CLI range ses transcripts dans
+.claude/projects/<cwd-slug>/<session_id>.jsonl: la recherche les ratait, d'où
+un contexte froid au lieu de --resume.
+
+Maintenant:
+- Index {session_id: {path, size, last_turn}} par workspace, en mémoire
+- Alimenté par la sortie du CLI: les events system (init) et result portent session_id
+- Lookup O(1): entrée de l'index (validée par un stat), sinon stat du chemin
+  attendu du transcript; un listing des noms (jamais de lecture de contenu)
+  de projects/*/ n'a lieu qu'une fois par workspace
+- Transcripts compressés par le cold tier (transcript_tiering): tier "cold",
+  restaurés par prepare_resume() juste avant --resume
+- Sessions vivantes (stdout d'un process CLI ouvert, ou --resume préparé il y a
+  moins de RESUME_GRACE secondes): jamais compressées par le tiering (is_live)
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+import logging
+
+from transcript_tiering import COLD_SUFFIX, cold_path, restore_transcript
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_SUFFIX = ".jsonl"
+
+# Délai pendant lequel une session préparée pour --resume est considérée vivante
+# (avant le premier event du process, ou pour les runs one-shot sans stream suivi)
+RESUME_GRACE = 300.0
+
+
+def project_slug(cwd: Path) -> str:
+    """Nom du dossier projet du CLI pour un cwd (caractères non alphanumériques → '-')."""
+    return re.sub(r"[^a-zA-Z0-9]", "-", str(cwd))
+
+
+class SessionIndex:
+    """Sessions CLI connues d'un workspace (HOME = cwd = workspace)."""
+
+    def __init__(self, workspace: Path):
+        """
+        Args:
+            workspace: Workspace du tenant (HOME et cwd du CLI)
+        """
+        self.workspace = workspace
+        self.projects_dir = workspace / ".claude" / "projects"
+        self.project_dir = self.projects_dir / project_slug(workspace)
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._scanned = False
+        self._live: Dict[str, int] = {}  # session_id → streams CLI ouverts
+        self._resumed: Dict[str, float] = {}  # session_id → prepare_resume()
+
+    def exists(self, session_id: str) -> bool:
+        """True si un transcript existe pour session_id (en clair ou compressé)."""
+        return self.locate(session_id) is not None
+
+    def prepare_resume(self, session_id: str) -> bool:
+        """
+        True si la session peut être reprise (--resume).
+
+        Un transcript du cold tier est décompressé ici, avant le lancement du CLI.
+        """
+        entry = self.locate(session_id)
+        if entry is None:
+            return False
+        with self._lock:
+            self._resumed[session_id] = time.time()  # Vivante dès maintenant (tiering)
+        if entry["tier"] == "cold":
+            if not restore_transcript(Path(entry["path"])):
+                return False
+            self._refresh(session_id, entry)
+        return True
+
+    def is_live(self, session_id: str) -> bool:
+        """True si un process CLI utilise la session (ou va la reprendre): le tiering la laisse en clair."""
+        with self._lock:
+            if self._live.get(session_id):
+                return True
+            resumed = self._resumed.get(session_id)
+            if resumed is None:
+                return False
+            if time.time() - resumed < RESUME_GRACE:
+                return True
+            del self._resumed[session_id]
+            return False
+
+    def open_stream(self) -> "SessionStream":
+        """Suivi de la sortie d'un process CLI: ses sessions sont vivantes jusqu'à close()."""
+        return SessionStream(self)
+
+    def locate(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Transcript d'une session.
+
+        Returns:
+            {"path", "size", "last_turn", "tier"} ou None si la session est inconnue
+            (path: transcript en clair, tier "cold" s'il n'existe que compressé)
+        """
+        if not session_id or "/" in session_id or session_id.startswith("."):
+            return None
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is not None:
+            if self._refresh(session_id, entry):
+                return entry
+            logger.debug(f"Session transcript gone: {session_id}")
+
+        # Emplacement attendu (cwd = workspace)
+        entry = {"path": str(self.project_dir / f"{session_id}{TRANSCRIPT_SUFFIX}"), "size": 0, "last_turn": None}
+        if self._stat_entry(entry):
+            with self._lock:
+                self._sessions[session_id] = entry
+            return entry
+
+        # Transcripts créés sous un autre cwd (ou avant le démarrage du serveur)
+        if not self._scanned:
+            self._scan()
+            with self._lock:
+                return self._sessions.get(session_id)
+        return None
+
+    def observe(self, event: Any):
+        """
+        Met à jour l'index depuis un event de sortie du CLI (stream-json ou json).
+
+        system (init): session ouverte; result: fin d'un tour (last_turn, taille du transcript).
+
+        Returns:
+            session_id de l'event, None s'il ne concerne pas une session
+        """
+        if not isinstance(event, dict) or event.get("type") not in ("system", "result"):
+            return None
+        session_id = event.get("session_id")
+        if not isinstance(session_id, str) or not session_id or "/" in session_id:
+            return None
+
+        path = self.project_dir / f"{session_id}{TRANSCRIPT_SUFFIX}"
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = {"path": str(path), "size": 0, "last_turn": None, "tier": "hot"}
+            if event["type"] == "result":
+                entry["last_turn"] = time.time()
+        self._refresh(session_id, entry)
+        return session_id
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "scanned": self._scanned, "live": len(self._live)}
+
+    def _acquire(self, session_id: str):
+        with self._lock:
+            self._live[session_id] = self._live.get(session_id, 0) + 1
+            self._resumed.pop(session_id, None)  # Le stream prend le relais
+
+    def _release(self, session_id: str):
+        with self._lock:
+            count = self._live.get(session_id, 0) - 1
+            if count > 0:
+                self._live[session_id] = count
+            else:
+                self._live.pop(session_id, None)
+
+    def _refresh(self, session_id: str, entry: Dict[str, Any]) -> bool:
+        """stat du transcript: met à jour size/tier, retire l'entrée si le fichier a disparu."""
+        if self._stat_entry(entry, update_last_turn=False):
+            return True
+        if entry["last_turn"] is None and entry["size"] == 0:
+            # Session annoncée par le CLI, transcript pas encore écrit
+            return False
+        with self._lock:
+            if self._sessions.get(session_id) is entry:
+                del self._sessions[session_id]
+        return False
+
+    @staticmethod
+    def _stat_entry(entry: Dict[str, Any], update_last_turn: bool = True) -> bool:
+        """Renseigne size/tier (et last_turn) depuis le transcript en clair, sinon compressé."""
+        transcript = Path(entry["path"])
+        for tier, path in (("hot", transcript), ("cold", cold_path(transcript))):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entry["size"] = st.st_size
+            entry["tier"] = tier
+            if update_last_turn or entry["last_turn"] is None:
+                entry["last_turn"] = st.st_mtime
+            return True
+        return False
+
+    def _scan(self):
+        """Listing unique de projects/*/*.jsonl (noms + stat, aucun contenu lu)."""
+        started = time.time()
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            with os.scandir(self.projects_dir) as projects:
+                for project in projects:
+                    if not project.is_dir(follow_symlinks=False):
+                        continue
+                    try:
+                        with os.scandir(project.path) as transcripts:
+                            for transcript in transcripts:
+                                name, tier = transcript.name, "hot"
+                                if name.endswith(COLD_SUFFIX):
+                                    name, tier = name[:-len(COLD_SUFFIX)], "cold"
+                                if not name.endswith(TRANSCRIPT_SUFFIX):
+                                    continue
+                                try:
+                                    st = transcript.stat(follow_symlinks=False)
+                                except OSError:
+                                    continue
+                                session_id = name[:-len(TRANSCRIPT_SUFFIX)]
+                                if tier == "cold" and session_id in found:
+                                    continue  # Copie en clair prioritaire
+                                found[session_id] = {
+                                    "path": os.path.join(project.path, name),
+                                    "size": st.st_size,
+                                    "last_turn": st.st_mtime,
+                                    "tier": tier
+                                }
+                    except OSError:
+                        continue
+        except OSError:
+            return  # Pas encore de projects/: re-tenté au prochain miss
+
+        with self._lock:
+            for session_id, entry in found.items():
+                self._sessions.setdefault(session_id, entry)
+            self._scanned = True
+        logger.debug(f"📇 Session index: {len(found)} transcripts ({(time.time() - started) * 1000:.1f}ms)")
+
+
+class SessionStream:
+    """Sessions vues sur le stdout d'un process CLI (vivantes jusqu'à close(), à l'EOF)."""
+
+    def __init__(self, index: SessionIndex):
+        self.index = index
+        self.sessions: set = set()
+
+    def observe(self, event: Any):
+        """SessionIndex.observe + session marquée vivante."""
+        session_id = self.index.observe(event)
+        if session_id is not None and session_id not in self.sessions:
+            self.sessions.add(session_id)
+            self.index._acquire(session_id)
+
+    def close(self):
+        for session_id in self.sessions:
+            self.index._release(session_id)
+        self.sessions.clear()
+
+
+_indexes: Dict[str, SessionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_session_index(workspace: Path) -> SessionIndex:
+    """Index des sessions du workspace (une instance par workspace)."""
+    key = str(workspace)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SessionIndex(workspace)
+        return index
+
+
+def drop_session_index(workspace: Path):
+    """Oublie l'index du workspace (workspace supprimé)."""
+    with _indexes_lock:
+        _indexes.pop(str(workspace), None)
+
+
+def is_session_live(workspace: Path, session_id: str) -> bool:
+    """SessionIndex.is_live sans créer d'index (workspace jamais servi: aucune session vivante)."""
+    with _indexes_lock:
+        index = _indexes.get(str(workspace))
+    return index is not None and index.is_live(session_id)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Cold tier for idle Claude CLI session transcripts.
+
+Les transcripts (.claude/projects/<cwd-slug>/<session_id>.jsonl) ne sont
+jamais compactés: les gros utilisateurs accumulent des centaines de Mo de JSONL.
+
+Un job en arrière-plan compresse (zstd) les transcripts inactifs:
+- <session_id>.jsonl → <session_id>.jsonl.zst (mtime d'origine conservé)
+- Inactif = non modifié depuis idle_threshold secondes, et hors des hot_set_size
+  transcripts les plus récents du tenant (ceux-là restent toujours en clair)
+- Un transcript modifié pendant la compression est laissé en clair
+
+Compression et restauration d'une même session sont exclusives (transcript_lock);
+une copie froide n'est jamais supprimée tant que le transcript en clair ne la
+contient pas (préfixe).
+
+Restauration à la demande: SessionIndex.prepare_resume() décompresse le
+transcript juste avant --resume (restore_transcript, mtime = maintenant: le
+transcript redevient chaud et n'est pas recompressé avant l'append du CLI).
+
+Comptabilité disque par tenant (hot/cold, octets) exposée par stats().
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_SUFFIX = ".jsonl"
+COLD_SUFFIX = ".zst"
+CHUNK_SIZE = 1024 * 1024
+
+_transcript_locks: Dict[str, list] = {}  # chemin → [Lock, utilisateurs]
+_locks_guard = threading.Lock()
+
+
+def cold_path(transcript: Path) -> Path:
+    """Chemin compressé d'un transcript (<session_id>.jsonl.zst)."""
+    return transcript.with_name(transcript.name + COLD_SUFFIX)
+
+
+@contextmanager
+def transcript_lock(transcript: Path):
+    """
+    Verrou d'un transcript, pris par compress_transcript et restore_transcript
+    (job de tiering vs --resume d'une requête): jamais de compression et de
+    restauration simultanées d'une même session.
+    """
+    key = str(transcript)
+    with _locks_guard:
+        entry = _transcript_locks.get(key)
+        if entry is None:
+            entry = _transcript_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _transcript_locks[key]
+
+
+def _changed(transcript: Path, before: os.stat_result) -> bool:
+    after = os.stat(transcript)
+    return (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns)
+
+
+def _cold_is_prefix(transcript: Path) -> bool:
+    """True si le contenu de <transcript>.zst est un préfixe du transcript en clair (copie froide redondante)."""
+    with open(cold_path(transcript), "rb") as src, open(transcript, "rb") as plain:
+        reader = zstandard.ZstdDecompressor().stream_reader(src)
+        while True:
+            chunk = reader.read(CHUNK_SIZE)
+            if not chunk:
+                return True
+            if plain.read(len(chunk)) != chunk:
+                return False
+
+
+def compress_transcript(transcript: Path, level: int = 9) -> Optional[int]:
+    """
+    Compresse transcript en .jsonl.zst puis supprime l'original (sous transcript_lock).
+
+    Une copie froide existante n'est remplacée que si le transcript en clair la
+    contient (préfixe): sinon les deux sont gardés, aucun historique n'est perdu.
+
+    Returns:
+        Taille compressée, None si le transcript a changé pendant la compression
+        ou si une autre copie froide existe (laissé en clair)
+
+    Raises:
+        OSError: Lecture/écriture impossible
+    """
+    target = cold_path(transcript)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    with transcript_lock(transcript):
+        if target.exists() and not _cold_is_prefix(transcript):
+            logger.warning(f"⚠️ Transcript {transcript.name} diverges from its cold copy, both kept")
+            return None
+
+        before = os.stat(transcript)
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(transcript, "rb") as src, os.fdopen(fd, "wb") as dst:
+                compressor = zstandard.ZstdCompressor(level=level)
+                compressor.copy_stream(src, dst, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+
+            if _changed(transcript, before):
+                tmp.unlink()
+                return None  # Session reprise entre-temps
+
+            os.utime(tmp, ns=(before.st_atime_ns, before.st_mtime_ns))
+            os.replace(tmp, target)
+            # Dernière vérification juste avant l'unlink: un append arrivé depuis ne doit pas être perdu
+            if _changed(transcript, before):
+                target.unlink(missing_ok=True)
+                return None
+            transcript.unlink()
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return os.stat(target).st_size
+
+
+def restore_transcript(transcript: Path) -> bool:
+    """
+    Décompresse <transcript>.zst vers transcript (avant --resume, sous transcript_lock).
+
+    Le transcript restauré prend l'heure courante comme mtime: sinon le prochain
+    passage du tiering le verrait toujours inactif et le recompresserait.
+    Si un transcript en clair existe déjà, la copie froide n'est supprimée que
+    s'il la contient (restauration déjà faite); sinon elle est conservée.
+
+    Returns:
+        True si le transcript est disponible en clair
+    """
+    source = cold_path(transcript)
+    with transcript_lock(transcript):
+        if transcript.exists():
+            if zstandard is not None and source.exists():
+                try:
+                    if _cold_is_prefix(transcript):
+                        source.unlink()  # Restauration déjà faite (copie froide redondante)
+                    else:
+                        logger.warning(f"⚠️ Transcript {transcript.name} diverges from its cold copy, both kept")
+                except Exception as e:
+                    logger.warning(f"⚠️ Cannot compare transcript {transcript.name} with its cold copy: {e}")
+            return True
+        if zstandard is None or not source.exists():
+            return False
+
+        tmp = transcript.with_name(f".{transcript.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        started = time.time()
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+                zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+            os.replace(tmp, transcript)
+            source.unlink(missing_ok=True)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            logger.error(f"❌ Cannot restore transcript {transcript.name}: {e}")
+            return transcript.exists()
+
+    logger.info(f"♨️ Transcript restored: {transcript.name} ({(time.time() - started) * 1000:.1f}ms)")
+    return True
+
+
+class TranscriptTiering:
+    """Job périodique de compression des transcripts inactifs de tous les tenants."""
+
+    def __init__(
+        self,
+        workspaces_root: Path,
+        idle_threshold: float = 24 * 3600,
+        hot_set_size: int = 20,
+        interval: float = 600.0,
+        level: int = 9,
+        is_live: Optional[Callable[[Path, str], bool]] = None
+    ):
+        """
+        Args:
+            workspaces_root: Racine des workspaces (un dossier par tenant)
+            idle_threshold: Inactivité (secondes) avant compression (0 = tiering désactivé)
+            hot_set_size: Transcripts les plus récents gardés en clair par tenant
+            interval: Période du job (secondes)
+            level: Niveau zstd
+            is_live: (workspace, session_id) → True si un process CLI utilise la session
+                (jamais compressée tant qu'elle est vivante)
+        """
+        self.workspaces_root = workspaces_root
+        self.idle_threshold = idle_threshold
+        self.hot_set_size = hot_set_size
+        self.interval = interval
+        self.level = level
+        self.is_live = is_live
+        self.enabled = idle_threshold > 0 and zstandard is not None
+
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, Dict[str, int]] = {}
+        self._compressed = 0
+        self._bytes_saved = 0
+        self._last_run: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Lance le job en arrière-plan (no-op si désactivé)."""
+        if not self.enabled:
+            if self.idle_threshold > 0:
+                logger.warning("⚠️ zstandard not installed: transcript cold tier disabled")
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="TranscriptTiering")
+        self._thread.start()
+        logger.info(
+            f"🧊 Transcript tiering: idle > {self.idle_threshold:.0f}s, hot set {self.hot_set_size}/tenant, "
+            f"every {self.interval:.0f}s"
+        )
+
+    def run_once(self):
+        """Un passage sur tous les workspaces: compression + comptabilité disque."""
+        try:
+            workspaces = [entry for entry in os.scandir(self.workspaces_root) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+
+        now = time.time()
+        for workspace in workspaces:
+            try:
+                usage = self._tier_workspace(Path(workspace.path), now)
+            except Exception as e:
+                logger.error(f"❌ Transcript tiering failed for {workspace.name[:8]}...: {e}")
+                continue
+            with self._lock:
+                self._tenants[workspace.name] = usage
+        with self._lock:
+            self._last_run = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = {
+                f"{user_id[:8]}...": dict(usage) for user_id, usage in self._tenants.items()
+                if usage["hot_files"] or usage["cold_files"]
+            }
+            return {
+                "enabled": self.enabled,
+                "idle_threshold": self.idle_threshold,
+                "hot_set_size": self.hot_set_size,
+                "compressed": self._compressed,
+                "bytes_saved": self._bytes_saved,
+                "hot_bytes": sum(usage["hot_bytes"] for usage in self._tenants.values()),
+                "cold_bytes": sum(usage["cold_bytes"] for usage in self._tenants.values()),
+                "last_run": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._last_run)) if self._last_run else None,
+                "tenants": tenants
+            }
+
+    def _loop(self):
+        while True:
+            started = time.time()
+            self.run_once()
+            logger.debug(f"🧊 Transcript tiering pass: {(time.time() - started) * 1000:.1f}ms")
+            time.sleep(self.interval)
+
+    def _tier_workspace(self, workspace: Path, now: float) -> Dict[str, int]:
+        usage = {"hot_files": 0, "hot_bytes": 0, "cold_files": 0, "cold_bytes": 0}
+        hot: List[tuple] = []  # (mtime, size, path)
+
+        projects_dir = workspace / ".claude" / "projects"
+        try:
+            projects = [entry.path for entry in os.scandir(projects_dir) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return usage
+
+        for project in projects:
+            try:
+                entries = list(os.scandir(project))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if entry.name.endswith(TRANSCRIPT_SUFFIX + COLD_SUFFIX):
+                    usage["cold_files"] += 1
+                    usage["cold_bytes"] += st.st_size
+                elif entry.name.endswith(TRANSCRIPT_SUFFIX):
+                    hot.append((st.st_mtime, st.st_size, Path(entry.path)))
+
+        # Les plus récents d'abord: les hot_set_size premiers restent en clair
+        hot.sort(key=lambda item: item[0], reverse=True)
+        for rank, (mtime, size, transcript) in enumerate(hot):
+            session_id = transcript.name[:-len(TRANSCRIPT_SUFFIX)]
+            if rank >= self.hot_set_size and now - mtime > self.idle_threshold \
+                    and not (self.is_live and self.is_live(workspace, session_id)):
+                try:
+                    compressed = compress_transcript(transcript, self.level)
+                except Exception as e:
+                    logger.warning(f"⚠️ Cannot compress transcript {transcript.name}: {e}")
+                    compressed = None
+                if compressed is not None:
+                    usage["cold_files"] += 1
+                    usage["cold_bytes"] += compressed
+                    with self._lock:
+                        self._compressed += 1
+                        self._bytes_saved += size - compressed
+                    logger.debug(f"🧊 Transcript compressed: {transcript.name} ({size} → {compressed} bytes)")
+                    continue
+            usage["hot_files"] += 1
+            usage["hot_bytes"] += size
+        return usage
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Process-wide filesystem observer shared by all file watchers.
+
+Avant: chaque stream include_files créait son Observer watchdog (threads +
+watch inotify récursif re-posé sur tout le workspace, node_modules compris).
+
+Maintenant:
+- Un seul fd inotify et un seul thread pour tout le process (Linux)
+- Workspaces enregistrés à la demande, avec refcount (N streams = 1 jeu de watches)
+- Les dossiers ignorés (node_modules/, .git/, ...) sont élagués à l'enregistrement:
+  ils ne consomment aucun watch inotify
+- Les events sont routés vers les handlers du workspace (préfixe de chemin)
+- Un workspace libéré garde ses watches linger secondes: les requêtes
+  successives d'un même tenant ne re-parcourent pas l'arborescence
+
+Hors Linux (ou si inotify est indisponible): un Observer watchdog partagé,
+avec un schedule récursif par workspace (même refcount).
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _WatchedWorkspace:
+    """Workspace enregistré: handlers abonnés + watches inotify de ses dossiers."""
+
+    def __init__(self, root: Path, ignore_spec):
+        self.root = root
+        self.ignore_spec = ignore_spec
+        self.handlers: List[FileSystemEventHandler] = []
+        self.wds: Dict[int, str] = {}  # wd → chemin absolu du dossier
+        self.released_at: Optional[float] = None
+        self.schedule = None  # Fallback watchdog: ObservedWatch
+
+    def is_ignored_dir(self, path: str) -> bool:
+        relative = os.path.relpath(path, self.root)
+        return relative != "." and self.ignore_spec.match_file(f"{relative}/")
+
+
+class WorkspaceObserver:
+    """
+    Observer partagé: register(workspace, handler) / unregister(workspace, handler).
+
+    Les handlers reçoivent des events watchdog (FileCreatedEvent / FileModifiedEvent)
+    via handler.dispatch(), appelé dans le thread de l'observer.
+    """
+
+    def __init__(self, linger: float = 60.0):
+        """
+        Args:
+            linger: Durée (secondes) pendant laquelle un workspace sans handler garde ses watches
+        """
+        self.linger = linger
+        self._lock = threading.RLock()
+        self._workspaces: Dict[str, _WatchedWorkspace] = {}
+        self._wd_owner: Dict[int, _WatchedWorkspace] = {}
+        self._events = 0
+        self._overflows = 0
+
+        self._fd = self._init_inotify()
+        self._fallback = None
+        if self._fd is None:
+            from watchdog.observers import Observer
+            self._fallback = Observer()
+            self._fallback.start()
+            logger.info("👁️ Workspace observer started (shared watchdog observer)")
+        else:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="WorkspaceObserver")
+            self._thread.start()
+            logger.info("👁️ Workspace observer started (shared inotify)")
+
+    # ------------------------------------------------------------------ public
+
+    def register(self, workspace: Path, handler: FileSystemEventHandler, ignore_spec):
+        """
+        Abonne handler aux events du workspace (pose les watches au premier abonné).
+
+        Args:
+            workspace: Racine du workspace
+            handler: Handler watchdog (dispatch → on_created / on_modified)
+            ignore_spec: PathSpec des chemins ignorés (dossiers élagués, sans watch)
+        """
+        key = str(workspace)
+        with self._lock:
+            watched = self._workspaces.get(key)
+            if watched is None:
+                watched = self._workspaces[key] = _WatchedWorkspace(workspace, ignore_spec)
+                started = time.time()
+                if self._fallback is not None:
+                    watched.schedule = self._fallback.schedule(_Router(self, watched), key, recursive=True)
+                else:
+                    self._watch_tree(watched, key)
+                logger.info(
+                    f"👁️ Watching {workspace.name[:8]}...: {len(watched.wds)} dirs "
+                    f"({(time.time() - started) * 1000:.1f}ms)"
+                )
+            watched.handlers.append(handler)
+            watched.released_at = None
+            self._sweep_locked()
+
+    def unregister(self, workspace: Path, handler: FileSystemEventHandler):
+        """Désabonne handler; les watches sont retirés après linger sans abonné."""
+        with self._lock:
+            watched = self._workspaces.get(str(workspace))
+            if watched is None:
+                return
+            if handler in watched.handlers:
+                watched.handlers.remove(handler)
+            if not watched.handlers:
+                watched.released_at = time.time()
+            self._sweep_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "watchdog" if self._fallback is not None else "inotify",
+                "workspaces": len(self._workspaces),
+                "active_workspaces": sum(1 for w in self._workspaces.values() if w.handlers),
+                "handlers": sum(len(w.handlers) for w in self._workspaces.values()),
+                "watches": len(self._wd_owner),
+                "events": self._events,
+                "overflows": self._overflows
+            }
+
+    # ------------------------------------------------------------------ inotify
+
+    def _init_inotify(self) -> Optional[int]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            self._inotify_add_watch = libc.inotify_add_watch
+            self._inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            self._inotify_rm_watch = libc.inotify_rm_watch
+            self._inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except Exception as e:
+            logger.warning(f"⚠️ inotify unavailable ({e}), falling back to watchdog observer")
+            return None
+        if fd < 0:
+            logger.warning(f"⚠️ inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return None
+        return fd
+
+    def _watch_tree(self, watched: _WatchedWorkspace, top: str) -> List[str]:
+        """
+        Pose un watch sur top et ses sous-dossiers non ignorés (appelé sous lock).
+
+        Returns:
+            Fichiers déjà présents dans l'arborescence (créés avant la pose du watch)
+        """
+        existing = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            if not self._add_watch(watched, directory):
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not watched.is_ignored_dir(entry.path):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            existing.append(entry.path)
+            except OSError:
+                continue
+        return existing
+
+    def _add_watch(self, watched: _WatchedWorkspace, directory: str) -> bool:
+        wd = self._inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                logger.error(f"❌ inotify watch limit reached (fs.inotify.max_user_watches), not watching {directory}")
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning(f"⚠️ Cannot watch {directory}: {os.strerror(err)}")
+            return False
+        watched.wds[wd] = directory
+        self._wd_owner[wd] = watched
+        return True
+
+    def _drop_locked(self, watched: _WatchedWorkspace):
+        self._workspaces.pop(str(watched.root), None)
+        if self._fallback is not None:
+            try:
+                self._fallback.unschedule(watched.schedule)
+            except Exception:
+                pass
+            return
+        for wd in watched.wds:
+            self._wd_owner.pop(wd, None)
+            self._inotify_rm_watch(self._fd, wd)
+        watched.wds.clear()
+        logger.debug(f"👁️ Stopped watching {watched.root.name[:8]}...")
+
+    def _sweep_locked(self):
+        """Retire les workspaces sans abonné depuis plus de linger secondes."""
+        now = time.time()
+        for watched in list(self._workspaces.values()):
+            if not watched.handlers and watched.released_at is not None \
+                    and now - watched.released_at >= self.linger:
+                self._drop_locked(watched)
+
+    def _run(self):
+        while True:
+            try:
+                readable, _, _ = select.select([self._fd], [], [], max(1.0, self.linger / 4))
+                if readable:
+                    self._read_events()
+                with self._lock:
+                    self._sweep_locked()
+            except Exception as e:
+                logger.error(f"❌ Error in workspace observer loop: {e}")
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        dispatches: List[Tuple[List[FileSystemEventHandler], Any]] = []
+        offset = 0
+        with self._lock:
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_len].rstrip(b"\0")
+                offset += EVENT_HEADER.size + name_len
+                self._events += 1
+
+                if mask & IN_Q_OVERFLOW:
+                    self._overflows += 1
+                    logger.warning("⚠️ inotify queue overflow: some file events were lost")
+                    continue
+
+                watched = self._wd_owner.get(wd)
+                if watched is None:
+                    continue
+
+                if mask & IN_IGNORED:
+                    # Dossier supprimé (ou watch retiré): le kernel a déjà libéré le wd
+                    watched.wds.pop(wd, None)
+                    self._wd_owner.pop(wd, None)
+                    continue
+
+                if not name:
+                    continue
+
+                path = os.path.join(watched.wds[wd], os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    # Nouveau dossier (même sans abonné: les watches restent complets pendant linger)
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not watched.is_ignored_dir(path):
+                        # Watch + fichiers déjà écrits avant la pose du watch
+                        for existing in self._watch_tree(watched, path):
+                            if watched.handlers:
+                                dispatches.append((list(watched.handlers), FileCreatedEvent(existing)))
+                    continue
+
+                if not watched.handlers:
+                    continue
+
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    event = FileCreatedEvent(path)
+                else:
+                    event = FileModifiedEvent(path)
+                dispatches.append((list(watched.handlers), event))
+
+        # Handlers appelés hors lock (ils ne doivent pas bloquer: ils programment un check)
+        for handlers, event in dispatches:
+            for handler in handlers:
+                try:
+                    handler.dispatch(event)
+                except Exception as e:
+                    logger.error(f"❌ Error in file event handler: {e}")
+
+
+class _Router(FileSystemEventHandler):
+    """Fallback watchdog: relaie les events d'un workspace à ses handlers courants."""
+
+    def __init__(self, observer: WorkspaceObserver, watched: _WatchedWorkspace):
+        self.observer = observer
+        self.watched = watched
+
+    def dispatch(self, event):
+        with self.observer._lock:
+            handlers = list(self.watched.handlers)
+            self.observer._events += 1
+        for handler in handlers:
+            try:
+                handler.dispatch(event)
+            except Exception as e:
+                logger.error(f"❌ Error in file event handler: {e}")
+
+
+_observer: Optional[WorkspaceObserver] = None
+_observer_lock = threading.Lock()
+
+
+def get_workspace_observer() -> WorkspaceObserver:
+    """Observer partagé du process (créé au premier usage)."""
+    global _observer
+    with _observer_lock:
+        if _observer is None:
+            _observer = WorkspaceObserver()
+        return _observer